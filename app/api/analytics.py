@@ -0,0 +1,29 @@
+import asyncio
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends
+from app.schemas.schemas import TokenData
+from app.core.deps import get_user_officer
+from app.core.responses import json_response
+from app.services.analytics import rollup
+
+# Analytics API Router
+router = APIRouter(
+    prefix="/analytics",
+    tags=["Analytics"]
+)
+
+# GET /analytics/rollups
+# Violations and notices per district, officer, violation type or date, largest first
+# Answered from the exported Parquet files (python -m app.cli export-analytics), never from the OLTP tables
+# Only officers can view analytics
+@router.get("/rollups")
+async def get_rollup(
+    by: Literal["district", "officer", "violation_type", "date"],
+    violation_date_from: Optional[date] = None,
+    violation_date_to: Optional[date] = None,
+    current_user: TokenData = Depends(get_user_officer)
+):
+    # pyarrow releases the GIL while aggregating, so the scan runs on a worker thread
+    rows = await asyncio.to_thread(rollup, by, violation_date_from, violation_date_to)
+    return json_response(rows)
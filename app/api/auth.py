@@ -1,27 +1,37 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
+from app.db.lookups import user_by_username
 from app.models.models import APIUser
-from app.schemas.schemas import TokenBase
-from app.core.security import verify_password, create_access_token
+from app.schemas.schemas import TokenBase, TokenRefresh
+from app.core.security import verify_password_async, create_access_token, create_refresh_token
+from app.core.deps import decode_token, load_user
 
 router = APIRouter(tags=["auth"])
 
+# Creates an access and refresh token pair for a user
+def create_tokens(user: APIUser) -> dict:
+    return {
+        "access_token": create_access_token(user.username, user.api_user_id, user.role),
+        "refresh_token": create_refresh_token(user.username, user.api_user_id),
+        "token_type": "bearer"
+    }
+
 # POST /token
 @router.post("/token", response_model=TokenBase)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     # Find user by username
-    user = db.query(APIUser).filter(APIUser.username == form_data.username).first()
+    user = await user_by_username(db, form_data.username)
     # Check if user exists
-    if not user or not verify_password(form_data.password, user.password):
+    # bcrypt is slow on purpose, so it runs on the dedicated password pool instead of blocking the event loop
+    if not user or not await verify_password_async(form_data.password, user.password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Incorrect login credentials",
             headers={"WWW-Authenticate": "Bearer"}
         )
-    # Create access token
-    token = create_access_token(user.username)
-    return {"access_token": token, "token_type": "bearer"}
+    # Create access and refresh tokens
+    return create_tokens(user)
 
 '''
 Note: The brief asks us to implement a "/token endpoint where users can 
@@ -33,21 +43,26 @@ mistake. As per my interpretation, the brief is asking us to implement the
 same function for all three endpoints.
 
 I have implemented the POST /token endpoint as a login function, and the PUT
-/token endpoint as a basic refresh token function. The DELETE /token endpoint
-functions as described in the brief, but I have included an additional basic
-logout function, which can be seen in the multiline comment below the DELETE endpoint.
+/token endpoint as a refresh token function. POST /token returns a refresh
+token alongside the access token, and PUT /token exchanges it for a new pair
+without checking the password again. The DELETE /token endpoint issues tokens
+the same way as PUT, but I have included an additional basic logout function,
+which can be seen in the multiline comment below the DELETE endpoint.
 '''
 
 # PUT /token
+# Exchanges a refresh token for new tokens, the role is re-read so changes take effect
 @router.put("/token", response_model=TokenBase)
-def refresh_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    return login(form_data, db)
+async def refresh_token(token_refresh: TokenRefresh, db: AsyncSession = Depends(get_db)):
+    token_data = decode_token(token_refresh.refresh_token, token_type="refresh")
+    user = await load_user(token_data.user_id, db)
+    return create_tokens(user)
 
 # DELETE /token
 @router.delete("/token", response_model=TokenBase)
-def delete_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    return login(form_data, db)
+async def delete_token(token_refresh: TokenRefresh, db: AsyncSession = Depends(get_db)):
+    return await refresh_token(token_refresh, db)
 '''
 def logout():
     return {"message": "Logged out."}
-'''
+'''
\ No newline at end of file
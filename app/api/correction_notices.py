@@ -1,9 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+import csv
+import io
+from contextlib import asynccontextmanager
+import orjson
+from datetime import date
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload, load_only
+from pydantic import TypeAdapter
 from app.db.database import get_db
-from app.models.models import CorrectionNotice, Driver, Vehicle, Officer, APIUser
-from app.schemas.schemas import CorrectionNoticeResponse, CorrectionNoticeCreate, CorrectionNoticeUpdate
+from app.db.replicas import get_read_db, read_session
+from app.models.models import CorrectionNotice, Driver, Vehicle, Officer, NoticeViolation, ViolationType
+from app.schemas.schemas import CorrectionNoticeResponse, CorrectionNoticeCreate, CorrectionNoticeUpdate, TokenData
+from app.schemas.schemas import CorrectionNoticeBulkCreate, CorrectionNoticeBulkResponse, CorrectionNoticePage, CorrectionNoticeDetail
+from app.schemas.schemas import DriverResponse, VehicleResponse, OfficerResponse, NoticeViolationDetail
 from app.core.deps import get_user_officer
+from app.core.idempotency import idempotency
+from app.core.metrics import query_budget
+from app.core.responses import parse_fields, schema_columns, row_dicts, json_response
+from app.db.updates import update_versioned, current_versioned
+from app.db.lookups import exists, DRIVER_EXISTS, VEHICLE_EXISTS, OFFICER_EXISTS
+from app.services.offender_stats import adjust_violation_counts, violation_counts_for_notices
+from app.services.citizen_notices import refresh_citizen_notices
+from app.services.sync import change_seq
+from app.services.outbox import emit
 
 # Correction Notice API Router
 router = APIRouter(
@@ -11,45 +34,293 @@ router = APIRouter(
     tags=["Correction Notices"]
 )
 
+# Rows fetched per round-trip when streaming an export
+STREAM_CHUNK_SIZE = 1000
+
+# Related records that can be expanded on a notice, and the loader options for each
+# Many-to-one records are joined into the notice query, violations and their types are one extra query
+EXPAND_OPTIONS = {
+    "driver": [joinedload(CorrectionNotice.driver, innerjoin=True)],
+    "vehicle": [joinedload(CorrectionNotice.vehicle, innerjoin=True).joinedload(Vehicle.owner, innerjoin=True)],
+    "officer": [joinedload(CorrectionNotice.officer, innerjoin=True)],
+    "violations": [selectinload(CorrectionNotice.violations).joinedload(NoticeViolation.violation_type, innerjoin=True)],
+}
+# Validates and dumps each expanded relationship in its response shape
+EXPAND_ADAPTERS = {
+    "driver": TypeAdapter(DriverResponse),
+    "vehicle": TypeAdapter(VehicleResponse),
+    "officer": TypeAdapter(OfficerResponse),
+    "violations": TypeAdapter(List[NoticeViolationDetail]),
+}
+MAX_EXPANDED_NOTICES = 100
+
+# Builds the WHERE conditions for the correction notice listing
+def notice_filters(after_id, district, officer_id, driver_id, violation_date_from, violation_date_to) -> list:
+    conditions = []
+    if after_id is not None:
+        conditions.append(CorrectionNotice.correction_notice_id > after_id)
+    if district is not None:
+        conditions.append(CorrectionNotice.district == district)
+    if officer_id is not None:
+        conditions.append(CorrectionNotice.officer_id == officer_id)
+    if driver_id is not None:
+        conditions.append(CorrectionNotice.driver_id == driver_id)
+    if violation_date_from is not None:
+        conditions.append(CorrectionNotice.violation_date >= violation_date_from)
+    if violation_date_to is not None:
+        conditions.append(CorrectionNotice.violation_date <= violation_date_to)
+    return conditions
+
+# Streams matching notices as NDJSON or CSV
+# Uses its own session and a server-side cursor, so only one chunk of rows is held in memory at a time
+# Rows are in the response shape, so they are written out without validating them again
+async def stream_notices(conditions: list, format: str, fields: list):
+    if format == "csv":
+        yield ",".join(fields) + "\n"
+    statement = (
+        select(*schema_columns(CorrectionNotice, CorrectionNoticeResponse, fields))
+        .filter(*conditions)
+        .order_by(CorrectionNotice.correction_notice_id)
+        .execution_options(yield_per=STREAM_CHUNK_SIZE)
+    )
+    async with read_session() as db:
+        result = await db.stream(statement)
+        async for partition in result.partitions():
+            if format == "csv":
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows(partition)
+                yield buffer.getvalue()
+            else:
+                yield b"".join(orjson.dumps(dict(zip(fields, row))) + b"\n" for row in partition)
+
+# One keyset page of notices matching the filters, in ID order
+def notice_page_statement(conditions: list, fields: list, limit: int):
+    return (
+        select(*schema_columns(CorrectionNotice, CorrectionNoticeResponse, fields))
+        .filter(*conditions)
+        .order_by(CorrectionNotice.correction_notice_id)
+        .limit(limit)
+    )
+
+# GET /correction-notices
+# List correction notices with optional filters, ordered by ID
+# Uses keyset pagination: pass next_after_id from the previous page as after_id
+# format=ndjson or format=csv streams every matching notice instead of returning a single page
+# fields (e.g. fields=district,violation_date) selects only those columns, correction_notice_id is always included
+@router.get("/", response_model=CorrectionNoticePage)
+async def get_correction_notices(
+    after_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    district: Optional[str] = None,
+    officer_id: Optional[int] = None,
+    driver_id: Optional[int] = None,
+    violation_date_from: Optional[date] = None,
+    violation_date_to: Optional[date] = None,
+    format: Literal["json", "ndjson", "csv"] = "json",
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    conditions = notice_filters(after_id, district, officer_id, driver_id, violation_date_from, violation_date_to)
+    selected = parse_fields(fields, CorrectionNoticeResponse, "correction_notice_id")
+    if format == "ndjson":
+        return StreamingResponse(stream_notices(conditions, format, selected), media_type="application/x-ndjson")
+    if format == "csv":
+        return StreamingResponse(stream_notices(conditions, format, selected), media_type="text/csv")
+    # Fetch one extra row to know whether there is a next page
+    rows = row_dicts(await db.execute(notice_page_statement(conditions, selected, limit + 1)))
+    items = rows[:limit]
+    next_after_id = items[-1]["correction_notice_id"] if len(rows) > limit else None
+    return json_response({"items": items, "next_after_id": next_after_id})
+
+# Parses the comma-separated expand parameter
+def parse_expand(expand: Optional[str]) -> set:
+    names = {name.strip() for name in expand.split(",") if name.strip()} if expand else set()
+    unknown = names - EXPAND_OPTIONS.keys()
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Cannot expand {', '.join(sorted(unknown))}, choose from {', '.join(EXPAND_OPTIONS)}")
+    return names
+
+# Loads notices with the requested related records in at most two queries, however many violations they have
+# Only the notice columns named in fields are selected, reading any other column raises instead of querying
+# Returns response dicts keyed by notice ID, unexpanded relationships are left out because they aren't loaded
+async def load_expanded_notices(db: AsyncSession, correction_notice_ids: set, expand: set, fields: list) -> dict:
+    options = [option for name in expand for option in EXPAND_OPTIONS[name]]
+    result = await db.execute(
+        select(CorrectionNotice)
+        .filter(CorrectionNotice.correction_notice_id.in_(correction_notice_ids))
+        .options(load_only(*(getattr(CorrectionNotice, name) for name in fields), raiseload=True), *options)
+    )
+    notices = {}
+    for notice in result.unique().scalars():
+        detail = {name: getattr(notice, name) for name in fields}
+        for name in expand:
+            adapter = EXPAND_ADAPTERS[name]
+            detail[name] = adapter.dump_python(adapter.validate_python(getattr(notice, name), from_attributes=True), exclude_none=True)
+        notices[notice.correction_notice_id] = detail
+    return notices
+
+# GET /correction-notices/batch
+# Get several correction notices with related records, e.g. ?ids=1,2,3&expand=driver,vehicle,officer,violations
+# Notices are returned in the requested order, IDs that don't exist are left out
+# fields selects only those notice columns, correction_notice_id is always included
+@router.get("/batch", response_model=List[CorrectionNoticeDetail], response_model_exclude_none=True)
+async def get_correction_notices_batch(ids: str, expand: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    try:
+        correction_notice_ids = list(dict.fromkeys(int(i) for i in ids.split(",") if i.strip()))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="ids must be a comma-separated list of integers")
+    if not 1 <= len(correction_notice_ids) <= MAX_EXPANDED_NOTICES:
+        raise HTTPException(status_code=422, detail=f"Between 1 and {MAX_EXPANDED_NOTICES} ids can be requested")
+    selected = parse_fields(fields, CorrectionNoticeResponse, "correction_notice_id")
+    notices = await load_expanded_notices(db, set(correction_notice_ids), parse_expand(expand), selected)
+    return json_response([notices[i] for i in correction_notice_ids if i in notices])
+
+# GET /correction-notices/{correction_notice_id}
+# Get a correction notice, expand=driver,vehicle,officer,violations adds the related records in the same response
+# fields selects only those notice columns, correction_notice_id is always included
+@router.get("/{correction_notice_id}", response_model=CorrectionNoticeDetail, response_model_exclude_none=True)
+async def get_correction_notice(correction_notice_id: int, expand: Optional[str] = None, fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    selected = parse_fields(fields, CorrectionNoticeResponse, "correction_notice_id")
+    notices = await load_expanded_notices(db, {correction_notice_id}, parse_expand(expand), selected)
+    if correction_notice_id not in notices:
+        raise HTTPException(status_code=404, detail="Correction notice not found")
+    return json_response(notices[correction_notice_id])
+
+# Wraps a correction notice write, turning a foreign key violation into a 404 for the missing record
+# The references are only looked up after the database has rejected the write
+@asynccontextmanager
+async def reference_errors(db: AsyncSession, values: dict):
+    try:
+        yield
+    except IntegrityError:
+        await db.rollback()
+        for key, statement, name in (
+            ("driver_id", DRIVER_EXISTS, "Driver"),
+            ("vehicle_id", VEHICLE_EXISTS, "Vehicle"),
+            ("officer_id", OFFICER_EXISTS, "Officer"),
+        ):
+            if key in values and not await exists(db, statement, values[key]):
+                raise HTTPException(status_code=404, detail=f"{name} not found")
+        raise
+
 # POST /correction-notices
 # Create a new correction notice
+# Foreign keys are checked by the database, not with a query per reference
 # Only officers can create correction notices
-@router.post("/", response_model=CorrectionNoticeResponse, status_code=201)
-def create_correction_notice(correction_notice: CorrectionNoticeCreate, db: Session = Depends(get_db), current_user: APIUser = Depends(get_user_officer)):
-    # Validate foreign keys exist
-    if not db.query(Driver).filter(Driver.driver_id == correction_notice.driver_id).first():
-        raise HTTPException(status_code=404, detail="Driver not found")
-    if not db.query(Vehicle).filter(Vehicle.vehicle_id == correction_notice.vehicle_id).first():
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    if not db.query(Officer).filter(Officer.officer_id == correction_notice.officer_id).first():
-        raise HTTPException(status_code=404, detail="Officer not found")
-    new_correction_notice = CorrectionNotice(**correction_notice.model_dump())
-    db.add(new_correction_notice)
-    db.commit()
-    db.refresh(new_correction_notice)
+@router.post("/", response_model=CorrectionNoticeResponse, status_code=201, dependencies=[Depends(idempotency)])
+async def create_correction_notice(correction_notice: CorrectionNoticeCreate, db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    values = correction_notice.model_dump()
+    new_correction_notice = CorrectionNotice(**values, change_seq=change_seq(db, CorrectionNotice))
+    async with reference_errors(db, values):
+        db.add(new_correction_notice)
+        await db.flush()
+        await emit(db, "correction_notice.created", {"correction_notice_id": new_correction_notice.correction_notice_id})
+        await db.commit()
     return new_correction_notice
 
+# Returns the subset of IDs that exist in a table, using a single IN query
+async def find_existing_ids(db: AsyncSession, column, ids: set) -> set:
+    if not ids:
+        return set()
+    return set((await db.execute(select(column).filter(column.in_(ids)))).scalars().all())
+
+# Inserts correction notices with a single multi-row INSERT and returns their IDs in the order of the rows
+# Both databases assign a multi-row INSERT increasing IDs in row order, so sorting the IDs lines them up with the rows.
+# They aren't always consecutive on MySQL (innodb_autoinc_lock_mode=2 is the MySQL 8 default), so instead of counting
+# from the first ID they are read back by the batch's change sequence placeholder, which no other transaction uses.
+# Where the database supports RETURNING (SQLite) they come back from the INSERT itself
+async def insert_notices(db: AsyncSession, rows: list, seq: int) -> list:
+    statement = insert(CorrectionNotice).values(rows)
+    if db.bind.dialect.insert_returning:
+        return sorted((await db.execute(statement.returning(CorrectionNotice.correction_notice_id))).scalars())
+    await db.execute(statement)
+    return list((await db.execute(
+        select(CorrectionNotice.correction_notice_id).where(CorrectionNotice.change_seq == seq).order_by(CorrectionNotice.correction_notice_id)
+    )).scalars())
+
+# POST /correction-notices/bulk
+# Create a batch of correction notices and their violations in one transaction
+# Foreign keys are validated with one query per table, invalid notices are reported and skipped
+# Only officers can create correction notices
+@router.post("/bulk", response_model=CorrectionNoticeBulkResponse, dependencies=[Depends(idempotency), Depends(query_budget(20))])
+async def create_correction_notices_bulk(batch: CorrectionNoticeBulkCreate, db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    notices = batch.notices
+    # Validate all foreign keys with one set-based query per table
+    drivers = await find_existing_ids(db, Driver.driver_id, {n.driver_id for n in notices})
+    vehicles = await find_existing_ids(db, Vehicle.vehicle_id, {n.vehicle_id for n in notices})
+    officers = await find_existing_ids(db, Officer.officer_id, {n.officer_id for n in notices})
+    violation_types = await find_existing_ids(db, ViolationType.violation_type_id, {v for n in notices for v in n.violation_type_ids})
+    # Sort notices into valid ones and per-item errors
+    results = []
+    valid = []
+    for index, notice in enumerate(notices):
+        if notice.driver_id not in drivers:
+            results.append({"index": index, "status": "error", "detail": "Driver not found"})
+        elif notice.vehicle_id not in vehicles:
+            results.append({"index": index, "status": "error", "detail": "Vehicle not found"})
+        elif notice.officer_id not in officers:
+            results.append({"index": index, "status": "error", "detail": "Officer not found"})
+        elif any(v not in violation_types for v in notice.violation_type_ids):
+            results.append({"index": index, "status": "error", "detail": "Violation type not found"})
+        else:
+            valid.append((index, notice, notice.model_dump(exclude={"violation_type_ids"})))
+    # Insert the notices with one multi-row INSERT, then their violations in one executemany
+    if valid:
+        seq = change_seq(db, CorrectionNotice, NoticeViolation)
+        notice_ids = await insert_notices(db, [dict(values, change_seq=seq) for _, _, values in valid], seq)
+        for (_, _, values), correction_notice_id in zip(valid, notice_ids):
+            values.update(correction_notice_id=correction_notice_id, version=1)
+        violation_rows = [
+            {"correction_notice_id": values["correction_notice_id"], "violation_type_id": violation_type_id, "change_seq": seq}
+            for _, notice, values in valid
+            for violation_type_id in notice.violation_type_ids
+        ]
+        if violation_rows:
+            await db.execute(insert(NoticeViolation), violation_rows)
+        # Keep the frequent offender summary in step with the new violations
+        deltas = {}
+        for _, notice, _ in valid:
+            deltas[notice.driver_id] = deltas.get(notice.driver_id, 0) + len(notice.violation_type_ids)
+        await adjust_violation_counts(db, deltas)
+        # Add the new violations to the citizen notice read model
+        await refresh_citizen_notices(db, CorrectionNotice.correction_notice_id.in_(notice_ids))
+        await emit(db, "correction_notice.created", *({"correction_notice_id": correction_notice_id} for correction_notice_id in notice_ids))
+        await db.commit()
+    for index, _, values in valid:
+        results.append({"index": index, "status": "created", "correction_notice": values})
+    results.sort(key=lambda result: result["index"])
+    return {"created": len(valid), "failed": len(notices) - len(valid), "results": results}
+
 # PUT /correction-notices/{correction_notice_id}
-# Update a correction notice
+# Update a correction notice with a single UPDATE, pass the version from the last read to reject conflicting updates with a 409
+# Foreign keys are checked by the database, not with a query per reference
 # Only officers can update correction notices
 @router.put("/{correction_notice_id}", response_model=CorrectionNoticeResponse)
-def update_correction_notice(correction_notice_id: int, correction_notice: CorrectionNoticeUpdate, db: Session = Depends(get_db), current_user: APIUser = Depends(get_user_officer)):
-    # Find the correction notice to update
-    db_correction_notice = db.query(CorrectionNotice).filter(CorrectionNotice.correction_notice_id == correction_notice_id).first()
-    # If correction notice not found, raise 404 error
-    if not db_correction_notice:
-        raise HTTPException(status_code=404, detail="Correction notice not found")
-    # Validate foreign keys if being updated
-    if correction_notice.driver_id and not db.query(Driver).filter(Driver.driver_id == correction_notice.driver_id).first():
-        raise HTTPException(status_code=404, detail="Driver not found")
-    if correction_notice.vehicle_id and not db.query(Vehicle).filter(Vehicle.vehicle_id == correction_notice.vehicle_id).first():
-        raise HTTPException(status_code=404, detail="Vehicle not found")
-    if correction_notice.officer_id and not db.query(Officer).filter(Officer.officer_id == correction_notice.officer_id).first():
-        raise HTTPException(status_code=404, detail="Officer not found")
-    # Update the correction notice
-    update_data = correction_notice.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_correction_notice, key, value)
-    db.commit()
-    db.refresh(db_correction_notice)
-    return db_correction_notice
\ No newline at end of file
+async def update_correction_notice(correction_notice_id: int, correction_notice: CorrectionNoticeUpdate, db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    update_data = correction_notice.model_dump(exclude_unset=True, exclude={"version"})
+    columns = schema_columns(CorrectionNotice, CorrectionNoticeResponse)
+    # Nothing to change, the notice is returned without a write, a new version or a change sequence number
+    if not update_data:
+        return (await current_versioned(
+            db, CorrectionNotice, CorrectionNotice.correction_notice_id, correction_notice_id, correction_notice.version, columns, "Correction notice"
+        ))._mapping
+    async with reference_errors(db, update_data):
+        # The notice's violations per driver, read before the update so they can be moved to the new driver
+        moved_counts = []
+        if correction_notice.driver_id:
+            moved_counts = await violation_counts_for_notices(db, {correction_notice_id})
+        values = dict(update_data, change_seq=change_seq(db, CorrectionNotice))
+        db_correction_notice = await update_versioned(
+            db, CorrectionNotice, CorrectionNotice.correction_notice_id, correction_notice_id, values,
+            correction_notice.version, columns, "Correction notice"
+        )
+        # Move the notice's violations to the new driver in the frequent offender summary
+        for old_driver_id, count in moved_counts:
+            if old_driver_id != correction_notice.driver_id:
+                await adjust_violation_counts(db, {old_driver_id: -count, correction_notice.driver_id: count})
+        # Recompute the notice's rows in the citizen notice read model
+        await refresh_citizen_notices(db, CorrectionNotice.correction_notice_id == correction_notice_id)
+        await emit(db, "correction_notice.updated", {"correction_notice_id": correction_notice_id, "fields": sorted(update_data)})
+        await db.commit()
+    return db_correction_notice._mapping
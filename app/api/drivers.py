@@ -1,12 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
+from os import getenv
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
-from app.models.models import Driver, CorrectionNotice, NoticeViolation
+from app.db.replicas import get_read_db, read_session
+from app.models.models import Driver, DriverViolationCount, CorrectionNotice
 from app.schemas.schemas import DriverResponse, DriverCreate, DriverUpdate
-from typing import List
-from sqlalchemy import func
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
 from app.core.deps import get_user_officer
-from app.models.models import APIUser
+from app.core.idempotency import idempotency
+from app.core.responses import parse_fields, schema_columns, rows_response, json_response
+from app.core.cache import TTLCache, SingleFlight
+from app.core.metrics import CACHE_LOOKUPS
+from app.schemas.schemas import TokenData
+from app.services.offender_stats import rebuild_violation_counts
+from app.services.citizen_notices import refresh_citizen_notices
+from app.services.outbox import emit
+from app.services.sync import change_seq
+from app.db.updates import update_versioned, current_versioned, is_unique_violation
+from app.db.lookups import driver_by_id
 
 # Driver API Router
 router = APIRouter(
@@ -14,66 +28,128 @@ router = APIRouter(
     tags=["Drivers"]
 )
 
+# Short-lived cache of driver lookups, refilled with the written row by update_driver
+# Misses read from a replica, so an update can't just drop the entry: a lagging replica would put the old row back
+# Concurrent misses for the same driver are coalesced into one query
+driver_cache = TTLCache(
+    maxsize=int(getenv("DRIVER_CACHE_SIZE", "10000")),
+    ttl=float(getenv("DRIVER_CACHE_TTL", "5"))
+)
+driver_lookups = SingleFlight()
+# Bumped on every invalidation, a lookup that started before an update must not cache its result
+driver_cache_version = 0
+
+# Replaces a driver in the cache with the row written by this process, must be called after a driver is changed
+# Lookups already running were reading the old row, they neither cache it nor are joined by later requests
+def refresh_cached_driver(driver_id: int, driver: DriverResponse):
+    global driver_cache_version
+    driver_cache_version += 1
+    driver_lookups.forget(driver_id)
+    driver_cache.set(driver_id, driver)
+
+# Loads a driver in its own session, shared by every request coalesced onto the lookup
+async def load_driver(driver_id: int):
+    version = driver_cache_version
+    async with read_session() as db:
+        driver = await driver_by_id(db, driver_id)
+    if driver is None:
+        return None
+    driver = DriverResponse.model_validate(driver)
+    if version == driver_cache_version:
+        driver_cache.set(driver_id, driver)
+    return driver
+
+LICENCE_INDEX = next(index for index in Driver.__table__.indexes if index.name == "uq_driver_drivers_licence")
+
+# Wraps a driver write, turning a duplicate licence into a 409 and any other constraint violation into a 422
+# Nulls are rejected by the schemas, so the other violations are values the database refused
+@asynccontextmanager
+async def licence_conflicts(db: AsyncSession):
+    try:
+        yield
+    except IntegrityError as error:
+        await db.rollback()
+        if is_unique_violation(error, LICENCE_INDEX):
+            raise HTTPException(status_code=409, detail="A driver with this licence already exists")
+        raise HTTPException(status_code=422, detail="The driver was rejected by the database, check the values sent")
+
 # GET /drivers/frequent-offenders
-# Get drivers with more than a specified number of violations
+# Get drivers with more than a specified number of violations, most violations first
+# Reads the maintained driver_violation_count summary, so this is an indexed range lookup
+# top returns the drivers with the most violations, skip and limit page through the results
+# Selects only the response columns, or the ones named in fields, and encodes the rows directly without building ORM objects
 @router.get("/frequent-offenders", response_model=List[DriverResponse])
-def get_frequent_offenders(min_violations: int = 1, db: Session = Depends(get_db)):
-    offenders = (
-        db.query(Driver)
-        .join(CorrectionNotice, Driver.driver_id == CorrectionNotice.driver_id)
-        .join(NoticeViolation, CorrectionNotice.correction_notice_id == NoticeViolation.correction_notice_id)
-        .group_by(Driver.driver_id)
-        .having(func.count(NoticeViolation.notice_violation_id) > min_violations)
-        .all()
+async def get_frequent_offenders(min_violations: int = 1, skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000), top: Optional[int] = Query(None, ge=1, le=1000), fields: Optional[str] = None, db: AsyncSession = Depends(get_read_db)):
+    statement = (
+        select(*schema_columns(Driver, DriverResponse, parse_fields(fields, DriverResponse, "driver_id")))
+        .join(DriverViolationCount, Driver.driver_id == DriverViolationCount.driver_id)
+        .order_by(DriverViolationCount.violation_count.desc(), DriverViolationCount.driver_id)
     )
-    return offenders
+    if top is not None:
+        statement = statement.filter(DriverViolationCount.violation_count > 0).limit(top)
+    else:
+        statement = statement.filter(DriverViolationCount.violation_count > min_violations).offset(skip).limit(limit)
+    return rows_response(await db.execute(statement))
+
+# POST /drivers/frequent-offenders/rebuild
+# Recompute the frequent offender summary from scratch
+# Only officers can rebuild the summary
+@router.post("/frequent-offenders/rebuild", dependencies=[Depends(idempotency)])
+async def rebuild_frequent_offenders(db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    await rebuild_violation_counts(db)
+    return {"message": "Frequent offender summary rebuilt successfully"}
 
 # GET /drivers/{driver_id}
 # Get driver by ID
+# Served from the driver cache, a miss opens a session only if no other request is already loading the driver
+# fields narrows the response, cached drivers are whole so the projection is applied to the cached record
 @router.get("/{driver_id}", response_model=DriverResponse)
-def get_driver(driver_id: int, db: Session = Depends(get_db)):
-    driver = db.query(Driver).filter(Driver.driver_id == driver_id).first()
+async def get_driver(driver_id: int, fields: Optional[str] = None):
+    selected = parse_fields(fields, DriverResponse, "driver_id") if fields else None
+    driver = driver_cache.get(driver_id)
+    if driver is not None:
+        CACHE_LOOKUPS.labels("driver", "hit").inc()
+    else:
+        CACHE_LOOKUPS.labels("driver", "coalesced" if driver_id in driver_lookups else "miss").inc()
+        driver = await driver_lookups.do(driver_id, lambda: load_driver(driver_id))
     if not driver:
         raise HTTPException(status_code=404, detail="Driver not found")
+    if selected:
+        return json_response(driver.model_dump(include=set(selected)))
     return driver
 
 # POST /drivers
 # Create a new driver
 # Only officers can create drivers
-@router.post("/", response_model=DriverResponse, status_code=201)
-def create_driver(driver: DriverCreate, db: Session = Depends(get_db), current_user: APIUser = Depends(get_user_officer)):
-    # Check if driver with this licence already exists
-    existing_driver = db.query(Driver).filter(Driver.drivers_licence == driver.drivers_licence).first()
-    if existing_driver:
-        raise HTTPException(status_code=409, detail="A driver with this licence already exists")
-    new_driver = Driver(**driver.model_dump())
-    db.add(new_driver)
-    db.commit()
-    db.refresh(new_driver)
+@router.post("/", response_model=DriverResponse, status_code=201, dependencies=[Depends(idempotency)])
+async def create_driver(driver: DriverCreate, db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    new_driver = Driver(**driver.model_dump(), change_seq=change_seq(db, Driver))
+    # Licence uniqueness is enforced by the uq_driver_drivers_licence index
+    async with licence_conflicts(db):
+        db.add(new_driver)
+        await db.flush()
+        await emit(db, "driver.created", {"driver_id": new_driver.driver_id})
+        await db.commit()
     return new_driver
 
 # PUT /drivers/{driver_id}
-# Update a driver
+# Update a driver with a single UPDATE, pass the version from the last read to reject conflicting updates with a 409
 # Only officers can update drivers
 @router.put("/{driver_id}", response_model=DriverResponse)
-def update_driver(driver_id: int, driver: DriverUpdate, db: Session = Depends(get_db), current_user: APIUser = Depends(get_user_officer)):
-    # Find the driver to update
-    db_driver = db.query(Driver).filter(Driver.driver_id == driver_id).first()
-    # If driver not found, raise 404 error
-    if not db_driver:
-        raise HTTPException(status_code=404, detail="Driver not found")
-    # Check if updating licence to one that already exists on another driver
-    if driver.drivers_licence:
-        existing_driver = db.query(Driver).filter(
-            Driver.drivers_licence == driver.drivers_licence,
-            Driver.driver_id != driver_id
-        ).first()
-        if existing_driver:
-            raise HTTPException(status_code=409, detail="A driver with this licence already exists")
-    # Update the driver
-    update_data = driver.model_dump(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_driver, key, value)
-    db.commit()
-    db.refresh(db_driver)
-    return db_driver
\ No newline at end of file
+async def update_driver(driver_id: int, driver: DriverUpdate, db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    update_data = driver.model_dump(exclude_unset=True, exclude={"version"})
+    columns = schema_columns(Driver, DriverResponse)
+    # Nothing to change, the driver is returned without a write, a new version or a change sequence number
+    if not update_data:
+        return (await current_versioned(db, Driver, Driver.driver_id, driver_id, driver.version, columns, "Driver"))._mapping
+    # Licence uniqueness is enforced by the uq_driver_drivers_licence index
+    async with licence_conflicts(db):
+        values = dict(update_data, change_seq=change_seq(db, Driver))
+        db_driver = await update_versioned(db, Driver, Driver.driver_id, driver_id, values, driver.version, columns, "Driver")
+        # Driver names are copied into the citizen notice read model
+        if update_data.keys() & {"first_name", "last_name"}:
+            await refresh_citizen_notices(db, CorrectionNotice.driver_id == driver_id)
+        await emit(db, "driver.updated", {"driver_id": driver_id, "fields": sorted(update_data)})
+        await db.commit()
+    refresh_cached_driver(driver_id, DriverResponse.model_validate(db_driver._mapping))
+    return db_driver._mapping
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List
+from app.db.replicas import get_read_db
+from app.models.models import CitizenNotice
+from app.schemas.schemas import CitizenNoticeResponse, TokenData
+from app.core.deps import get_token_data
+from app.core.responses import schema_columns, rows_response
+
+# Citizen API Router
+router = APIRouter(
+    prefix="/me",
+    tags=["Citizen"]
+)
+
+# GET /me/notices
+# Get the notices issued to vehicles owned by the current user, newest first
+# Reads the citizen_notice read model, so this is a single indexed read with no joins
+# The rows are the response shape, so they are encoded directly without validation
+@router.get("/notices", response_model=List[CitizenNoticeResponse])
+async def get_my_notices(skip: int = Query(0, ge=0), limit: int = Query(100, ge=1, le=1000), db: AsyncSession = Depends(get_read_db), current_user: TokenData = Depends(get_token_data)):
+    result = await db.execute(
+        select(*schema_columns(CitizenNotice, CitizenNoticeResponse))
+        .filter(CitizenNotice.owner_username == current_user.username)
+        .order_by(CitizenNotice.violation_date.desc(), CitizenNotice.notice_violation_id.desc())
+        .offset(skip)
+        .limit(limit)
+    )
+    return rows_response(result)
\ No newline at end of file
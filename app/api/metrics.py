@@ -0,0 +1,11 @@
+from fastapi import APIRouter, Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+
+# Metrics API Router
+router = APIRouter(tags=["Metrics"])
+
+# GET /metrics
+# Prometheus scrape endpoint
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
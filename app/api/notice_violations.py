@@ -1,8 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
-from app.models.models import NoticeViolation, APIUser
+from app.models.models import NoticeViolation, CorrectionNotice
+from app.db.lookups import notice_driver_id, existing_violation_types
+from app.schemas.schemas import NoticeViolationBatchCreate, NoticeViolationBatchDelete, TokenData
 from app.core.deps import get_user_officer
+from app.core.idempotency import idempotency
+from app.services.offender_stats import adjust_violation_counts
+from app.services.citizen_notices import refresh_citizen_notices
+from app.services.notice_violations import delete_notice_violations
+from app.services.sync import change_seq
+from app.services.outbox import emit
 
 # Notice Violation API Router
 router = APIRouter(
@@ -10,17 +19,59 @@ router = APIRouter(
     tags=["Violations Within a Correction Notice"]
 )
 
+# POST /notice-violations
+# Add violations to a correction notice, inserted with a single statement
+# Only officers can add notice violations
+@router.post("/", status_code=201, dependencies=[Depends(idempotency)])
+async def create_violations(batch: NoticeViolationBatchCreate, db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    # Validate the notice and every violation type, one query each
+    driver_id = await notice_driver_id(db, batch.correction_notice_id)
+    if driver_id is None:
+        raise HTTPException(status_code=404, detail="Correction notice not found")
+    violation_types = await existing_violation_types(db, set(batch.violation_type_ids))
+    if any(v not in violation_types for v in batch.violation_type_ids):
+        raise HTTPException(status_code=404, detail="Violation type not found")
+    # Add the violations
+    seq = change_seq(db, NoticeViolation)
+    await db.execute(insert(NoticeViolation).values([
+        {"correction_notice_id": batch.correction_notice_id, "violation_type_id": violation_type_id, "change_seq": seq}
+        for violation_type_id in batch.violation_type_ids
+    ]))
+    # Keep the frequent offender summary and the citizen notice read model in step
+    await adjust_violation_counts(db, {driver_id: len(batch.violation_type_ids)})
+    await refresh_citizen_notices(db, CorrectionNotice.correction_notice_id == batch.correction_notice_id)
+    await emit(db, "notice_violation.created", {"correction_notice_id": batch.correction_notice_id, "violation_type_ids": batch.violation_type_ids})
+    await db.commit()
+    return {"correction_notice_id": batch.correction_notice_id, "created": len(batch.violation_type_ids)}
+
+# DELETE /notice-violations
+# Delete a list of notice violations, or every violation on a correction notice, with a single DELETE
+# Only officers can delete notice violations
+@router.delete("/")
+async def delete_violations(batch: NoticeViolationBatchDelete, db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    # Exactly one way of selecting the violations must be given
+    if (batch.notice_violation_ids is None) == (batch.correction_notice_id is None):
+        raise HTTPException(status_code=422, detail="Provide either notice_violation_ids or correction_notice_id")
+    if batch.notice_violation_ids is not None:
+        condition = NoticeViolation.notice_violation_id.in_(set(batch.notice_violation_ids))
+        payload = {"notice_violation_ids": batch.notice_violation_ids}
+    else:
+        condition = NoticeViolation.correction_notice_id == batch.correction_notice_id
+        payload = {"correction_notice_id": batch.correction_notice_id}
+    deleted = await delete_notice_violations(db, condition)
+    if deleted:
+        await emit(db, "notice_violation.deleted", payload)
+    await db.commit()
+    return {"deleted": deleted}
+
 # DELETE /notice-violations/{notice_violation_id}
 # Delete a notice violation
 # Only officers can delete notice violations
 @router.delete("/{notice_violation_id}")
-def delete_violation(notice_violation_id: int, db: Session = Depends(get_db), current_user: APIUser = Depends(get_user_officer)):
-    # Find the notice violation to delete
-    db_notice_violation = db.query(NoticeViolation).filter(NoticeViolation.notice_violation_id == notice_violation_id).first()
-    # If notice violation not found, raise 404 error
-    if not db_notice_violation:
+async def delete_violation(notice_violation_id: int, db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    # Delete the notice violation, nothing deleted means it doesn't exist
+    if not await delete_notice_violations(db, NoticeViolation.notice_violation_id == notice_violation_id):
         raise HTTPException(status_code=404, detail="Notice violation not found")
-    # Delete the notice violation
-    db.delete(db_notice_violation)
-    db.commit()
-    return {"message": f"Notice violation {notice_violation_id} deleted successfully"}
\ No newline at end of file
+    await emit(db, "notice_violation.deleted", {"notice_violation_ids": [notice_violation_id]})
+    await db.commit()
+    return {"message": f"Notice violation {notice_violation_id} deleted successfully"}
@@ -0,0 +1,63 @@
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from app.db.replicas import get_read_db
+from app.models.models import Driver, Vehicle
+from app.schemas.schemas import DriverResponse, VehicleResponse, SearchPage, TokenData
+from app.core.deps import get_user_officer
+from app.services.search_index import query_terms, search_statement, by_selectivity
+
+# Search API Router
+router = APIRouter(
+    prefix="/search",
+    tags=["Search"]
+)
+
+MAX_SEARCH_TERMS = 5
+
+# GET /search
+# Search drivers and vehicles by name, driver's licence, plate or VIN, e.g. ?q=smith or ?q=DMK 47
+# Every word must match the start of a word in the record, results are ranked and paginated
+# A search of only two letter words matches them as whole words, so it doesn't read every word they start
+# Only officers can search
+@router.get("/", response_model=SearchPage, response_model_exclude_none=True)
+async def search(
+    q: str = Query(..., min_length=2, max_length=100),
+    kind: Optional[Literal["driver", "vehicle"]] = None,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenData = Depends(get_user_officer)
+):
+    terms = query_terms(q)[:MAX_SEARCH_TERMS]
+    if not terms:
+        raise HTTPException(status_code=422, detail="Search for at least one word of two or more characters")
+    terms = await by_selectivity(db, terms, kind)
+    # Fetch one extra match to know whether there is a next page
+    matches = (await db.execute(search_statement(terms, kind).offset(skip).limit(limit + 1))).all()
+    has_more = len(matches) > limit
+    matches = matches[:limit]
+    # Load the matching records, one query per kind
+    driver_ids = {m.entity_id for m in matches if m.kind == "driver"}
+    vehicle_ids = {m.entity_id for m in matches if m.kind == "vehicle"}
+    drivers = {}
+    if driver_ids:
+        drivers = {d.driver_id: d for d in (await db.execute(select(Driver).filter(Driver.driver_id.in_(driver_ids)))).scalars()}
+    vehicles = {}
+    if vehicle_ids:
+        result = await db.execute(select(Vehicle).filter(Vehicle.vehicle_id.in_(vehicle_ids)).options(joinedload(Vehicle.owner, innerjoin=True)))
+        vehicles = {v.vehicle_id: v for v in result.scalars()}
+    items = []
+    for match in matches:
+        item = {"kind": match.kind, "id": match.entity_id, "rank": match.rank}
+        if match.kind == "driver" and match.entity_id in drivers:
+            item["driver"] = DriverResponse.model_validate(drivers[match.entity_id], from_attributes=True)
+        elif match.kind == "vehicle" and match.entity_id in vehicles:
+            item["vehicle"] = VehicleResponse.model_validate(vehicles[match.entity_id], from_attributes=True)
+        else:
+            # The index is ahead of this replica, skip the record
+            continue
+        items.append(item)
+    return {"items": items, "has_more": has_more}
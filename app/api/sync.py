@@ -0,0 +1,30 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.replicas import get_read_db
+from app.schemas.schemas import SyncPage, TokenData
+from app.core.deps import get_user_officer
+from app.core.responses import json_response
+from app.services.sync import changes_since, current_change_seq
+
+# Sync API Router
+router = APIRouter(
+    prefix="/sync",
+    tags=["Sync"]
+)
+
+# GET /sync
+# Drivers, vehicles, correction notices and notice violations written or deleted after a cursor
+# Without since, returns only the current cursor: take it before the first full load, then sync from it
+# Call again with the returned cursor while has_more is true
+# Only officers can sync
+@router.get("/", response_model=SyncPage)
+async def sync(
+    since: Optional[int] = Query(None, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: TokenData = Depends(get_user_officer)
+):
+    if since is None:
+        return json_response({"changes": {}, "deleted": {}, "cursor": await current_change_seq(db), "has_more": False})
+    return json_response(await changes_since(db, since, limit))
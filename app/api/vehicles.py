@@ -1,8 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
-from app.models.models import Vehicle, APIUser
+from app.db.lookups import exists, VEHICLE_HAS_NOTICES
+from app.models.models import Vehicle, CorrectionNotice, NoticeViolation
+from app.schemas.schemas import TokenData
 from app.core.deps import get_user_officer
+from app.core.metrics import query_budget
+from app.services.notice_violations import delete_notice_violations
+from app.services.outbox import emit
+from app.services.sync import record_tombstones
 
 # Vehicle API Router
 router = APIRouter(
@@ -12,15 +19,33 @@ router = APIRouter(
 
 # DELETE /vehicles/{vehicle_id}
 # Delete a vehicle from the database
+# A vehicle with correction notices is only deleted with cascade=true, which deletes its notices and their violations too
+# Everything is deleted with set-based statements in one transaction, leaving tombstones for GET /sync
 # Only officers can delete vehicles
-@router.delete("/{vehicle_id}")
-def delete_vehicle(vehicle_id: int, db: Session = Depends(get_db), current_user: APIUser = Depends(get_user_officer)):
-    # Find the vehicle to delete
-    db_vehicle = db.query(Vehicle).filter(Vehicle.vehicle_id == vehicle_id).first()
-    # If vehicle not found, raise 404 error
-    if not db_vehicle:
+@router.delete("/{vehicle_id}", dependencies=[Depends(query_budget(20))])
+async def delete_vehicle(vehicle_id: int, cascade: bool = False, db: AsyncSession = Depends(get_db), current_user: TokenData = Depends(get_user_officer)):
+    # Check for dependent notices with SELECT 1 ... LIMIT 1, they are only counted for the error
+    has_notices = await exists(db, VEHICLE_HAS_NOTICES, vehicle_id)
+    if has_notices and not cascade:
+        notices = (await db.execute(select(func.count()).select_from(CorrectionNotice).filter(CorrectionNotice.vehicle_id == vehicle_id))).scalar()
+        raise HTTPException(status_code=409, detail=f"Vehicle has {notices} correction notices, delete with cascade=true to remove them")
+    notices = deleted_violations = 0
+    if has_notices:
+        notice_ids = select(CorrectionNotice.correction_notice_id).filter(CorrectionNotice.vehicle_id == vehicle_id)
+        deleted_violations = await delete_notice_violations(db, NoticeViolation.correction_notice_id.in_(notice_ids))
+        await record_tombstones(db, CorrectionNotice, CorrectionNotice.vehicle_id == vehicle_id)
+        result = await db.execute(delete(CorrectionNotice).filter(CorrectionNotice.vehicle_id == vehicle_id).execution_options(synchronize_session=False))
+        notices = result.rowcount
+    # Delete the vehicle, nothing deleted means it doesn't exist
+    await record_tombstones(db, Vehicle, Vehicle.vehicle_id == vehicle_id)
+    result = await db.execute(delete(Vehicle).filter(Vehicle.vehicle_id == vehicle_id).execution_options(synchronize_session=False))
+    if not result.rowcount:
+        await db.rollback()
         raise HTTPException(status_code=404, detail="Vehicle not found")
-    # Delete the vehicle
-    db.delete(db_vehicle)
-    db.commit()
-    return {"message": f"Vehicle {vehicle_id} deleted successfully"}
\ No newline at end of file
+    await emit(db, "vehicle.deleted", {"vehicle_id": vehicle_id, "deleted_correction_notices": notices, "deleted_notice_violations": deleted_violations})
+    await db.commit()
+    return {
+        "message": f"Vehicle {vehicle_id} deleted successfully",
+        "deleted_correction_notices": notices,
+        "deleted_notice_violations": deleted_violations,
+    }
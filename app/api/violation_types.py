@@ -1,9 +1,7 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Request, Response
 from typing import List
-from app.db.database import get_db
-from app.models.models import ViolationType
 from app.schemas.schemas import ViolationTypeResponse
+from app.services.violation_catalog import violation_catalog
 
 # Violation Type API Router
 router = APIRouter(
@@ -11,9 +9,21 @@ router = APIRouter(
     tags=["Violation Types"]
 )
 
+# Checks an If-None-Match header against the current ETag
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in tags
+
 # GET /violation-types
 # Get all violation types
+# Served from the in-process catalog cache, clients can revalidate with If-None-Match to get a 304
 @router.get("/", response_model=List[ViolationTypeResponse])
-def get_violation_types(db: Session = Depends(get_db)):
-    violations = db.query(ViolationType).all()
-    return violations
\ No newline at end of file
+async def get_violation_types(request: Request):
+    body, etag = await violation_catalog.get()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
\ No newline at end of file
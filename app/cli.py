@@ -0,0 +1,95 @@
+import argparse
+import asyncio
+from sqlalchemy import select
+from app.db.database import SessionLocal, dispose_engine
+from app.db.migrations import upgrade
+from app.models import models
+from app.core.security import hash_password_async
+from app.services.offender_stats import rebuild_violation_counts
+from app.services.citizen_notices import rebuild_citizen_notices
+from app.services.search_index import rebuild_search_index  # also registers its outbox handlers
+from app.services.outbox import drain, run_worker
+from app.core.idempotency import purge_expired_keys
+from app.services.analytics import export_notice_violations, ANALYTICS_EXPORT_DIR, EXPORT_CHUNK_SIZE, EXPORT_LATE_WINDOW
+
+'''
+Database administration commands
+These run once per database, not on every app start, so workers start without touching the database.
+
+Usage:
+python -m app.cli init-db
+python -m app.cli rebuild-read-models
+python -m app.cli export-analytics [--full] [--directory ./analytics] [--chunk-size 50000]
+python -m app.cli outbox-worker [--once]
+python -m app.cli purge-idempotency-keys
+'''
+
+# Create sample accounts for testing
+async def create_sample_accounts():
+    async with SessionLocal() as db:
+        # If no users exist, create sample accounts
+        if not (await db.execute(select(models.APIUser))).scalars().first():
+            officer = models.APIUser(
+                username="s_scott@localhost", 
+                password=await hash_password_async("password"), 
+                role="officer"
+            )
+            citizen = models.APIUser(
+                username="d_kroenke@localhost", 
+                password=await hash_password_async("password"), 
+                role="citizen"
+            )
+            db.add(officer)
+            db.add(citizen)
+            await db.commit()
+
+# Recomputes the frequent offender summary, citizen notice read model and search index
+# Needed after notices are written outside the API, e.g. by NYSP_Corrections_DB.sql
+async def rebuild_read_models():
+    async with SessionLocal() as db:
+        await rebuild_violation_counts(db)
+    async with SessionLocal() as db:
+        await rebuild_citizen_notices(db)
+    async with SessionLocal() as db:
+        await rebuild_search_index(db)
+
+# Applies migrations, creates the sample accounts and builds the read models
+async def init_db():
+    applied = await upgrade()
+    for number, description in applied:
+        print(f"Applied migration {number}: {description}")
+    await create_sample_accounts()
+    await rebuild_read_models()
+
+async def run(args):
+    try:
+        if args.command == "init-db":
+            await init_db()
+        elif args.command == "rebuild-read-models":
+            await rebuild_read_models()
+        elif args.command == "purge-idempotency-keys":
+            print(f"Deleted {await purge_expired_keys()} expired idempotency keys")
+        elif args.command == "outbox-worker":
+            if args.once:
+                print(f"Processed {await drain()} outbox events")
+            else:
+                await run_worker()
+        else:
+            exported = await export_notice_violations(args.directory, args.chunk_size, args.full)
+            print(f"Exported {exported} notice violations to {args.directory}")
+    finally:
+        await dispose_engine()
+
+def main():
+    parser = argparse.ArgumentParser(description="Database administration commands")
+    parser.add_argument("command", choices=["init-db", "rebuild-read-models", "export-analytics", "outbox-worker", "purge-idempotency-keys"])
+    parser.add_argument("--full", action="store_true", help=f"Export everything again instead of continuing from the last export, picks up changed notices and rows that committed more than {EXPORT_LATE_WINDOW} ids late")
+    parser.add_argument("--directory", default=ANALYTICS_EXPORT_DIR)
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    parser.add_argument("--once", action="store_true", help="Deliver the available outbox events and exit instead of running until stopped")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+    print("Done")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import asyncio
+from collections import OrderedDict
+from time import monotonic
+
+'''
+Small in-process cache used to avoid repeating database reads
+Entries expire after a fixed time to live, and the least recently used
+entry is evicted once the cache is full
+SingleFlight coalesces concurrent loads of the same key, so a burst of misses runs one query
+'''
+
+# Bounded TTL/LRU cache
+class TTLCache:
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+
+    # Returns the cached value, or the default if missing or expired
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        expires, value = entry
+        if expires < monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    # Stores a value, evicting the least recently used entry if full
+    def set(self, key, value):
+        self._data[key] = (monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    # Removes a single entry
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    # Removes every entry
+    def clear(self):
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+# Coalesces concurrent calls for the same key into one call
+# Callers arriving while a call is running wait for its result instead of starting another
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+
+    # Returns the result of func(), shared with every concurrent caller using the same key
+    # The call runs as its own task, so a caller that is cancelled doesn't cancel it for the others
+    async def do(self, key, func):
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget_task(key, done))
+        return await asyncio.shield(task)
+
+    # Makes the next call for the key start a new call, even if one is still running
+    def forget(self, key):
+        self._calls.pop(key, None)
+
+    def _forget_task(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def __contains__(self, key):
+        return key in self._calls
+
+    def __len__(self):
+        return len(self._calls)
@@ -0,0 +1,148 @@
+import zlib
+from os import getenv
+from typing import Optional
+import anyio.to_thread
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+
+'''
+Negotiated response compression
+Responses at or over the minimum size are compressed with brotli or gzip, whichever the client
+accepts with the higher q-value (brotli on a tie), and smaller ones are sent as they are.
+Levels default to fast settings, dynamic JSON compresses well before the slow levels pay off.
+Streamed responses are compressed chunk by chunk, flushing after each chunk so clients get data as it's sent.
+The responder is written against the ASGI spec only, Starlette's own GZip responders aren't public API.
+'''
+
+COMPRESSION_MINIMUM_SIZE = int(getenv("COMPRESSION_MINIMUM_SIZE", "1000"))
+GZIP_LEVEL = int(getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(getenv("BROTLI_QUALITY", "4"))
+# Chunks at least this large are compressed in a worker thread instead of on the event loop
+COMPRESSION_THREAD_MINIMUM_SIZE = 128 * 1024
+
+# Returns "br", "gzip" or None for an Accept-Encoding header
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[coding.strip().lower()] = quality
+    wildcard = weights.get("*", 0.0)
+    br = weights.get("br", wildcard)
+    gzip = weights.get("gzip", wildcard)
+    if br > 0 and br >= gzip:
+        return "br"
+    if gzip > 0:
+        return "gzip"
+    return None
+
+# Media types that are already compressed, or streamed to clients that read each event as it arrives
+UNCOMPRESSED_MEDIA_TYPES = {"text/event-stream", "application/zip", "application/gzip", "image/*", "audio/*", "video/*", "font/*"}
+
+class GzipCompressor:
+    encoding = "gzip"
+
+    def __init__(self, level: int):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        if more_body:
+            return self.compressor.compress(body) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        return self.compressor.compress(body) + self.compressor.flush()
+
+class BrotliCompressor:
+    encoding = "br"
+
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        if more_body:
+            return self.compressor.process(body) + self.compressor.flush()
+        return self.compressor.process(body) + self.compressor.finish()
+
+# Wraps send for one response, compressing its body with the compressor, or only adding Vary without one
+# The start message is held back until the first body chunk, which decides the headers
+class CompressionResponder:
+    def __init__(self, send, minimum_size: int, compressor=None):
+        self.send = send
+        self.minimum_size = minimum_size
+        self.compressor = compressor
+        self.start = None
+        # None until the first body chunk, then whether the body is compressed
+        self.compressing = None
+
+    async def __call__(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            media_type = headers.get("content-type", "").partition(";")[0].strip().lower()
+            passthrough = (
+                "content-encoding" in headers or message["status"] == 206
+                or media_type in UNCOMPRESSED_MEDIA_TYPES or media_type.partition("/")[0] + "/*" in UNCOMPRESSED_MEDIA_TYPES
+            )
+            if passthrough:
+                self.compressing = False
+                await self.send(message)
+            else:
+                self.start = message
+        elif kind == "http.response.body" and self.compressing is None:
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableHeaders(raw=self.start["headers"])
+            if len(body) >= self.minimum_size or more_body:
+                headers.add_vary_header("Accept-Encoding")
+                self.compressing = self.compressor is not None
+            else:
+                self.compressing = False
+            if self.compressing:
+                body = await self.compress(body, more_body)
+                headers["Content-Encoding"] = self.compressor.encoding
+                if more_body or self.start.get("trailers", False):
+                    del headers["Content-Length"]
+                else:
+                    headers["Content-Length"] = str(len(body))
+                message = {**message, "body": body}
+            await self.send(self.start)
+            await self.send(message)
+        elif kind == "http.response.body" and self.compressing:
+            await self.send({**message, "body": await self.compress(message.get("body", b""), message.get("more_body", False))})
+        else:
+            # Uncompressed bodies, file responses (http.response.pathsend) and trailers
+            if self.start is not None and self.compressing is None:
+                self.compressing = False
+                await self.send(self.start)
+            await self.send(message)
+
+    # Large chunks are compressed in a worker thread instead of on the event loop
+    async def compress(self, body: bytes, more_body: bool) -> bytes:
+        if len(body) >= COMPRESSION_THREAD_MINIMUM_SIZE:
+            return await anyio.to_thread.run_sync(self.compressor.compress, body, more_body)
+        return self.compressor.compress(body, more_body)
+
+# Pure ASGI middleware picking a compressor per request from the Accept-Encoding header
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE, gzip_level: int = GZIP_LEVEL, brotli_quality: int = BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("Accept-Encoding", ""))
+        if encoding == "br":
+            compressor = BrotliCompressor(self.brotli_quality)
+        elif encoding == "gzip":
+            compressor = GzipCompressor(self.gzip_level)
+        else:
+            compressor = None
+        await self.app(scope, receive, CompressionResponder(send, self.minimum_size, compressor))
@@ -1,17 +1,39 @@
+from os import getenv
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.database import get_db
+from app.db.lookups import user_by_id
 from app.models.models import APIUser
+from app.schemas.schemas import TokenData
 from app.core.security import SECRET_KEY, ALGORITHM
+from app.core.cache import TTLCache
 
 
 # OAuth2PasswordBearer for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/token")
 
-# Extracts token, decodes it, and returns the username
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Cache of user rows keyed by user ID, for routes that need the full user
+user_cache = TTLCache(
+    maxsize=int(getenv("USER_CACHE_SIZE", "1024")),
+    ttl=float(getenv("USER_CACHE_TTL", "300"))
+)
+
+# Removes a user from the cache, must be called whenever a user is changed
+def invalidate_cached_user(user_id: int):
+    user_cache.invalidate(user_id)
+
+# Invalidate cached users automatically when they are updated or deleted through the ORM
+@event.listens_for(APIUser, "after_update")
+@event.listens_for(APIUser, "after_delete")
+def _invalidate_changed_user(mapper, connection, target):
+    invalidate_cached_user(target.api_user_id)
+
+# Decodes a token and returns its signed claims
+# Only tokens of the expected type are accepted, so a refresh token can't be used as an access token
+def decode_token(token: str, token_type: str = "access") -> TokenData:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -21,22 +43,50 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        user_id: int = payload.get("uid")
+        role: str = payload.get("role")
+        if payload.get("type") != token_type or username is None or user_id is None:
+            raise credentials_exception
+        # Access tokens issued before role claims were added must be renewed
+        if token_type == "access" and role is None:
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    # Find user by username, raise exception if user not found
-    user = db.query(APIUser).filter(APIUser.username == username).first()
+    return TokenData(username=username, user_id=user_id, role=role)
+
+# Extracts token, decodes it, and returns the signed claims
+# No database round-trip, the user ID and role are carried in the token
+def get_token_data(token: str = Depends(oauth2_scheme)) -> TokenData:
+    return decode_token(token)
+
+# Loads a user row by ID, from the cache where possible
+async def load_user(user_id: int, db: AsyncSession):
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    # Find user by ID, raise exception if user not found
+    user = await user_by_id(db, user_id)
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    # Detach the row so it can be shared between requests
+    db.expunge(user)
+    user_cache.set(user_id, user)
     return user
 
-# Checks if the current user is an officer
+# Returns the full user row for the token, from the cache where possible
+async def get_current_user(token_data: TokenData = Depends(get_token_data), db: AsyncSession = Depends(get_db)):
+    return await load_user(token_data.user_id, db)
 
-def get_user_officer(current_user: APIUser = Depends(get_current_user)):
-    if current_user.role != "officer":
+# Checks if the current user is an officer
+# Uses the role claim, so no database query is needed
+async def get_user_officer(token_data: TokenData = Depends(get_token_data)):
+    if token_data.role != "officer":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only officers can access this resource."
         )
-    return current_user
\ No newline at end of file
+    return token_data
\ No newline at end of file
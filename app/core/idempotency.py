@@ -0,0 +1,157 @@
+import hashlib
+from datetime import datetime, timedelta
+from os import getenv
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import update, delete, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.cache import TTLCache
+from app.core.deps import get_token_data
+from app.core.metrics import IDEMPOTENT_REQUESTS
+from app.db.database import get_db, SessionLocal
+from app.db.lookups import idempotency_key
+from app.models.models import IdempotencyKey
+from app.schemas.schemas import TokenData
+
+'''
+Idempotency-Key support for POST routes
+The idempotency dependency inserts the key into the route's own session, so it is committed with the write
+and rolled back with it, and a retry of a committed request can never write again.
+IdempotencyMiddleware records the response on the key once it has been sent.
+A retry with the same key and body replays the recorded response, from the in-memory cache when the
+key was seen by this process, otherwise with one indexed lookup, without running the route.
+A retry that arrives while the first request is still running gets a 409 and should retry later.
+A key with no recorded response after IDEMPOTENCY_LEASE_SECONDS belongs to a request whose write committed
+but whose response was lost (the process stopped before recording it), retries get a 422 instead of waiting.
+Keys are scoped to the user and route, and are kept for IDEMPOTENCY_KEY_TTL seconds.
+'''
+
+IDEMPOTENCY_KEY_TTL = int(getenv("IDEMPOTENCY_KEY_TTL", "86400"))
+# Seconds a request has to record its response, longer than any request should take
+IDEMPOTENCY_LEASE_SECONDS = int(getenv("IDEMPOTENCY_LEASE_SECONDS", "60"))
+MAX_KEY_LENGTH = 255
+
+# Recorded responses by (scope, key), as (request hash, status code, body)
+response_cache = TTLCache(
+    maxsize=int(getenv("IDEMPOTENCY_CACHE_SIZE", "10000")),
+    ttl=IDEMPOTENCY_KEY_TTL
+)
+
+# Raised by the dependency to answer a retry with the recorded response, handled in app.main
+class IdempotentReplay(Exception):
+    def __init__(self, status_code: int, body: str):
+        self.status_code = status_code
+        self.body = body
+
+    def response(self) -> Response:
+        return Response(content=self.body, status_code=self.status_code, media_type="application/json", headers={"Idempotent-Replayed": "true"})
+
+# Error for a retry that arrived before the first request's response was recorded
+def in_progress() -> HTTPException:
+    IDEMPOTENT_REQUESTS.labels("in_progress").inc()
+    return HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress", headers={"Retry-After": "1"})
+
+# Error for a retry of a request that committed without recording its response, retrying won't change the answer
+def response_lost() -> HTTPException:
+    IDEMPOTENT_REQUESTS.labels("lost").inc()
+    return HTTPException(
+        status_code=422,
+        detail="The request with this Idempotency-Key was applied but its response was lost, check the result before sending it again with a new key"
+    )
+
+# Checks a recorded request against a retry, raising the replay or the error to return instead
+def replay(request_hash: str, recorded_hash: str, status_code, body, created_at=None):
+    if recorded_hash != request_hash:
+        IDEMPOTENT_REQUESTS.labels("mismatch").inc()
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    if status_code is None:
+        if created_at is not None and created_at < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS):
+            raise response_lost()
+        raise in_progress()
+    IDEMPOTENT_REQUESTS.labels("replayed").inc()
+    raise IdempotentReplay(status_code, body)
+
+# Dependency for POST routes, does nothing unless the request has an Idempotency-Key header
+# Must share the route's session (Depends(get_db)), so the key commits or rolls back with the write
+async def idempotency(request: Request, db: AsyncSession = Depends(get_db), token_data: TokenData = Depends(get_token_data)):
+    key = request.headers.get("Idempotency-Key")
+    if key is None:
+        return
+    if not 0 < len(key) <= MAX_KEY_LENGTH:
+        raise HTTPException(status_code=422, detail=f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters")
+    scope = f"{token_data.user_id} {request.method} {request.scope['route'].path}"
+    request_hash = hashlib.sha256(request.url.query.encode() + b"\n" + await request.body()).hexdigest()
+    cached = response_cache.get((scope, key))
+    if cached is not None:
+        replay(request_hash, *cached)
+    recorded = await idempotency_key(db, scope, key)
+    now = datetime.utcnow()
+    if recorded is not None:
+        if recorded.created_at > now - timedelta(seconds=IDEMPOTENCY_KEY_TTL):
+            replay(request_hash, recorded.request_hash, recorded.status_code, recorded.response, recorded.created_at)
+        await db.execute(delete(IdempotencyKey).filter(IdempotencyKey.scope == scope, IdempotencyKey.key == key))
+    try:
+        result = await db.execute(insert(IdempotencyKey).values(scope=scope, key=key, request_hash=request_hash, created_at=now))
+    except IntegrityError:
+        # Another request with the key got there first and hasn't finished
+        await db.rollback()
+        raise in_progress()
+    IDEMPOTENT_REQUESTS.labels("new").inc()
+    request.state.idempotency_key = (result.inserted_primary_key[0], scope, key, request_hash)
+
+# Records the response of requests that claimed an idempotency key
+# Added inside compression, so the recorded body is the uncompressed JSON
+# Requests without the header are passed through, their responses aren't buffered
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or not any(name == b"idempotency-key" for name, _ in scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+        response = {"status": None, "body": [], "complete": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+                response["complete"] = not message.get("more_body", False)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Recorded even when the client went away while it was sent, the write has committed either way
+            # A response that wasn't produced in full is left unrecorded, retries then get the in progress or lost error
+            await self.record(scope, response)
+
+    async def record(self, scope, response: dict):
+        claimed = scope.get("state", {}).get("idempotency_key")
+        if claimed is None or not response["complete"]:
+            return
+        idempotency_key_id, key_scope, key, request_hash = claimed
+        body = b"".join(response["body"]).decode()
+        # Nothing is updated if the route rolled back, the key went with the write and a retry runs again
+        async with SessionLocal() as db:
+            result = await db.execute(
+                update(IdempotencyKey)
+                .filter(IdempotencyKey.idempotency_key_id == idempotency_key_id)
+                .values(status_code=response["status"], response=body)
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        if result.rowcount:
+            response_cache.set((key_scope, key), (request_hash, response["status"], body))
+
+# Deletes keys older than IDEMPOTENCY_KEY_TTL and returns how many were deleted
+async def purge_expired_keys() -> int:
+    async with SessionLocal() as db:
+        result = await db.execute(
+            delete(IdempotencyKey)
+            .filter(IdempotencyKey.created_at < datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_KEY_TTL))
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    return result.rowcount
@@ -0,0 +1,153 @@
+import logging
+from contextvars import ContextVar
+from os import getenv
+from time import perf_counter
+from fastapi import Request
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+
+'''
+Request and database performance metrics, exposed in Prometheus format on /metrics
+MetricsMiddleware times each request by route template, and SQLAlchemy engine events
+count and time the queries run while handling it
+'''
+
+logger = logging.getLogger(__name__)
+
+# Requests running more queries than this are counted as a likely N+1 pattern, unless their route sets a query_budget
+N_PLUS_ONE_QUERY_THRESHOLD = int(getenv("N_PLUS_ONE_QUERY_THRESHOLD", "10"))
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by route",
+    ["method", "route", "status"]
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests currently being handled, by first path segment",
+    ["method", "prefix"]
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size by route",
+    ["method", "route"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+)
+REQUEST_QUERIES = Histogram(
+    "db_queries_per_request", "Database queries run per request",
+    ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100)
+)
+REQUEST_DB_TIME = Histogram(
+    "db_time_per_request_seconds", "Time spent in database queries per request",
+    ["method", "route"]
+)
+N_PLUS_ONE_REQUESTS = Counter(
+    "db_n_plus_one_requests_total", "Requests that ran more queries than the N+1 threshold",
+    ["method", "route"]
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds", "Database query latency"
+)
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time waiting for a connection from the pool",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+REPLICA_UP = Gauge(
+    "db_replica_up", "Whether a read replica passed its last health check",
+    ["replica"]
+)
+READ_SESSIONS = Counter(
+    "db_read_sessions_total", "Read-only sessions opened, by the database they read from",
+    ["target"]
+)
+CACHE_LOOKUPS = Counter(
+    "cache_lookups_total", "Cache lookups by result, coalesced lookups waited for a query another request started",
+    ["cache", "result"]
+)
+RATE_LIMITED_REQUESTS = Counter(
+    "rate_limited_requests_total", "Requests rejected by the rate limiter"
+)
+OUTBOX_EVENTS = Counter(
+    "outbox_events_total", "Outbox events by topic and result (delivered, retried or failed)",
+    ["topic", "result"]
+)
+IDEMPOTENT_REQUESTS = Counter(
+    "idempotent_requests_total", "POST requests with an Idempotency-Key, by result (new, replayed, in_progress, lost or mismatch)",
+    ["result"]
+)
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds", "Time spent hashing or verifying a password, including the wait for the pool"
+)
+
+# Query statistics for the current request, a [count, seconds] pair
+request_queries = ContextVar("request_queries", default=None)
+
+# Adds query counting and timing to an engine
+def instrument_engine(engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = perf_counter() - context._query_start
+        QUERY_LATENCY.observe(elapsed)
+        stats = request_queries.get()
+        if stats is not None:
+            stats[0] += 1
+            stats[1] += elapsed
+
+# Route dependency replacing the N+1 threshold for the route's requests
+# For set-based bulk and cascade routes, which run more statements than a single-row route but the same number
+# whatever the batch size, so the threshold still catches a per-row query added to them later
+def query_budget(queries: int):
+    def set_query_budget(request: Request):
+        request.state.query_budget = queries
+    return set_query_budget
+
+# Pure ASGI middleware recording latency, in-flight requests, response size and queries per route
+# Labels use the route template (e.g. /drivers/{driver_id}) so the number of series stays bounded
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.prefixes = set()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        method = scope["method"]
+        path = scope["path"]
+        start = perf_counter()
+        stats = [0, 0.0]
+        token = request_queries.set(stats)
+        response = {"status": 500, "size": 0}
+        # The route is only known after routing, so in-flight requests are counted by router prefix
+        # Prefixes are learned from matched routes, anything else is "other" to keep the series bounded
+        prefix = "/" + path.split("/")[1]
+        in_flight = REQUESTS_IN_FLIGHT.labels(method, prefix if prefix in self.prefixes else "other")
+        in_flight.inc()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                response["size"] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            request_queries.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                route = route.path
+                self.prefixes.add(prefix)
+            else:
+                route = "unmatched"
+            REQUEST_LATENCY.labels(method, route, str(response["status"])).observe(perf_counter() - start)
+            RESPONSE_SIZE.labels(method, route).observe(response["size"])
+            REQUEST_QUERIES.labels(method, route).observe(stats[0])
+            REQUEST_DB_TIME.labels(method, route).observe(stats[1])
+            if stats[0] > scope.get("state", {}).get("query_budget", N_PLUS_ONE_QUERY_THRESHOLD):
+                N_PLUS_ONE_REQUESTS.labels(method, route).inc()
+                logger.warning("%s %s ran %d queries, likely an N+1 pattern", method, route, stats[0])
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+from importlib import import_module
+from math import ceil
+from os import getenv
+from time import monotonic
+from fastapi import HTTPException, Request, status
+from app.core.deps import decode_token
+from app.core.metrics import RATE_LIMITED_REQUESTS
+
+'''
+Token bucket rate limiting per client
+Each client gets a bucket of RATE_LIMIT_BURST requests that refills at RATE_LIMIT_PER_SECOND.
+Clients with a valid access token are limited per user, others per IP address
+(run uvicorn with --proxy-headers behind a load balancer so the address is the client's).
+
+Buckets are kept in memory by default, so each worker process limits on its own.
+RATE_LIMIT_BACKEND names a shared backend as "module:factory", the factory is called with no arguments
+and must return an object with the same take method as MemoryBucketBackend.
+'''
+
+# Requests per second per client, 0 turns rate limiting off
+RATE_LIMIT_PER_SECOND = float(getenv("RATE_LIMIT_PER_SECOND", "20"))
+RATE_LIMIT_BURST = int(getenv("RATE_LIMIT_BURST", "40"))
+RATE_LIMIT_BACKEND = getenv("RATE_LIMIT_BACKEND", "")
+# Buckets kept in memory, the least recently used client is forgotten (and starts with a full bucket)
+RATE_LIMIT_MAX_CLIENTS = int(getenv("RATE_LIMIT_MAX_CLIENTS", "100000"))
+
+# In-process token buckets, bounded by an LRU
+class MemoryBucketBackend:
+    def __init__(self, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+
+    # Takes a token from the client's bucket
+    # Returns 0 if the request is allowed, otherwise the seconds until a token is available
+    async def take(self, key: str, rate: float, burst: int) -> float:
+        now = monotonic()
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+# Creates the configured backend
+def load_backend(path: str):
+    if not path:
+        return MemoryBucketBackend()
+    module, _, factory = path.partition(":")
+    return getattr(import_module(module), factory)()
+
+rate_limiter = load_backend(RATE_LIMIT_BACKEND)
+
+# Identifies the client, by user for valid access tokens and by address otherwise
+# Invalid tokens fall back to the address, so made up tokens can't be used to get fresh buckets
+def client_key(request: Request) -> str:
+    authorization = request.headers.get("authorization", "")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() == "bearer" and token:
+        try:
+            return f"user:{decode_token(token).user_id}"
+        except HTTPException:
+            pass
+    return f"address:{request.client.host if request.client else 'unknown'}"
+
+# Dependency applied to every route, raises a 429 once the client's bucket is empty
+async def rate_limit(request: Request):
+    if RATE_LIMIT_PER_SECOND <= 0:
+        return
+    wait = await rate_limiter.take(client_key(request), RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+    if wait:
+        RATE_LIMITED_REQUESTS.inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests, please retry later",
+            headers={"Retry-After": str(ceil(wait))}
+        )
@@ -0,0 +1,55 @@
+import orjson
+from typing import List, Optional
+from fastapi import HTTPException, Response
+from pydantic import TypeAdapter
+
+'''
+Fast JSON responses for list endpoints
+By default FastAPI validates every returned object against response_model, runs the result
+through jsonable_encoder and encodes it with the standard json module. Endpoints can opt out of that
+by returning one of these responses, keeping response_model for the OpenAPI schema only.
+- rows_response: rows selected with schema_columns are already the response shape, so they are encoded with orjson as they are
+- ObjectListAdapter: ORM objects are validated once as a list with a TypeAdapter and encoded by pydantic-core
+Read routes take a fields parameter (e.g. ?fields=first_name,last_name) that narrows the selected columns.
+'''
+
+# Parses a comma-separated fields parameter into field names of a response schema, in the schema's order
+# No fields means all of them, the identifying field is always included so partial records can be matched up
+def parse_fields(fields: Optional[str], schema, identifier: str) -> list:
+    if not fields:
+        return list(schema.model_fields)
+    names = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = names - schema.model_fields.keys()
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown fields {', '.join(sorted(unknown))}, choose from {', '.join(schema.model_fields)}")
+    names.add(identifier)
+    return [name for name in schema.model_fields if name in names]
+
+# Selects a model's columns named by a response schema's fields, in the schema's order, or only the given fields
+# Rows of these columns can be returned with rows_response without validating them again
+def schema_columns(model, schema, fields: Optional[list] = None) -> list:
+    return [model.__table__.c[name] for name in (fields or schema.model_fields)]
+
+# Converts the rows of a result to dicts, ready for orjson
+def row_dicts(result) -> list:
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result.all()]
+
+# Encodes content with orjson, which handles dates, times and dicts of rows natively
+def json_response(content, status_code: int = 200, headers: dict = None) -> Response:
+    return Response(content=orjson.dumps(content), status_code=status_code, headers=headers, media_type="application/json")
+
+# Encodes the rows of a schema_columns query as a JSON list
+def rows_response(result) -> Response:
+    return json_response(row_dicts(result))
+
+# Validates and encodes a list of ORM objects in one pass
+class ObjectListAdapter:
+    def __init__(self, schema):
+        self.adapter = TypeAdapter(List[schema])
+
+    def dump_json(self, objects) -> bytes:
+        return self.adapter.dump_json(self.adapter.validate_python(objects, from_attributes=True))
+
+    def response(self, objects) -> Response:
+        return Response(content=self.dump_json(objects), media_type="application/json")
@@ -1,16 +1,32 @@
-from os import getenv
+import asyncio
+from os import getenv, cpu_count
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta, datetime
+from fastapi import HTTPException, status
 from jose import jwt
 from passlib.context import CryptContext
+from app.core.metrics import PASSWORD_HASH_LATENCY
 
 # Security configuration
 SECRET_KEY = getenv("SECRET_KEY", "1234567890")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = int(getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+
+# Password hashing pool configuration
+# bcrypt releases the GIL, so a thread pool uses every core without the cost of a process pool
+# Requests beyond workers + queue wait up to the timeout for a slot, then get a 503
+PASSWORD_HASH_WORKERS = int(getenv("PASSWORD_HASH_WORKERS", str(cpu_count() or 1)))
+PASSWORD_HASH_QUEUE = int(getenv("PASSWORD_HASH_QUEUE", str(PASSWORD_HASH_WORKERS * 4)))
+PASSWORD_HASH_TIMEOUT = float(getenv("PASSWORD_HASH_TIMEOUT", "5"))
 
 # Passlib for password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# Dedicated pool for password hashing, so logins can't use up the shared threadpool
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+password_slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_QUEUE)
+
 # Function to verify password
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -19,9 +35,45 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
+# Runs a hashing function on the password pool
+# Raises a 503 if the pool is still full after the timeout
+async def run_password_task(func, *args):
+    with PASSWORD_HASH_LATENCY.time():
+        return await _run_password_task(func, *args)
+
+async def _run_password_task(func, *args):
+    try:
+        await asyncio.wait_for(password_slots.acquire(), timeout=PASSWORD_HASH_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Too many login attempts in progress, please retry",
+            headers={"Retry-After": "1"}
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(password_executor, func, *args)
+    finally:
+        password_slots.release()
+
+# Async version of verify_password for use in request handlers
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_task(verify_password, plain_password, hashed_password)
+
+# Async version of hash_password for use in request handlers
+async def hash_password_async(password: str) -> str:
+    return await run_password_task(hash_password, password)
+
 # Function to create access token
 # Generates a JWT token valid for 30 minutes
-def create_access_token(subject: str) -> str:
+# The user ID and role are signed claims, so authorization checks don't need the database
+def create_access_token(subject: str, user_id: int, role: str) -> str:
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode = {"sub": subject, "exp": expire}
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
\ No newline at end of file
+    to_encode = {"sub": subject, "uid": user_id, "role": role, "type": "access", "exp": expire}
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+# Function to create refresh token
+# Generates a JWT token valid for 7 days by default, which can only be exchanged for new tokens
+def create_refresh_token(subject: str, user_id: int) -> str:
+    expire = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode = {"sub": subject, "uid": user_id, "type": "refresh", "exp": expire}
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
@@ -0,0 +1,70 @@
+from sqlalchemy import select, literal, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.responses import schema_columns
+from app.models.models import APIUser, Driver, Vehicle, Officer, CorrectionNotice, ViolationType, IdempotencyKey
+from app.schemas.schemas import DriverResponse
+
+'''
+Prebuilt statements for the per-request lookups
+Each lookup is built once at import with bound parameters, instead of constructing a new select on every call.
+SQLAlchemy caches the compiled SQL either way, but a new select still has to be built and have its cache key
+derived on every call, which costs about as much Python time as the round trip itself for a one-row lookup.
+lambda_stmt was measured slower than a prebuilt statement for these, see benchmarks/statements.py.
+
+Column lookups run on the session's connection, skipping the ORM execution layer. They don't autoflush, so
+callers must not rely on them to see objects added to the session and not yet flushed.
+Existence checks are SELECT 1 ... LIMIT 1, so they stop at the first matching index entry.
+Users are loaded with session.get, which uses the mapper's own cached primary key query and returns
+the object from the identity map without a query when the session already holds it.
+'''
+
+# SELECT 1 FROM <table> WHERE <column> = :value LIMIT 1
+def exists_statement(column):
+    return select(literal(1)).select_from(column.class_).where(column == bindparam("value")).limit(1)
+
+DRIVER_EXISTS = exists_statement(Driver.driver_id)
+VEHICLE_EXISTS = exists_statement(Vehicle.vehicle_id)
+OFFICER_EXISTS = exists_statement(Officer.officer_id)
+VEHICLE_HAS_NOTICES = exists_statement(CorrectionNotice.vehicle_id)
+
+DRIVER_BY_ID = select(*schema_columns(Driver, DriverResponse)).where(Driver.driver_id == bindparam("driver_id"))
+USER_BY_USERNAME = select(APIUser).where(APIUser.username == bindparam("username"))
+NOTICE_DRIVER_ID = select(CorrectionNotice.driver_id).where(CorrectionNotice.correction_notice_id == bindparam("correction_notice_id"))
+VIOLATION_TYPE_IDS = select(ViolationType.violation_type_id).where(ViolationType.violation_type_id.in_(bindparam("violation_type_ids", expanding=True)))
+IDEMPOTENCY_KEY = (
+    select(IdempotencyKey.request_hash, IdempotencyKey.status_code, IdempotencyKey.response, IdempotencyKey.created_at)
+    .where(IdempotencyKey.scope == bindparam("scope"), IdempotencyKey.key == bindparam("key"))
+)
+
+# Runs a prebuilt column lookup on the session's connection, in the session's transaction
+async def execute(db: AsyncSession, statement, **params):
+    conn = await db.connection()
+    return await conn.execute(statement, params)
+
+# Returns whether an exists_statement matches a row
+async def exists(db: AsyncSession, statement, value) -> bool:
+    return (await execute(db, statement, value=value)).first() is not None
+
+# Driver response columns by ID as a mapping, None if the driver doesn't exist
+async def driver_by_id(db: AsyncSession, driver_id: int):
+    return (await execute(db, DRIVER_BY_ID, driver_id=driver_id)).mappings().first()
+
+# User by ID, None if the user doesn't exist
+async def user_by_id(db: AsyncSession, user_id: int):
+    return await db.get(APIUser, user_id)
+
+# User by username, None if the user doesn't exist
+async def user_by_username(db: AsyncSession, username: str):
+    return (await db.execute(USER_BY_USERNAME, {"username": username})).scalars().first()
+
+# Driver of a correction notice, None if the notice doesn't exist
+async def notice_driver_id(db: AsyncSession, correction_notice_id: int):
+    return (await execute(db, NOTICE_DRIVER_ID, correction_notice_id=correction_notice_id)).scalar()
+
+# The subset of the violation type IDs that exist
+async def existing_violation_types(db: AsyncSession, violation_type_ids) -> set:
+    return set((await execute(db, VIOLATION_TYPE_IDS, violation_type_ids=list(violation_type_ids))).scalars().all())
+
+# Recorded request for an idempotency key, None if the key hasn't been used
+async def idempotency_key(db: AsyncSession, scope: str, key: str):
+    return (await execute(db, IDEMPOTENCY_KEY, scope=scope, key=key)).first()
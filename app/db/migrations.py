@@ -0,0 +1,160 @@
+import argparse
+import asyncio
+from datetime import datetime
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, func, inspect, text
+from sqlalchemy.schema import CreateColumn
+from app.db.database import Base, get_engine
+from app.models import models  # noqa: F401, registers the tables on Base
+
+'''
+Versioned schema migrations
+Each migration has a version number and runs once, in order, and the applied
+versions are recorded in the schema_version table.
+
+Migration 1 creates the schema from the models, so a fresh database gets every
+table and index at once. Later migrations must therefore be safe to run against
+a schema that already has their changes (use checkfirst, or check the inspector).
+
+Usage:
+python -m app.db.migrations upgrade
+python -m app.db.migrations current
+'''
+
+# Table recording applied migrations, kept out of Base so create_all doesn't touch it
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+# Registered migrations as (version, description, function) tuples
+MIGRATIONS = []
+
+# Decorator to register a migration function, which receives a sync connection
+def migration(version: int, description: str):
+    def register(apply):
+        MIGRATIONS.append((version, description, apply))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return apply
+    return register
+
+# Creates the named indexes of a table, skipping any that already exist
+def create_indexes(conn, table: Table, *names: str):
+    indexes = {index.name: index for index in table.indexes}
+    existing = {index["name"] for index in inspect(conn).get_indexes(table.name)}
+    for name in names:
+        if name not in existing:
+            indexes[name].create(conn)
+
+# Adds the named columns to an existing table, skipping any that already exist
+def add_columns(conn, table: Table, *names: str):
+    existing = {column["name"] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            spec = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {spec}"))
+
+@migration(1, "Initial schema")
+def initial_schema(conn):
+    Base.metadata.create_all(conn)
+
+@migration(2, "Secondary indexes on lookup, join and filter columns")
+def secondary_indexes(conn):
+    tables = Base.metadata.tables
+    create_indexes(conn, tables["driver"], "uq_driver_drivers_licence")
+    create_indexes(conn, tables["vehicle"], "ix_vehicle_vehicle_owner_id")
+    create_indexes(
+        conn, tables["correction_notice"],
+        "ix_correction_notice_driver_id",
+        "ix_correction_notice_officer_id",
+        "ix_correction_notice_district_date",
+        "ix_correction_notice_violation_date",
+    )
+    create_indexes(conn, tables["notice_violation"], "ix_notice_violation_notice_type")
+    create_indexes(conn, tables["driver_violation_count"], "ix_driver_violation_count_count")
+
+@migration(3, "Citizen notice read model")
+def citizen_notice_read_model(conn):
+    Base.metadata.tables["citizen_notice"].create(conn, checkfirst=True)
+
+@migration(4, "Driver and vehicle search index")
+def search_index(conn):
+    Base.metadata.tables["search_token"].create(conn, checkfirst=True)
+
+@migration(5, "Row versions for optimistic concurrency")
+def row_versions(conn):
+    tables = Base.metadata.tables
+    add_columns(conn, tables["driver"], "version")
+    add_columns(conn, tables["correction_notice"], "version")
+
+@migration(6, "Change sequences and tombstones for delta sync")
+def change_sequences(conn):
+    tables = Base.metadata.tables
+    for name in ("driver", "vehicle", "correction_notice", "notice_violation"):
+        add_columns(conn, tables[name], "change_seq")
+        create_indexes(conn, tables[name], f"ix_{name}_change_seq")
+    tables["sync_tombstone"].create(conn, checkfirst=True)
+    sync_sequence = tables["sync_sequence"]
+    sync_sequence.create(conn, checkfirst=True)
+    if conn.execute(select(sync_sequence.c.value)).first() is None:
+        conn.execute(sync_sequence.insert().values(sync_sequence_id=1, value=0))
+
+@migration(7, "Transactional outbox")
+def outbox(conn):
+    Base.metadata.tables["outbox_event"].create(conn, checkfirst=True)
+
+@migration(8, "Idempotency keys")
+def idempotency_keys(conn):
+    Base.metadata.tables["idempotency_key"].create(conn, checkfirst=True)
+
+@migration(9, "Correction notice vehicle index")
+def notice_vehicle_index(conn):
+    create_indexes(conn, Base.metadata.tables["correction_notice"], "ix_correction_notice_vehicle_id")
+
+@migration(10, "Correction notice district keyset index")
+def notice_district_index(conn):
+    create_indexes(conn, Base.metadata.tables["correction_notice"], "ix_correction_notice_district_id")
+
+# Returns the latest applied version, 0 for an empty database
+def current_version(conn) -> int:
+    schema_version.create(conn, checkfirst=True)
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+# Applies every migration newer than the current version
+def _upgrade(conn) -> list:
+    version = current_version(conn)
+    applied = []
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        apply(conn)
+        conn.execute(schema_version.insert().values(version=number, description=description, applied_at=datetime.utcnow()))
+        applied.append((number, description))
+    return applied
+
+# Runs pending migrations and returns the ones applied
+async def upgrade(bind=None) -> list:
+    async with (bind or get_engine()).begin() as conn:
+        return await conn.run_sync(_upgrade)
+
+async def _current(bind=None) -> int:
+    async with (bind or get_engine()).begin() as conn:
+        return await conn.run_sync(current_version)
+
+def main():
+    parser = argparse.ArgumentParser(description="Database schema migrations")
+    parser.add_argument("command", choices=["upgrade", "current"])
+    args = parser.parse_args()
+    if args.command == "upgrade":
+        applied = asyncio.run(upgrade())
+        for number, description in applied:
+            print(f"Applied {number}: {description}")
+        if not applied:
+            print("Database is up to date")
+    else:
+        print(asyncio.run(_current()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from itertools import count
+from os import getenv
+from time import perf_counter
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from app.db.database import get_engine, engine_options
+from app.core.metrics import instrument_engine, POOL_CHECKOUT_WAIT, REPLICA_UP, READ_SESSIONS
+
+'''
+Read replica routing
+Read-only routes use get_read_db, which reads from one of the replicas in DATABASE_REPLICA_URLS.
+A read session moves to the primary as soon as it writes, and stays there for the rest of the request,
+so anything it wrote can be read back. Without replicas, or when none is healthy, reads use the primary.
+
+Replicas lag behind the primary, so routes that must see writes from earlier requests keep using get_db.
+'''
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated async database URLs of the replicas, e.g. two SQLite files for local testing
+REPLICA_URLS = [url.strip() for url in getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# "round_robin" or "least_connections"
+REPLICA_SELECTION = getenv("DB_REPLICA_SELECTION", "round_robin")
+# Seconds between replica health checks
+REPLICA_HEALTH_INTERVAL = float(getenv("DB_REPLICA_HEALTH_INTERVAL", "5"))
+
+# A replica database, its engine is created on first use
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.url = url
+        self.engine = None
+        self.healthy = True
+        self.sessions = 0
+
+    def get_engine(self):
+        if self.engine is None:
+            self.engine = create_async_engine(self.url, **engine_options(self.url))
+            instrument_engine(self.engine.sync_engine)
+        return self.engine
+
+# Chooses a healthy replica for each read session and keeps track of replica health
+class ReplicaPool:
+    def __init__(self, urls: list, selection: str):
+        if selection not in ("round_robin", "least_connections"):
+            raise ValueError(f"Unknown replica selection {selection}, use round_robin or least_connections")
+        self.replicas = [Replica(f"replica{index}", url) for index, url in enumerate(urls)]
+        self.selection = selection
+        self.turn = count()
+        for replica in self.replicas:
+            REPLICA_UP.labels(replica.name).set(1)
+
+    # Returns the replica for a new read session, or None to read from the primary
+    def choose(self):
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if self.selection == "least_connections":
+            return min(healthy, key=lambda replica: replica.sessions)
+        return healthy[next(self.turn) % len(healthy)]
+
+    def mark(self, replica: Replica, healthy: bool):
+        if replica.healthy != healthy:
+            logger.warning("%s is %s", replica.name, "healthy again" if healthy else "unhealthy, reading from the other databases")
+        replica.healthy = healthy
+        REPLICA_UP.labels(replica.name).set(1 if healthy else 0)
+
+    # Runs SELECT 1 on every replica and updates their health
+    async def check(self):
+        for replica in self.replicas:
+            try:
+                async with replica.get_engine().connect() as conn:
+                    await conn.execute(text("SELECT 1"))
+                self.mark(replica, True)
+            except Exception:
+                self.mark(replica, False)
+
+    # Checks replica health until cancelled, started by the app lifespan
+    async def run_health_checks(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(REPLICA_HEALTH_INTERVAL)
+
+    async def dispose(self):
+        for replica in self.replicas:
+            if replica.engine is not None:
+                await replica.engine.dispose()
+
+replica_pool = ReplicaPool(REPLICA_URLS, REPLICA_SELECTION)
+
+# Session that reads from its replica until it writes, then uses the primary for everything
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.info["primary"] = True
+        replica = self.info.get("replica")
+        if replica is None or self.info.get("primary"):
+            return get_engine().sync_engine
+        return replica.get_engine().sync_engine
+
+ReadSessionLocal = async_sessionmaker(class_=AsyncSession, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False)
+
+# Opens a read session on a replica, falling back to the primary if the replica can't be reached
+@asynccontextmanager
+async def read_session():
+    replica = replica_pool.choose()
+    db = ReadSessionLocal(info={"replica": replica})
+    start = perf_counter()
+    try:
+        await db.connection()
+    except DBAPIError:
+        if replica is None:
+            await db.close()
+            raise
+        replica_pool.mark(replica, False)
+        await db.close()
+        replica = None
+        db = ReadSessionLocal(info={"replica": None})
+        await db.connection()
+    POOL_CHECKOUT_WAIT.observe(perf_counter() - start)
+    READ_SESSIONS.labels(replica.name if replica else "primary").inc()
+    if replica is not None:
+        replica.sessions += 1
+    try:
+        yield db
+    finally:
+        if replica is not None:
+            replica.sessions -= 1
+        await db.close()
+
+# Dependency to get a database session for read-only routes
+async def get_read_db():
+    async with read_session() as db:
+        yield db
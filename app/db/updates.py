@@ -0,0 +1,59 @@
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+'''
+Single-statement partial updates with optimistic concurrency
+A versioned model has a version column that every update increments. A caller that sends the version it read
+only updates the row if nobody changed it since, otherwise it gets a 409 and should re-read the row.
+Constraint violations raise IntegrityError from the UPDATE, callers turn them into their own errors.
+'''
+
+# Updates one row with a single UPDATE ... WHERE id = ? [AND version = ?] and returns the updated columns
+# Uses RETURNING where the database supports it (SQLite), on MySQL the row is read back in the same transaction
+# Raises a 404 if the row doesn't exist and a 409 if its version has changed, after rolling back
+async def update_versioned(db: AsyncSession, model, id_column, id_value, values: dict, version: Optional[int], columns: list, name: str):
+    statement = (
+        update(model)
+        .where(id_column == id_value)
+        .values(**values, version=model.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if version is not None:
+        statement = statement.where(model.version == version)
+    if db.bind.dialect.update_returning:
+        row = (await db.execute(statement.returning(*columns))).first()
+    else:
+        row = None
+        if (await db.execute(statement)).rowcount:
+            row = (await db.execute(select(*columns).where(id_column == id_value))).first()
+    if row is None:
+        # Only the failure path pays for finding out why
+        current = (await db.execute(select(model.version).where(id_column == id_value))).scalar()
+        await db.rollback()
+        raise_missing_or_changed(name, current)
+    return row
+
+# An update with no fields set, returns the row as it is without writing it
+# Raises the same 404 and 409 as update_versioned, so a client can't tell the difference
+async def current_versioned(db: AsyncSession, model, id_column, id_value, version: Optional[int], columns: list, name: str):
+    row = (await db.execute(select(*columns, model.version.label("current_version")).where(id_column == id_value))).first()
+    if row is None or (version is not None and row.current_version != version):
+        raise_missing_or_changed(name, row and row.current_version)
+    return row
+
+def raise_missing_or_changed(name: str, current: Optional[int]):
+    if current is None:
+        raise HTTPException(status_code=404, detail=f"{name} not found")
+    raise HTTPException(status_code=409, detail=f"{name} was changed by someone else, current version is {current}")
+
+# Whether an IntegrityError was raised by a unique index
+# MySQL names the index in its duplicate key error, SQLite names the index's columns instead
+def is_unique_violation(error: IntegrityError, index) -> bool:
+    message = str(error.orig)
+    if f"'{index.name}'" in message or f".{index.name}'" in message:
+        return True
+    columns = ", ".join(f"{index.table.name}.{column.name}" for column in index.columns)
+    return f"UNIQUE constraint failed: {columns}" in message
@@ -1,23 +1,75 @@
-from fastapi import FastAPI, Request
-from app.api import violation_types, drivers, correction_notices, auth, vehicles, notice_violations
-from app.db.database import engine
-from app.models import models
-from app.core.security import hash_password
-from app.db.database import SessionLocal
+import asyncio
+import logging
+from os import getenv
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request, Depends
+from app.api import violation_types, drivers, correction_notices, auth, vehicles, notice_violations, me, metrics, analytics, search, sync
+from app.core.metrics import MetricsMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.idempotency import IdempotencyMiddleware, IdempotentReplay
+from app.core.rate_limit import rate_limit
+from app.db.database import dispose_engine
+from app.db.replicas import replica_pool
+from app.services.violation_catalog import violation_catalog
+from app.services.outbox import run_worker
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from fastapi.responses import JSONResponse
 
-# Create database tables
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
+
+# Startup does no DDL or seeding, so workers start without waiting on the database
+# Run `python -m app.cli init-db` once per database to apply migrations and create sample accounts
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the violation type catalog in the background so the first request doesn't hit the database
+    preload = None
+    if getenv("PRELOAD_VIOLATION_TYPES", "true").lower() in ("1", "true", "yes"):
+        preload = asyncio.create_task(preload_violation_types())
+    # Replica health is checked in the background, read sessions skip unhealthy replicas
+    health_checks = asyncio.create_task(replica_pool.run_health_checks()) if replica_pool.replicas else None
+    # Outbox events are delivered in the background, set OUTBOX_WORKER=false when `python -m app.cli outbox-worker` runs instead
+    outbox_worker = None
+    if getenv("OUTBOX_WORKER", "true").lower() in ("1", "true", "yes"):
+        outbox_worker = asyncio.create_task(run_worker())
+    yield
+    for task in (preload, health_checks, outbox_worker):
+        if task is not None:
+            task.cancel()
+    await replica_pool.dispose()
+    await dispose_engine()
+
+# Loads the violation type catalog, a failure only means the first request loads it instead
+async def preload_violation_types():
+    try:
+        await violation_catalog.load()
+    except Exception:
+        logger.warning("Could not preload the violation type catalog", exc_info=True)
 
 # Initialize FastAPI app
 app = FastAPI(
     title="NYSP Correction Notice API",
     description="RESTful API for NYSP Correction Notice System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    # Token bucket rate limit per client on every route
+    dependencies=[Depends(rate_limit)]
 )
 
+# Records responses to requests with an Idempotency-Key, inside compression so bodies are stored uncompressed
+app.add_middleware(IdempotencyMiddleware)
+
+# Response compression, negotiated per request
+app.add_middleware(CompressionMiddleware)
+
+# Request metrics, exposed on /metrics
+# Added last so it wraps compression and records response sizes as sent
+app.add_middleware(MetricsMiddleware)
+
 # Error handling
+@app.exception_handler(IdempotentReplay)
+async def idempotent_replay_handler(request: Request, exc: IdempotentReplay):
+    return exc.response()
+
 @app.exception_handler(IntegrityError)
 async def integrity_error_handler(request: Request, exc: IntegrityError):
     return JSONResponse(status_code=400, content={"detail": "Database integrity error"})
@@ -26,31 +78,15 @@ async def integrity_error_handler(request: Request, exc: IntegrityError):
 async def sqlalchemy_exception_handler(request: Request, exc: SQLAlchemyError):
     return JSONResponse(status_code=500, content={"detail": "Internal database error"})
 
-# Create sample accounts for testing
-db = SessionLocal()
-try:
-    # If no users exist, create sample accounts
-    if not db.query(models.APIUser).first():
-        officer = models.APIUser(
-            username="s_scott@localhost", 
-            password=hash_password("password"), 
-            role="officer"
-        )
-        citizen = models.APIUser(
-            username="d_kroenke@localhost", 
-            password=hash_password("password"), 
-            role="citizen"
-        )
-        db.add(officer)
-        db.add(citizen)
-        db.commit()
-finally:
-    db.close()
-
 # Include API routers
 app.include_router(violation_types.router)
 app.include_router(drivers.router)
 app.include_router(correction_notices.router)
 app.include_router(auth.router)
 app.include_router(vehicles.router)
-app.include_router(notice_violations.router)
\ No newline at end of file
+app.include_router(notice_violations.router)
+app.include_router(me.router)
+app.include_router(analytics.router)
+app.include_router(search.router)
+app.include_router(sync.router)
+app.include_router(metrics.router)
\ No newline at end of file
@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Date, Time, Boolean, SmallInteger, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, String, Text, JSON, Date, Time, DateTime, Boolean, SmallInteger, ForeignKey, Index
+from sqlalchemy.orm import relationship
 from app.db.database import Base
 
 '''
 Models for the database
 Mostly based on the NYSP_Corrections_DB.sql file
+Relationships use lazy="raise", so related rows are only available when a query loads them explicitly
+(selectinload/joinedload), and a forgotten eager load fails instead of running a query per row
+Synced tables have a change_seq column set by every write, see app/services/sync.py
 '''
 
 # Driver Model
@@ -22,6 +26,15 @@ class Driver(Base):
     height = Column(SmallInteger, nullable=False)
     weight = Column(SmallInteger, nullable=False)
     eyes = Column(String(20), nullable=False)
+    # Row version for optimistic concurrency, incremented by every update
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Change sequence of the last write, rows loaded outside the API have 0
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    # Licence uniqueness is enforced by the database instead of a read-before-write check
+    __table_args__ = (
+        Index("uq_driver_drivers_licence", "drivers_licence", unique=True),
+        Index("ix_driver_change_seq", "change_seq"),
+    )
 
 # Officer Model
 class Officer(Base):
@@ -62,6 +75,13 @@ class Vehicle(Base):
     vin = Column(String(17), unique=True, nullable=False)
     year = Column(SmallInteger, nullable=False)
     type = Column(String(50), nullable=False)
+    # Change sequence of the last write, rows loaded outside the API have 0
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    owner = relationship("VehicleOwner", lazy="raise")
+    __table_args__ = (
+        Index("ix_vehicle_vehicle_owner_id", "vehicle_owner_id"),
+        Index("ix_vehicle_change_seq", "change_seq"),
+    )
 
 # Correction Notice Model
 class CorrectionNotice(Base):
@@ -77,6 +97,26 @@ class CorrectionNotice(Base):
     warning = Column(Boolean, default=False, nullable=False)
     repair_vehicle = Column(Boolean, default=False, nullable=False)
     correct_immediately = Column(Boolean, default=False, nullable=False)
+    # Row version for optimistic concurrency, incremented by every update
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    # Change sequence of the last write, rows loaded outside the API have 0
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    driver = relationship("Driver", lazy="raise")
+    vehicle = relationship("Vehicle", lazy="raise")
+    officer = relationship("Officer", lazy="raise")
+    # Violations are deleted with set-based statements, so the ORM never cascades to them
+    violations = relationship("NoticeViolation", lazy="raise", passive_deletes=True, order_by="NoticeViolation.notice_violation_id")
+    # Filter indexes end with the primary key so keyset pagination can seek and stay ordered
+    # The date indexes serve date range reports, a date filter on a notice page is checked row by row
+    __table_args__ = (
+        Index("ix_correction_notice_driver_id", "driver_id", "correction_notice_id"),
+        Index("ix_correction_notice_officer_id", "officer_id", "correction_notice_id"),
+        Index("ix_correction_notice_vehicle_id", "vehicle_id", "correction_notice_id"),
+        Index("ix_correction_notice_district_id", "district", "correction_notice_id"),
+        Index("ix_correction_notice_district_date", "district", "violation_date"),
+        Index("ix_correction_notice_violation_date", "violation_date"),
+        Index("ix_correction_notice_change_seq", "change_seq"),
+    )
 
 # Notice Violation Model
 class NoticeViolation(Base):
@@ -84,6 +124,114 @@ class NoticeViolation(Base):
     notice_violation_id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     correction_notice_id = Column(Integer, ForeignKey("correction_notice.correction_notice_id"), nullable=False)
     violation_type_id = Column(Integer, ForeignKey("violation_type.violation_type_id"), nullable=False)
+    # Change sequence of the last write, rows loaded outside the API have 0
+    change_seq = Column(BigInteger, nullable=False, default=0, server_default="0")
+    violation_type = relationship("ViolationType", lazy="raise")
+    # Covers the notice to violation type join without touching the table
+    __table_args__ = (
+        Index("ix_notice_violation_notice_type", "correction_notice_id", "violation_type_id"),
+        Index("ix_notice_violation_change_seq", "change_seq"),
+    )
+
+# Driver Violation Count Model
+# Summary of notice violations per driver, maintained incrementally by the write routes
+# Indexed on the count so frequent offender lookups are a range scan
+class DriverViolationCount(Base):
+    __tablename__ = "driver_violation_count"
+    driver_id = Column(Integer, ForeignKey("driver.driver_id"), primary_key=True)
+    violation_count = Column(Integer, nullable=False, default=0)
+    __table_args__ = (
+        Index("ix_driver_violation_count_count", "violation_count", "driver_id"),
+    )
+
+# Citizen Notice Model
+# Denormalized read model replacing citizen_view, one row per violation on a notice
+# Kept in sync by the write routes, so a citizen's notices are a single indexed read on owner_username
+class CitizenNotice(Base):
+    __tablename__ = "citizen_notice"
+    notice_violation_id = Column(Integer, primary_key=True, autoincrement=False)
+    correction_notice_id = Column(Integer, nullable=False)
+    owner_username = Column(String(32), nullable=False)
+    violation_date = Column(Date, nullable=False)
+    violation_time = Column(Time, nullable=False)
+    location = Column(String(255), nullable=False)
+    district = Column(String(100), nullable=False)
+    vehicle_type = Column(String(50), nullable=False)
+    vehicle_make = Column(String(50), nullable=False)
+    vehicles_licence = Column(String(20), nullable=False)
+    violation_description = Column(String(255), nullable=False)
+    violation_code = Column(String(20), nullable=False)
+    first_name = Column(String(100), nullable=False)
+    last_name = Column(String(100), nullable=False)
+    vehicle_owner = Column(String(255), nullable=False)
+    __table_args__ = (
+        Index("ix_citizen_notice_owner", "owner_username", "violation_date", "notice_violation_id"),
+        Index("ix_citizen_notice_correction_notice_id", "correction_notice_id"),
+    )
+
+# Search Token Model
+# Word index for driver and vehicle search, one row per word of a searchable column
+# Maintained by the write routes, a prefix lookup is a range scan on the primary key
+class SearchToken(Base):
+    __tablename__ = "search_token"
+    token = Column(String(64), primary_key=True)
+    kind = Column(String(10), primary_key=True)  # "driver" or "vehicle"
+    entity_id = Column(Integer, primary_key=True, autoincrement=False)
+    field = Column(String(10), primary_key=True)  # "name", "licence", "plate" or "vin"
+    __table_args__ = (
+        Index("ix_search_token_entity", "kind", "entity_id"),
+    )
+
+# Sync Sequence Model
+# Single-row counter handing out change sequence numbers, one per write transaction
+class SyncSequence(Base):
+    __tablename__ = "sync_sequence"
+    sync_sequence_id = Column(Integer, primary_key=True, autoincrement=False)
+    value = Column(BigInteger, nullable=False, default=0)
+
+# Sync Tombstone Model
+# One row per deleted synced row, so devices learn about deletes from GET /sync
+# The primary key starts with the change sequence, so a sync page is a range scan
+class SyncTombstone(Base):
+    __tablename__ = "sync_tombstone"
+    change_seq = Column(BigInteger, primary_key=True, autoincrement=False)
+    entity = Column(String(20), primary_key=True)  # table name of the deleted row
+    entity_id = Column(Integer, primary_key=True, autoincrement=False)
+
+# Outbox Event Model
+# Follow-up work recorded in the same transaction as a write, delivered to handlers by the outbox worker
+# available_at is when the event can next be claimed, it is NULL once the event has failed too often
+class OutboxEvent(Base):
+    __tablename__ = "outbox_event"
+    outbox_event_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    topic = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    available_at = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
+    claimed_by = Column(String(32), nullable=True)
+    last_error = Column(Text, nullable=True)
+    __table_args__ = (
+        Index("ix_outbox_event_available", "available_at", "outbox_event_id"),
+        Index("ix_outbox_event_claimed_by", "claimed_by"),
+    )
+
+# Idempotency Key Model
+# One row per Idempotency-Key a client sent to a POST route, inserted in the same transaction as the write
+# status_code and response are NULL until the response has been recorded
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_key"
+    idempotency_key_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    scope = Column(String(100), nullable=False)  # user ID, method and route
+    key = Column(String(255), nullable=False)
+    request_hash = Column(String(64), nullable=False)
+    status_code = Column(SmallInteger, nullable=True)
+    response = Column(Text(16_777_215), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    __table_args__ = (
+        Index("uq_idempotency_key_scope_key", "scope", "key", unique=True),
+        Index("ix_idempotency_key_created_at", "created_at"),
+    )
 
 # API User Model
 # New model for JWT authentication and role-based access control
@@ -1,12 +1,22 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 from datetime import date, time
-from typing import Optional, Literal
+from typing import Dict, List, Optional, Literal
 '''
 References:
 # Pydantic (undated) Fields. Available from https://docs.pydantic.dev/latest/concepts/fields/#inspecting-model-fields [accessed 25 February 2026].
 # Pydantic (undated) Types. Available from https://docs.pydantic.dev/1.10/usage/types/ [accessed 25 February 2026].
 '''
 
+# Base for partial update schemas
+# Fields can be left out but not set to null, every column is NOT NULL. A null version means the update isn't checked
+class PartialUpdate(BaseModel):
+    @model_validator(mode="after")
+    def reject_nulls(self):
+        nulls = sorted(name for name in self.model_fields_set if name != "version" and getattr(self, name) is None)
+        if nulls:
+            raise ValueError(f"{', '.join(nulls)} cannot be null")
+        return self
+
 '''
 Driver Schemas
 '''
@@ -31,7 +41,7 @@ class DriverCreate(DriverBase):
 
 # Update driver schema
 # Optional fields, so specific fields can be updated
-class DriverUpdate(BaseModel):
+class DriverUpdate(PartialUpdate):
     first_name: Optional[str] = Field(None, max_length=100)
     last_name: Optional[str] = Field(None, max_length=100)
     address: Optional[str] = Field(None, max_length=255)
@@ -44,13 +54,15 @@ class DriverUpdate(BaseModel):
     height: Optional[int] = None
     weight: Optional[int] = None
     eyes: Optional[str] = Field(None, max_length=20)
+    # Version the client last read, the update is rejected with a 409 if the driver has changed since
+    version: Optional[int] = None
 
 # Response driver schema
 class DriverResponse(DriverBase):
     driver_id: int
+    version: int
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
 '''
 Correction Notice Schemas
@@ -75,7 +87,7 @@ class CorrectionNoticeCreate(CorrectionNoticeBase):
 
 # Update correction notice schema
 # Optional fields, so specific fields can be updated
-class CorrectionNoticeUpdate(BaseModel):
+class CorrectionNoticeUpdate(PartialUpdate):
     driver_id: Optional[int] = None
     vehicle_id: Optional[int] = None
     officer_id: Optional[int] = None
@@ -86,13 +98,132 @@ class CorrectionNoticeUpdate(BaseModel):
     warning: Optional[bool] = None
     repair_vehicle: Optional[bool] = None
     correct_immediately: Optional[bool] = None
+    # Version the client last read, the update is rejected with a 409 if the notice has changed since
+    version: Optional[int] = None
 
 # Response correction notice schema
 class CorrectionNoticeResponse(CorrectionNoticeBase):
     correction_notice_id: int
+    version: int
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Officer, vehicle owner and vehicle response schemas
+# Only returned as part of an expanded correction notice
+class OfficerResponse(BaseModel):
+    officer_id: int
+    personell_number: str
+    first_name: str
+    last_name: str
+    detachment: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+class VehicleOwnerResponse(BaseModel):
+    vehicle_owner_id: int
+    owner_name: str
+    address: str
+    city: str
+    state: str
+    zip_code: str
+
+    model_config = ConfigDict(from_attributes=True)
+
+class VehicleResponse(BaseModel):
+    vehicle_id: int
+    vehicles_licence: str
+    state: str
+    colour: str
+    make: str
+    vin: str
+    year: int
+    type: str
+    owner: VehicleOwnerResponse
+
+    model_config = ConfigDict(from_attributes=True)
 
-    class Config:
-        orm_mode = True
+# Violation on an expanded correction notice
+class NoticeViolationDetail(BaseModel):
+    notice_violation_id: int
+    violation_type: "ViolationTypeResponse"
+
+    model_config = ConfigDict(from_attributes=True)
+
+# Expanded correction notice schema
+# Related records are only present when requested with expand, unexpanded ones are left out of the response
+class CorrectionNoticeDetail(CorrectionNoticeResponse):
+    driver: Optional[DriverResponse] = None
+    vehicle: Optional[VehicleResponse] = None
+    officer: Optional[OfficerResponse] = None
+    violations: Optional[List[NoticeViolationDetail]] = None
+
+# Paginated correction notice list schema
+# next_after_id is passed back as after_id to fetch the next page, it is None on the last page
+class CorrectionNoticePage(BaseModel):
+    items: List[CorrectionNoticeResponse]
+    next_after_id: Optional[int] = None
+
+# Bulk correction notice item schema
+# A notice plus the violation types recorded on it
+class CorrectionNoticeBulkItem(CorrectionNoticeBase):
+    violation_type_ids: List[int] = []
+
+# Bulk create correction notice schema
+# Batches are capped so a single request can't hold a transaction open for too long
+class CorrectionNoticeBulkCreate(BaseModel):
+    notices: List[CorrectionNoticeBulkItem] = Field(..., min_length=1, max_length=1000)
+
+# Result for a single notice in a bulk create
+# Index is the position of the notice in the request
+class CorrectionNoticeBulkResult(BaseModel):
+    index: int
+    status: Literal["created", "error"]
+    correction_notice: Optional[CorrectionNoticeResponse] = None
+    detail: Optional[str] = None
+
+# Bulk create correction notice response schema
+class CorrectionNoticeBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[CorrectionNoticeBulkResult]
+
+'''
+Notice Violation Schemas
+'''
+# Batch create notice violation schema
+# Adds one violation per violation type ID to the notice
+class NoticeViolationBatchCreate(BaseModel):
+    correction_notice_id: int
+    violation_type_ids: List[int] = Field(..., min_length=1, max_length=100)
+
+# Batch delete notice violation schema
+# Either a list of notice violation IDs or a correction notice ID, whose violations are all deleted
+class NoticeViolationBatchDelete(BaseModel):
+    notice_violation_ids: Optional[List[int]] = Field(None, min_length=1, max_length=1000)
+    correction_notice_id: Optional[int] = None
+
+'''
+Citizen Notice Schemas
+'''
+# Response citizen notice schema
+# One violation on a notice issued to one of the citizen's vehicles, same fields as citizen_view
+class CitizenNoticeResponse(BaseModel):
+    correction_notice_id: int
+    notice_violation_id: int
+    violation_date: date
+    violation_time: time
+    location: str
+    district: str
+    vehicle_type: str
+    vehicle_make: str
+    vehicles_licence: str
+    violation_description: str
+    violation_code: str
+    first_name: str
+    last_name: str
+    vehicle_owner: str
+
+    model_config = ConfigDict(from_attributes=True)
 
 '''
 Violation Type Schemas
@@ -108,8 +239,38 @@ class ViolationTypeResponse(ViolationTypeBase):
     description: str
     violation_code: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
+
+'''
+Search Schemas
+'''
+# A driver or vehicle matching a search, only the matching record is present
+class SearchResult(BaseModel):
+    kind: Literal["driver", "vehicle"]
+    id: int
+    rank: int
+    driver: Optional[DriverResponse] = None
+    vehicle: Optional[VehicleResponse] = None
+
+# Page of search results, ordered by rank
+class SearchPage(BaseModel):
+    items: List[SearchResult]
+    has_more: bool
+
+'''
+Sync Schemas
+'''
+# Rows written and IDs deleted after a cursor, keyed by table name
+# Rows have every column of their table, a table with no changes is left out
+class SyncPage(BaseModel):
+    changes: Dict[str, List[dict]]
+    deleted: Dict[str, List[int]]
+    cursor: int
+    has_more: bool
+
+# NoticeViolationDetail refers to ViolationTypeResponse, which is declared after it
+NoticeViolationDetail.model_rebuild()
+CorrectionNoticeDetail.model_rebuild()
 
 '''
 Token and API User Schemas
@@ -118,12 +279,18 @@ Token and API User Schemas
 # Token type is set to "bearer" by default
 class TokenBase(BaseModel):
     access_token: str
+    refresh_token: Optional[str] = None
     token_type: str = "bearer"
 
+# Refresh token schema used to renew tokens without a password
+class TokenRefresh(BaseModel):
+    refresh_token: str
+
 # Token data schema used for JWT authentication
 # Optional fields to allow for proper error handling
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[int] = None
     role: Optional[str] = None 
 
 # Create user schema
@@ -140,6 +307,5 @@ class UserResponse(BaseModel):
     username: str
     role: str
 
-    class Config:
-        orm_mode = True
+    model_config = ConfigDict(from_attributes=True)
 
@@ -0,0 +1,229 @@
+import json
+import os
+import shutil
+import time
+from datetime import date
+from os import getenv
+from typing import Optional
+from sqlalchemy import select
+from app.db.replicas import read_session
+from app.models.models import CorrectionNotice, NoticeViolation, ViolationType
+
+'''
+Offline analytics on columnar files
+export_notice_violations copies notice violations, with the notice and violation code columns the reports group by,
+into Parquet files partitioned by violation year. It reads from a replica in primary key chunks, and each run
+continues from the last exported notice_violation_id, which is kept in _export_state.json.
+Ids are handed out when a row is inserted, not when it commits, so a row can turn up below that id after it was
+exported. The ids missing from the export within EXPORT_LATE_WINDOW ids of the last one are kept in the state too,
+and each run reads them again, so late rows are exported once they commit. A row committing later than that is
+only exported by a --full export.
+rollup answers the district, officer, violation type and date reports from those files, so reporting
+never queries the OLTP tables.
+
+The export only appends, changes to notices that were already exported need a --full export.
+A full export builds a new copy of the dataset next to the live one and swaps it in when it's done.
+pyarrow is imported inside the functions, so the API doesn't load it at startup.
+'''
+
+ANALYTICS_EXPORT_DIR = getenv("ANALYTICS_EXPORT_DIR", "./analytics")
+EXPORT_CHUNK_SIZE = 50_000
+DATASET = "notice_violations"
+# How far below the last exported id a missing id is still looked for, rolled back inserts and deleted rows leave
+# ids that never turn up, this bounds how many are kept and read again
+EXPORT_LATE_WINDOW = 10_000
+# Underscore prefixed, so pyarrow skips it when listing the dataset files
+STATE_FILE = "_export_state.json"
+
+# Report name, and the columns it groups by
+ROLLUPS = {
+    "district": ["district"],
+    "officer": ["officer_id"],
+    "violation_type": ["violation_code", "violation_description"],
+    "date": ["violation_date"],
+}
+
+def export_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("notice_violation_id", pa.int64()),
+        ("correction_notice_id", pa.int64()),
+        ("violation_type_id", pa.int32()),
+        ("violation_code", pa.string()),
+        ("violation_description", pa.string()),
+        ("district", pa.string()),
+        ("officer_id", pa.int32()),
+        ("driver_id", pa.int32()),
+        ("violation_date", pa.date32()),
+        ("warning", pa.bool_()),
+        ("violation_year", pa.int16()),
+    ])
+
+def year_partitioning():
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    return ds.partitioning(pa.schema([("violation_year", pa.int16())]), flavor="hive")
+
+# Path of the live dataset, a symlink to the current version directory once a full export has run
+def dataset_path(directory: str) -> str:
+    return os.path.join(directory, DATASET)
+
+def read_state(directory: str) -> dict:
+    # Kept inside the dataset, so a swapped in version brings its own state
+    # The top level file is where exports before versioned datasets kept it
+    for path in (os.path.join(dataset_path(directory), STATE_FILE), os.path.join(directory, "export_state.json")):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            pass
+    return {"last_notice_violation_id": 0, "rows": 0, "missing_ids": []}
+
+# Replaces the state file of a dataset atomically, so a crash leaves either the old or the new state
+def write_state(dataset: str, state: dict):
+    path = os.path.join(dataset, STATE_FILE)
+    with open(path + ".tmp", "w") as file:
+        json.dump(state, file)
+    os.replace(path + ".tmp", path)
+
+# Ids between the last exported id and the rows of a chunk that weren't in it, with the ones still missing before
+# Only ids within EXPORT_LATE_WINDOW of the new last id are kept
+def missing_ids(state: dict, ids: list) -> list:
+    floor = ids[-1] - EXPORT_LATE_WINDOW
+    missing = [i for i in state.get("missing_ids", []) if i > floor]
+    previous = state["last_notice_violation_id"]
+    for i in ids:
+        missing.extend(range(max(previous, floor) + 1, i))
+        previous = i
+    return missing
+
+# Writes one chunk of rows into a dataset as Parquet files, one per violation year
+# Files are written to a staging directory and moved into place, so readers never see a partial file
+def write_chunk(dataset: str, rows: list):
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    schema = export_schema()
+    columns = list(zip(*rows))
+    table = pa.table([pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema)
+    staging = f"{dataset}.staging-{rows[0][0]}"
+    ds.write_dataset(
+        table, staging, format="parquet", partitioning=year_partitioning(),
+        basename_template=f"part-{rows[0][0]}-{{i}}.parquet", existing_data_behavior="overwrite_or_ignore"
+    )
+    for root, _, files in os.walk(staging):
+        target = os.path.join(dataset, os.path.relpath(root, staging))
+        for name in files:
+            os.makedirs(target, exist_ok=True)
+            os.replace(os.path.join(root, name), os.path.join(target, name))
+    shutil.rmtree(staging)
+
+# Points the live dataset at a new version directory
+# The symlink is replaced with a rename, so readers see either the old or the new version, never a mix or nothing
+# The replaced version is kept until the next swap, so a rollup that was scanning it can finish
+def swap_dataset(directory: str, version: str):
+    live = dataset_path(directory)
+    previous = os.path.realpath(live) if os.path.islink(live) else None
+    if os.path.isdir(live) and not os.path.islink(live):
+        # A dataset written before versioning, moved aside once (rollups in this instant see no data)
+        os.rename(live, f"{live}-{time.time_ns()}")
+    os.symlink(os.path.basename(version), live + ".link")
+    os.replace(live + ".link", live)
+    keep = {os.path.realpath(version), previous}
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.startswith(DATASET + "-") and os.path.isdir(path) and os.path.realpath(path) not in keep:
+            shutil.rmtree(path)
+
+# Exports notice violations added since the last export, or all of them with full=True
+# Rows missing from earlier exports that have committed since are exported with them
+# A full export is written into a new version directory, and only swapped in once it's complete, so rollups
+# keep answering from the previous export while it runs, and a failed export leaves it untouched
+# Returns the number of rows exported
+async def export_notice_violations(directory: str = ANALYTICS_EXPORT_DIR, chunk_size: int = EXPORT_CHUNK_SIZE, full: bool = False) -> int:
+    os.makedirs(directory, exist_ok=True)
+    # Nothing to continue from, so the first export is a full one
+    full = full or not os.path.exists(dataset_path(directory))
+    if full:
+        dataset = os.path.join(directory, f"{DATASET}-{time.time_ns()}")
+        os.makedirs(dataset)
+        state = {"last_notice_violation_id": 0, "rows": 0, "missing_ids": []}
+    else:
+        dataset = dataset_path(directory)
+        state = read_state(directory)
+    statement = (
+        select(
+            NoticeViolation.notice_violation_id,
+            NoticeViolation.correction_notice_id,
+            NoticeViolation.violation_type_id,
+            ViolationType.violation_code,
+            ViolationType.description,
+            CorrectionNotice.district,
+            CorrectionNotice.officer_id,
+            CorrectionNotice.driver_id,
+            CorrectionNotice.violation_date,
+            CorrectionNotice.warning,
+        )
+        .join(CorrectionNotice, NoticeViolation.correction_notice_id == CorrectionNotice.correction_notice_id)
+        .join(ViolationType, NoticeViolation.violation_type_id == ViolationType.violation_type_id)
+        .order_by(NoticeViolation.notice_violation_id)
+        .limit(chunk_size)
+    )
+    exported = 0
+    try:
+        # Rows that committed after a higher id was exported, the window below the last id is read again
+        # and only the ids that were missing from it are kept
+        missing = set(state.get("missing_ids", []))
+        if missing:
+            window = NoticeViolation.notice_violation_id.between(min(missing), state["last_notice_violation_id"])
+            async with read_session() as db:
+                rows = [row for row in (await db.execute(statement.filter(window).limit(None))).all() if row.notice_violation_id in missing]
+            if rows:
+                write_chunk(dataset, [tuple(row) + (row.violation_date.year,) for row in rows])
+                exported += len(rows)
+                found = {row.notice_violation_id for row in rows}
+                state = dict(state, rows=state["rows"] + len(rows), missing_ids=[i for i in state["missing_ids"] if i not in found])
+                write_state(dataset, state)
+        while True:
+            # Each chunk is a short read, so the export doesn't hold a long transaction open
+            async with read_session() as db:
+                rows = (await db.execute(statement.filter(NoticeViolation.notice_violation_id > state["last_notice_violation_id"]))).all()
+            if not rows:
+                break
+            write_chunk(dataset, [tuple(row) + (row.violation_date.year,) for row in rows])
+            exported += len(rows)
+            state = {
+                "last_notice_violation_id": rows[-1].notice_violation_id,
+                "rows": state["rows"] + len(rows),
+                "missing_ids": missing_ids(state, [row.notice_violation_id for row in rows]),
+            }
+            write_state(dataset, state)
+    except BaseException:
+        if full:
+            shutil.rmtree(dataset, ignore_errors=True)
+        raise
+    if full:
+        write_state(dataset, state)
+        swap_dataset(directory, dataset)
+    return exported
+
+# Counts violations and distinct notices per group, largest groups first
+# Runs a vectorized group by over the exported files, reading only the needed columns and years
+def rollup(by: str, violation_date_from: Optional[date] = None, violation_date_to: Optional[date] = None, directory: str = ANALYTICS_EXPORT_DIR) -> list:
+    import pyarrow.dataset as ds
+
+    path = os.path.join(directory, DATASET)
+    if not os.path.isdir(path):
+        return []
+    keys = ROLLUPS[by]
+    dataset = ds.dataset(path, format="parquet", partitioning=year_partitioning())
+    condition = None
+    if violation_date_from is not None:
+        condition = (ds.field("violation_year") >= violation_date_from.year) & (ds.field("violation_date") >= violation_date_from)
+    if violation_date_to is not None:
+        upper = (ds.field("violation_year") <= violation_date_to.year) & (ds.field("violation_date") <= violation_date_to)
+        condition = upper if condition is None else condition & upper
+    table = dataset.to_table(columns=keys + ["correction_notice_id"], filter=condition)
+    result = table.group_by(keys).aggregate([("correction_notice_id", "count"), ("correction_notice_id", "count_distinct")])
+    result = result.rename_columns({"correction_notice_id_count": "violations", "correction_notice_id_count_distinct": "notices"})
+    return result.sort_by([("violations", "descending")] + [(key, "ascending") for key in keys]).to_pylist()
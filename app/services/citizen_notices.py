@@ -0,0 +1,51 @@
+from sqlalchemy import select, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import CorrectionNotice, Vehicle, VehicleOwner, Driver, NoticeViolation, ViolationType, CitizenNotice
+
+'''
+Maintenance of the citizen_notice read model
+Write routes call refresh_citizen_notices in the same transaction as their own changes,
+which recomputes the rows of the affected notices with the same join as citizen_view
+'''
+
+# The citizen_view join, as the columns of a citizen_notice row
+def citizen_notice_select():
+    return (
+        select(
+            NoticeViolation.notice_violation_id,
+            CorrectionNotice.correction_notice_id,
+            VehicleOwner.username.label("owner_username"),
+            CorrectionNotice.violation_date,
+            CorrectionNotice.violation_time,
+            CorrectionNotice.location,
+            CorrectionNotice.district,
+            Vehicle.type.label("vehicle_type"),
+            Vehicle.make.label("vehicle_make"),
+            Vehicle.vehicles_licence,
+            ViolationType.description.label("violation_description"),
+            ViolationType.violation_code,
+            Driver.first_name,
+            Driver.last_name,
+            VehicleOwner.owner_name.label("vehicle_owner"),
+        )
+        .join(Vehicle, CorrectionNotice.vehicle_id == Vehicle.vehicle_id)
+        .join(VehicleOwner, Vehicle.vehicle_owner_id == VehicleOwner.vehicle_owner_id)
+        .join(Driver, CorrectionNotice.driver_id == Driver.driver_id)
+        .join(NoticeViolation, CorrectionNotice.correction_notice_id == NoticeViolation.correction_notice_id)
+        .join(ViolationType, NoticeViolation.violation_type_id == ViolationType.violation_type_id)
+    )
+
+# Recomputes the citizen_notice rows of every notice matching the condition
+# The condition is on correction_notice columns, pending ORM changes must be flushed first
+async def refresh_citizen_notices(db: AsyncSession, condition):
+    notice_ids = select(CorrectionNotice.correction_notice_id).filter(condition)
+    await db.execute(delete(CitizenNotice).filter(CitizenNotice.correction_notice_id.in_(notice_ids)))
+    statement = citizen_notice_select().filter(condition)
+    await db.execute(insert(CitizenNotice).from_select([column.name for column in statement.selected_columns], statement))
+
+# Recomputes the whole read model in a single transaction
+async def rebuild_citizen_notices(db: AsyncSession):
+    await db.execute(delete(CitizenNotice))
+    statement = citizen_notice_select()
+    await db.execute(insert(CitizenNotice).from_select([column.name for column in statement.selected_columns], statement))
+    await db.commit()
\ No newline at end of file
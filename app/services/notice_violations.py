@@ -0,0 +1,34 @@
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import CorrectionNotice, NoticeViolation, CitizenNotice
+from app.services.offender_stats import adjust_violation_counts
+from app.services.sync import record_tombstones
+
+'''
+Set-based deletes of notice violations
+Each delete is a single statement per table, and keeps the frequent offender summary
+the citizen notice read model and the sync tombstones in step within the caller's transaction
+'''
+
+# Deletes every notice violation matching the condition and returns how many were deleted
+# The condition is on notice_violation columns, it may use subqueries on other tables
+async def delete_notice_violations(db: AsyncSession, condition) -> int:
+    # Violations per driver, counted before the rows are gone
+    counts = await db.execute(
+        select(CorrectionNotice.driver_id, func.count(NoticeViolation.notice_violation_id))
+        .join(NoticeViolation, CorrectionNotice.correction_notice_id == NoticeViolation.correction_notice_id)
+        .filter(condition)
+        .group_by(CorrectionNotice.driver_id)
+    )
+    deltas = {driver_id: -count for driver_id, count in counts.all()}
+    if not deltas:
+        return 0
+    await adjust_violation_counts(db, deltas)
+    await db.execute(
+        delete(CitizenNotice)
+        .filter(CitizenNotice.notice_violation_id.in_(select(NoticeViolation.notice_violation_id).filter(condition)))
+        .execution_options(synchronize_session=False)
+    )
+    await record_tombstones(db, NoticeViolation, condition)
+    result = await db.execute(delete(NoticeViolation).filter(condition).execution_options(synchronize_session=False))
+    return result.rowcount
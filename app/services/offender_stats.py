@@ -0,0 +1,84 @@
+from sqlalchemy import select, update, delete, insert, func
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import CorrectionNotice, NoticeViolation, DriverViolationCount
+
+'''
+Maintenance of the driver_violation_count summary table
+Write routes call adjust_violation_counts in the same transaction as their own changes,
+rebuild_violation_counts recomputes the whole table from correction_notice and notice_violation
+'''
+
+# Adds the given deltas to each driver's violation count
+# Uses an upsert so concurrent writers can't race on the first row for a driver
+async def adjust_violation_counts(db: AsyncSession, deltas: dict):
+    rows = [
+        {"driver_id": driver_id, "violation_count": delta}
+        for driver_id, delta in deltas.items() if delta
+    ]
+    if not rows:
+        return
+    dialect = db.bind.dialect.name
+    if dialect == "mysql":
+        statement = mysql_insert(DriverViolationCount)
+        statement = statement.on_duplicate_key_update(
+            violation_count=DriverViolationCount.violation_count + statement.inserted.violation_count
+        )
+    elif dialect in ("sqlite", "postgresql"):
+        statement = (sqlite_insert if dialect == "sqlite" else postgresql_insert)(DriverViolationCount)
+        statement = statement.on_conflict_do_update(
+            index_elements=[DriverViolationCount.driver_id],
+            set_={"violation_count": DriverViolationCount.violation_count + statement.excluded.violation_count}
+        )
+    else:
+        await adjust_violation_counts_portably(db, rows)
+        return
+    await db.execute(statement, rows)
+
+# Upsert for databases without an upsert statement, one driver at a time
+# Drivers without a row get an INSERT in a savepoint, if a concurrent writer inserted it first the UPDATE is retried
+async def adjust_violation_counts_portably(db: AsyncSession, rows: list):
+    for row in rows:
+        increment = (
+            update(DriverViolationCount)
+            .where(DriverViolationCount.driver_id == row["driver_id"])
+            .values(violation_count=DriverViolationCount.violation_count + row["violation_count"])
+            .execution_options(synchronize_session=False)
+        )
+        if (await db.execute(increment)).rowcount:
+            continue
+        try:
+            async with db.begin_nested():
+                await db.execute(insert(DriverViolationCount).values(**row))
+        except IntegrityError:
+            # Still no row means the insert failed for another reason, such as a missing driver
+            if not (await db.execute(increment)).rowcount:
+                raise
+
+# Returns the driver and violation count for each given notice
+async def violation_counts_for_notices(db: AsyncSession, correction_notice_ids: set) -> list:
+    if not correction_notice_ids:
+        return []
+    result = await db.execute(
+        select(CorrectionNotice.driver_id, func.count(NoticeViolation.notice_violation_id))
+        .join(NoticeViolation, CorrectionNotice.correction_notice_id == NoticeViolation.correction_notice_id)
+        .filter(CorrectionNotice.correction_notice_id.in_(correction_notice_ids))
+        .group_by(CorrectionNotice.driver_id)
+    )
+    return result.all()
+
+# Recomputes the summary table from scratch in a single transaction
+async def rebuild_violation_counts(db: AsyncSession):
+    await db.execute(delete(DriverViolationCount))
+    await db.execute(
+        insert(DriverViolationCount).from_select(
+            ["driver_id", "violation_count"],
+            select(CorrectionNotice.driver_id, func.count(NoticeViolation.notice_violation_id))
+            .join(NoticeViolation, CorrectionNotice.correction_notice_id == NoticeViolation.correction_notice_id)
+            .group_by(CorrectionNotice.driver_id)
+        )
+    )
+    await db.commit()
\ No newline at end of file
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from os import getenv
+from sqlalchemy import select, update, delete, insert, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.models.models import OutboxEvent
+from app.core.metrics import OUTBOX_EVENTS
+
+'''
+Transactional outbox
+Write routes call emit in the same transaction as their own changes, so an event exists if and only if
+the write committed. The outbox worker claims events in batches and passes them to the handlers
+registered for their topic, then deletes them.
+
+Handlers are async functions taking (db, payloads) for a batch of events of one topic. They run in the
+same transaction as the delete of their events, so database changes made by a handler are applied once.
+Anything outside the database (caches, files, other services) may see an event more than once, since a
+worker that dies after claiming a batch leaves it to be claimed again when the lease runs out.
+Handlers should recompute from the current rows rather than apply the payload as a delta.
+
+A failing batch is retried one event at a time, a failing event is retried with backoff and left in the
+table with available_at NULL after OUTBOX_MAX_ATTEMPTS.
+'''
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = int(getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_POLL_INTERVAL = float(getenv("OUTBOX_POLL_INTERVAL", "1"))
+OUTBOX_MAX_ATTEMPTS = int(getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+OUTBOX_LEASE_SECONDS = int(getenv("OUTBOX_LEASE_SECONDS", "60"))
+OUTBOX_MAX_BACKOFF = 300
+
+# Handlers by topic
+handlers = {}
+
+# Decorator registering a handler for one or more topics
+def handler(*topics: str):
+    def register(handle):
+        for topic in topics:
+            handlers.setdefault(topic, []).append(handle)
+        return handle
+    return register
+
+# Adds events to the outbox in the caller's transaction, one per payload
+async def emit(db: AsyncSession, topic: str, *payloads: dict):
+    if not payloads:
+        return
+    now = datetime.utcnow()
+    await db.execute(insert(OutboxEvent), [
+        {"topic": topic, "payload": payload, "created_at": now, "available_at": now, "attempts": 0}
+        for payload in payloads
+    ])
+    db.info["outbox_pending"] = True
+
+# Set when a transaction that emitted events commits, so the in-process worker doesn't wait for its next poll
+outbox_ready = asyncio.Event()
+
+@event.listens_for(Session, "after_commit")
+def _wake_worker(session):
+    if session.info.pop("outbox_pending", False):
+        outbox_ready.set()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("outbox_pending", None)
+
+# Claims up to limit available events for this worker and returns them in order
+# The claim is a lease: events not deleted by its end can be claimed again
+async def claim_events(limit: int) -> list:
+    token = uuid.uuid4().hex
+    now = datetime.utcnow()
+    async with SessionLocal() as db:
+        candidates = select(OutboxEvent.outbox_event_id).filter(OutboxEvent.available_at <= now).order_by(OutboxEvent.outbox_event_id).limit(limit)
+        ids = (await db.execute(candidates)).scalars().all()
+        if not ids:
+            return []
+        # Only events still available are claimed, another worker may have taken some in between
+        await db.execute(
+            update(OutboxEvent)
+            .filter(OutboxEvent.outbox_event_id.in_(ids), OutboxEvent.available_at <= now)
+            .values(claimed_by=token, available_at=now + timedelta(seconds=OUTBOX_LEASE_SECONDS), attempts=OutboxEvent.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        result = await db.execute(
+            select(OutboxEvent.outbox_event_id, OutboxEvent.topic, OutboxEvent.payload, OutboxEvent.attempts, OutboxEvent.claimed_by)
+            .filter(OutboxEvent.claimed_by == token)
+            .order_by(OutboxEvent.outbox_event_id)
+        )
+        events = result.all()
+        await db.commit()
+    return events
+
+# Runs the handlers for events of one topic and deletes the events, in one transaction
+async def deliver(topic: str, events: list):
+    async with SessionLocal() as db:
+        for handle in handlers.get(topic, []):
+            await handle(db, [e.payload for e in events])
+        await db.execute(
+            delete(OutboxEvent)
+            .filter(OutboxEvent.outbox_event_id.in_([e.outbox_event_id for e in events]), OutboxEvent.claimed_by == events[0].claimed_by)
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    OUTBOX_EVENTS.labels(topic, "delivered").inc(len(events))
+
+# Schedules a failed event for a retry, or gives up on it after OUTBOX_MAX_ATTEMPTS
+async def release_failed(outbox_event, error: Exception):
+    failed = outbox_event.attempts >= OUTBOX_MAX_ATTEMPTS
+    retry_at = None if failed else datetime.utcnow() + timedelta(seconds=min(2 ** outbox_event.attempts, OUTBOX_MAX_BACKOFF))
+    async with SessionLocal() as db:
+        await db.execute(
+            update(OutboxEvent)
+            .filter(OutboxEvent.outbox_event_id == outbox_event.outbox_event_id, OutboxEvent.claimed_by == outbox_event.claimed_by)
+            .values(available_at=retry_at, claimed_by=None, last_error=repr(error)[:2000])
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+    OUTBOX_EVENTS.labels(outbox_event.topic, "failed" if failed else "retried").inc()
+    logger.warning("Outbox event %s (%s) failed on attempt %d%s", outbox_event.outbox_event_id, outbox_event.topic,
+                   outbox_event.attempts, ", giving up" if failed else "", exc_info=error)
+
+# Claims and delivers one batch, returns the number of events claimed
+# Consecutive events of the same topic are delivered together, keeping the order of topics
+async def process_batch(limit: int = OUTBOX_BATCH_SIZE) -> int:
+    events = await claim_events(limit)
+    groups = []
+    for outbox_event in events:
+        if groups and groups[-1][0] == outbox_event.topic:
+            groups[-1][1].append(outbox_event)
+        else:
+            groups.append((outbox_event.topic, [outbox_event]))
+    for topic, group in groups:
+        try:
+            await deliver(topic, group)
+        except Exception as error:
+            if len(group) == 1:
+                await release_failed(group[0], error)
+                continue
+            # Find the failing events by delivering them one at a time
+            for outbox_event in group:
+                try:
+                    await deliver(topic, [outbox_event])
+                except Exception as event_error:
+                    await release_failed(outbox_event, event_error)
+    return len(events)
+
+# Delivers events until none are available, returns how many were claimed
+async def drain(limit: int = OUTBOX_BATCH_SIZE) -> int:
+    total = 0
+    while True:
+        claimed = await process_batch(limit)
+        total += claimed
+        if claimed < limit:
+            return total
+
+# Drains the outbox forever, waking on commits in this process or every poll interval
+async def run_worker(poll_interval: float = OUTBOX_POLL_INTERVAL):
+    while True:
+        outbox_ready.clear()
+        try:
+            await drain()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Outbox worker failed to process a batch")
+        try:
+            await asyncio.wait_for(outbox_ready.wait(), timeout=poll_interval)
+        except asyncio.TimeoutError:
+            pass
@@ -0,0 +1,152 @@
+import re
+from sqlalchemy import select, delete, insert, case, func, literal, and_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.models import Driver, Vehicle, SearchToken
+from app.services import outbox
+
+'''
+Maintenance of the search_token index used by GET /search
+Names are indexed word by word. Licences, plates and VINs are indexed without spaces or dashes,
+plates also word by word, so "DMK 4765", "dmk4765" and "4765" all find the same vehicle.
+Driver and vehicle writes emit outbox events, and the handlers below update the index from them,
+so searches may briefly miss a record written a moment ago.
+rebuild_search_index recomputes the whole index from the driver and vehicle tables.
+'''
+
+TOKEN_LENGTH = 64
+REBUILD_CHUNK_SIZE = 10_000
+# Terms this long match the start of a word, shorter ones only whole words, unless another term narrows the search
+MIN_PREFIX_LENGTH = 3
+# Tokens counted per term when picking the term that drives a search, enough to tell a rare term from a common one
+SELECTIVITY_PROBE = 1000
+# Matches on identifiers rank above matches on names, and exact words above prefixes
+FIELD_WEIGHTS = {"licence": 3, "plate": 3, "vin": 3, "name": 1}
+
+def words(value: str) -> list:
+    return [word[:TOKEN_LENGTH] for word in re.findall(r"[^\W_]+", value.lower())]
+
+def compact(value: str) -> str:
+    return "".join(words(value))[:TOKEN_LENGTH]
+
+# Search query terms, words of two or more characters
+def query_terms(query: str) -> list:
+    return list(dict.fromkeys(word for word in words(query) if len(word) >= 2))
+
+def driver_tokens(driver) -> set:
+    tokens = {(word, "name") for word in words(driver.first_name) + words(driver.last_name)}
+    tokens.add((compact(driver.drivers_licence), "licence"))
+    return tokens
+
+def vehicle_tokens(vehicle) -> set:
+    tokens = {(word, "plate") for word in words(vehicle.vehicles_licence)}
+    tokens.add((compact(vehicle.vehicles_licence), "plate"))
+    tokens.add((compact(vehicle.vin), "vin"))
+    return tokens
+
+def token_rows(kind: str, entity_id: int, tokens: set) -> list:
+    return [{"token": token, "kind": kind, "entity_id": entity_id, "field": field} for token, field in tokens if token]
+
+# Removes the tokens of the given drivers or vehicles
+async def delete_search_tokens(db: AsyncSession, kind: str, entity_ids: set):
+    if entity_ids:
+        await db.execute(
+            delete(SearchToken)
+            .filter(SearchToken.kind == kind, SearchToken.entity_id.in_(entity_ids))
+            .execution_options(synchronize_session=False)
+        )
+
+# Driver columns that are searchable, updates to other columns leave the index alone
+DRIVER_SEARCH_FIELDS = {"first_name", "last_name", "drivers_licence"}
+
+# Replaces the tokens of created drivers and of updated drivers whose searchable columns changed
+@outbox.handler("driver.created", "driver.updated")
+async def reindex_drivers(db: AsyncSession, payloads: list):
+    driver_ids = {p["driver_id"] for p in payloads if "fields" not in p or DRIVER_SEARCH_FIELDS & set(p["fields"])}
+    if not driver_ids:
+        return
+    drivers = (await db.execute(
+        select(Driver.driver_id, Driver.first_name, Driver.last_name, Driver.drivers_licence).filter(Driver.driver_id.in_(driver_ids))
+    )).all()
+    await delete_search_tokens(db, "driver", driver_ids)
+    rows = [row for driver in drivers for row in token_rows("driver", driver.driver_id, driver_tokens(driver))]
+    if rows:
+        await db.execute(insert(SearchToken), rows)
+
+# Removes the tokens of deleted vehicles
+@outbox.handler("vehicle.deleted")
+async def unindex_vehicles(db: AsyncSession, payloads: list):
+    await delete_search_tokens(db, "vehicle", {p["vehicle_id"] for p in payloads})
+
+# Recomputes the whole index in a single transaction, reading the tables in primary key chunks
+async def rebuild_search_index(db: AsyncSession):
+    await db.execute(delete(SearchToken))
+    sources = (
+        ("driver", Driver.driver_id, (Driver.first_name, Driver.last_name, Driver.drivers_licence), driver_tokens),
+        ("vehicle", Vehicle.vehicle_id, (Vehicle.vehicles_licence, Vehicle.vin), vehicle_tokens),
+    )
+    for kind, key, columns, tokens in sources:
+        last_id = 0
+        while True:
+            rows = (await db.execute(select(key, *columns).filter(key > last_id).order_by(key).limit(REBUILD_CHUNK_SIZE))).all()
+            if not rows:
+                break
+            await db.execute(insert(SearchToken), [token for row in rows for token in token_rows(kind, row[0], tokens(row))])
+            last_id = rows[-1][0]
+    await db.commit()
+
+# Condition on the tokens a term matches, the words it starts, or with prefix=False only the word itself
+def token_match(tokens, term: str, prefix: bool = True):
+    if not prefix:
+        return tokens.token == term
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return and_(tokens.token >= term, tokens.token < upper)
+
+# Best score of the tokens matching a term, identifier fields and exact words score higher
+def token_score(tokens, term: str):
+    weight = case(*((tokens.field == field, value) for field, value in FIELD_WEIGHTS.items()), else_=1)
+    exact = case((tokens.token == term, 2), else_=1)
+    return func.max(weight * exact)
+
+# Orders the terms from the fewest matching tokens to the most, so search_statement is driven by the rarest term
+# Terms shorter than MIN_PREFIX_LENGTH come last, they'd only match whole words if they drove the search
+# Each term's tokens are counted up to SELECTIVITY_PROBE in a range scan of the token primary key, all in one query
+async def by_selectivity(db: AsyncSession, terms: list, kind=None) -> list:
+    if len(terms) == 1:
+        return terms
+    counts = []
+    for term in terms:
+        matched = select(literal(1)).filter(token_match(SearchToken, term, len(term) >= MIN_PREFIX_LENGTH))
+        if kind is not None:
+            matched = matched.filter(SearchToken.kind == kind)
+        counts.append(select(func.count()).select_from(matched.limit(SELECTIVITY_PROBE).subquery()).scalar_subquery())
+    row = (await db.execute(select(*counts))).one()
+    return [term for _, term in sorted(zip(row, terms), key=lambda pair: (len(pair[1]) < MIN_PREFIX_LENGTH, pair[0]))]
+
+# Ranked matches for the terms, as (kind, entity_id, rank) rows
+# The first term drives the search, a range scan on the token primary key, or a single token if it's shorter than
+# MIN_PREFIX_LENGTH, so a search never reads more than one term's matches
+# The other terms are looked up for each of those drivers and vehicles on the entity index, every one must match
+# The result is ranked before any limit, callers page it, so a common word can't hide a match
+def search_statement(terms: list, kind=None):
+    first, others = terms[0], terms[1:]
+    candidates = select(SearchToken.kind, SearchToken.entity_id, token_score(SearchToken, first).label("score"))
+    candidates = candidates.filter(token_match(SearchToken, first, len(first) >= MIN_PREFIX_LENGTH))
+    if kind is not None:
+        candidates = candidates.filter(SearchToken.kind == kind)
+    candidates = candidates.group_by(SearchToken.kind, SearchToken.entity_id).subquery()
+    columns = [candidates.c.score]
+    for term in others:
+        tokens = SearchToken.__table__.alias()
+        columns.append(
+            select(token_score(tokens.c, term))
+            .filter(tokens.c.kind == candidates.c.kind, tokens.c.entity_id == candidates.c.entity_id, token_match(tokens.c, term))
+            .scalar_subquery()
+        )
+    scores = select(candidates.c.kind, candidates.c.entity_id, *(column.label(f"score_{i}") for i, column in enumerate(columns))).subquery()
+    # A term without a matching token scores null, and so does the sum
+    rank = sum((scores.c[f"score_{i}"] for i in range(1, len(columns))), scores.c.score_0)
+    return (
+        select(scores.c.kind, scores.c.entity_id, rank.label("rank"))
+        .filter(rank.is_not(None))
+        .order_by(rank.desc(), scores.c.kind, scores.c.entity_id)
+    )
@@ -0,0 +1,128 @@
+import secrets
+from sqlalchemy import select, update, insert, literal, event, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.models.models import Driver, Vehicle, CorrectionNotice, NoticeViolation, SyncSequence, SyncTombstone
+
+'''
+Change sequences and tombstones for GET /sync
+Every write transaction takes the next number from the sync_sequence row and stamps it on the rows
+it inserts or updates (change_seq), deletes leave a sync_tombstone row with the same number.
+The counter row stays locked until the transaction commits, so transactions commit in sequence order
+and a device that has synced up to a number never misses a change below it later.
+A transaction uses one number for all its rows, so sync pages never split a transaction.
+
+The number is taken as late as possible, so the lock on the counter row (which every write needs) is only
+held while a transaction commits, not for all of its work. Until then rows are written with a negative
+placeholder unique to the transaction, and just before the commit the next number replaces it.
+The cost is a SELECT and an UPDATE per synced table the transaction wrote. They find the rows by
+primary key, so on MySQL they only lock rows the transaction has already written and can't wait on another writer.
+'''
+
+# Synced tables by name, with their primary key column
+SYNCED_TABLES = {
+    "driver": (Driver, Driver.driver_id),
+    "vehicle": (Vehicle, Vehicle.vehicle_id),
+    "correction_notice": (CorrectionNotice, CorrectionNotice.correction_notice_id),
+    "notice_violation": (NoticeViolation, NoticeViolation.notice_violation_id),
+}
+SYNC_SEQUENCE_ID = 1
+
+# Returns the change sequence placeholder of the session's current transaction, for rows of the given models
+# The real number is only known once the transaction commits, see assign_change_seq
+def change_seq(db: AsyncSession, *models) -> int:
+    pending = db.info.setdefault("change_seq", {"placeholder": -secrets.randbits(62) - 1, "tables": set()})
+    pending["tables"].update(model.__table__ for model in models)
+    return pending["placeholder"]
+
+# Takes the next number from the counter and puts it in place of the placeholder, just before the commit
+# The counter row stays locked until the commit that follows
+@event.listens_for(Session, "before_commit")
+def assign_change_seq(session):
+    pending = session.info.get("change_seq")
+    if pending is None:
+        return
+    session.flush()
+    conn = session.connection()
+    statement = (
+        update(SyncSequence)
+        .where(SyncSequence.sync_sequence_id == SYNC_SEQUENCE_ID)
+        .values(value=SyncSequence.value + 1)
+    )
+    if conn.dialect.update_returning:
+        seq = conn.execute(statement.returning(SyncSequence.value)).scalar()
+    else:
+        conn.execute(statement)
+        seq = conn.execute(select(SyncSequence.value).where(SyncSequence.sync_sequence_id == SYNC_SEQUENCE_ID)).scalar()
+    for table in sorted(pending["tables"], key=lambda table: table.name):
+        primary_key = tuple_(*table.primary_key.columns)
+        keys = conn.execute(select(*table.primary_key.columns).where(table.c.change_seq == pending["placeholder"])).all()
+        if keys:
+            conn.execute(update(table).where(primary_key.in_(keys)).values(change_seq=seq))
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _discard_change_seq(session):
+    session.info.pop("change_seq", None)
+
+# Records tombstones for the rows of a synced model matching the condition, must run before they are deleted
+async def record_tombstones(db: AsyncSession, model, condition):
+    seq = change_seq(db, SyncTombstone)
+    name = model.__tablename__
+    primary_key = SYNCED_TABLES[name][1]
+    await db.execute(
+        insert(SyncTombstone).from_select(
+            ["change_seq", "entity", "entity_id"],
+            select(literal(seq), literal(name), primary_key).filter(condition)
+        )
+    )
+
+# The latest change sequence number, where a device starts syncing from
+async def current_change_seq(db: AsyncSession) -> int:
+    return (await db.execute(select(SyncSequence.value).where(SyncSequence.sync_sequence_id == SYNC_SEQUENCE_ID))).scalar() or 0
+
+async def _changes_between(db: AsyncSession, since: int, until, limit) -> dict:
+    sources = {name: model.__table__ for name, (model, _) in SYNCED_TABLES.items()}
+    sources[None] = SyncTombstone.__table__
+    pages = {}
+    for name, table in sources.items():
+        statement = select(table).where(table.c.change_seq > since).order_by(table.c.change_seq)
+        if until is not None:
+            statement = statement.where(table.c.change_seq <= until)
+        if limit is not None:
+            statement = statement.limit(limit)
+        result = await db.execute(statement)
+        keys = list(result.keys())
+        pages[name] = [dict(zip(keys, row)) for row in result.all()]
+    return pages
+
+# Returns the changes after a sequence number, at most about limit rows
+# Reads at most limit rows from each table, then cuts the page before the first transaction that may be incomplete
+# A single transaction with more rows than limit is returned whole
+async def changes_since(db: AsyncSession, since: int, limit: int) -> dict:
+    pages = await _changes_between(db, since, None, limit)
+    seqs = sorted(row["change_seq"] for rows in pages.values() for row in rows)
+    # Every change up to the cutoff has been read, None when every change after since has been read
+    # A table that filled its limit may have more rows in its last transaction, so the page ends before it
+    ends = [rows[-1]["change_seq"] for rows in pages.values() if len(rows) == limit]
+    if len(seqs) > limit:
+        ends.append(seqs[limit])
+    cutoff = min(ends) - 1 if ends else None
+    if cutoff is not None and cutoff <= since:
+        cutoff = seqs[0]
+        pages = await _changes_between(db, since, cutoff, None)
+    elif cutoff is not None:
+        pages = {name: [row for row in rows if row["change_seq"] <= cutoff] for name, rows in pages.items()}
+    tombstones = pages.pop(None)
+    changes = {name: rows for name, rows in pages.items() if rows}
+    # A deleted ID can come back on SQLite, a row in the page is newer than its tombstone
+    present = {(name, row[SYNCED_TABLES[name][1].name]) for name, rows in changes.items() for row in rows}
+    deleted = {}
+    for tombstone in tombstones:
+        if (tombstone["entity"], tombstone["entity_id"]) not in present:
+            deleted.setdefault(tombstone["entity"], []).append(tombstone["entity_id"])
+    if cutoff is None:
+        cursor = seqs[-1] if seqs else since
+    else:
+        cursor = cutoff
+    return {"changes": changes, "deleted": deleted, "cursor": cursor, "has_more": cutoff is not None}
@@ -0,0 +1,71 @@
+from hashlib import sha1
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from app.db.database import SessionLocal
+from app.models.models import ViolationType
+from app.schemas.schemas import ViolationTypeResponse
+from app.core.responses import ObjectListAdapter
+
+'''
+In-process cache of the serialized violation type catalog
+The JSON body is built once and served as bytes with an ETag until a violation type is written
+It is loaded from the primary, a lagging replica could cache a catalog that is already out of date
+'''
+
+violation_types_adapter = ObjectListAdapter(ViolationTypeResponse)
+
+# Cached catalog, the version is bumped on every invalidation
+class ViolationTypeCatalog:
+    def __init__(self):
+        self.version = 0
+        self.body = None
+        self.etag = None
+
+    # Returns the cached body and ETag, loading them from the database on a miss
+    # A miss returns what it loaded, the cache may have been invalidated again while it loaded
+    async def get(self):
+        body, etag = self.body, self.etag
+        if body is None:
+            body, etag = await self.load()
+        return body, etag
+
+    # Loads and serializes the catalog
+    # If the catalog is invalidated during the load, the result is served but not cached
+    async def load(self):
+        version = self.version
+        async with SessionLocal() as db:
+            violations = (await db.execute(select(ViolationType).order_by(ViolationType.violation_type_id))).scalars().all()
+            body = violation_types_adapter.dump_json(violations)
+        etag = '"' + sha1(body).hexdigest() + '"'
+        if version == self.version:
+            self.body, self.etag = body, etag
+        return body, etag
+
+    # Drops the cached catalog, must be called whenever violation types are written
+    def invalidate(self):
+        self.version += 1
+        self.body = None
+        self.etag = None
+
+violation_catalog = ViolationTypeCatalog()
+
+# Invalidate the catalog automatically when violation types written through the ORM are committed
+# The flush only marks the session, a load between the flush and the commit would still read the old rows
+@event.listens_for(ViolationType, "after_insert")
+@event.listens_for(ViolationType, "after_update")
+@event.listens_for(ViolationType, "after_delete")
+def _mark_catalog_changed(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session.info["violation_types_changed"] = True
+    else:
+        violation_catalog.invalidate()
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_catalog(session):
+    if session.info.pop("violation_types_changed", False):
+        violation_catalog.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_catalog_change(session):
+    session.info.pop("violation_types_changed", None)
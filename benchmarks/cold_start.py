@@ -0,0 +1,73 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+'''
+Cold start benchmark
+Measures how long a fresh process takes to import the app and to answer its first request,
+using a temporary SQLite database that is initialized beforehand with app.cli.
+Exits with an error if the median time to first response is over the budget.
+
+Usage:
+python -m benchmarks.cold_start --runs 5 --budget-ms 2000
+'''
+
+# Runs in the child process, timing is measured from interpreter start up to the first response
+def measure(started: float) -> dict:
+    import asyncio
+    import httpx
+
+    from app.main import app
+    imported = time.perf_counter()
+
+    async def first_request():
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                response = await client.get("/violation-types/")
+                return response.status_code
+
+    status = asyncio.run(first_request())
+    return {
+        "import_ms": round((imported - started) * 1000, 1),
+        "first_response_ms": round((time.perf_counter() - started) * 1000, 1),
+        "status": status,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=2000)
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(measure(float(os.environ["COLD_START_STARTED"]))))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, DATABASE_URL=f"sqlite+aiosqlite:///{tmp}/bench.db")
+        subprocess.run([sys.executable, "-m", "app.cli", "init-db"], env=env, capture_output=True, check=True)
+        for _ in range(args.runs):
+            # perf_counter is system-wide on Linux, so the parent's clock marks the child's start
+            env["COLD_START_STARTED"] = str(time.perf_counter())
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.cold_start", "--single"],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append(result)
+            print(f"import={result['import_ms']}ms  first response={result['first_response_ms']}ms  status={result['status']}")
+
+    median = sorted(result["first_response_ms"] for result in results)[len(results) // 2]
+    print(f"Median time to first response: {median}ms (budget {args.budget_ms:g}ms)")
+    if median > args.budget_ms:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import asyncio
+import statistics
+import time
+from benchmarks.serialization import build_drivers, Result
+
+'''
+Response size and compression benchmark
+Serves the same drivers through a throwaway FastAPI app wrapped in CompressionMiddleware,
+with every column and with a sparse fieldset, and reports the bytes sent and the CPU time per
+response for each encoding and level. No database is used.
+
+Usage:
+python -m benchmarks.compression --rows 1000 --runs 20
+'''
+
+SPARSE_FIELDS = "first_name,last_name,drivers_licence"
+# (Accept-Encoding, gzip level, brotli quality) for each measured setting
+ENCODINGS = [
+    ("identity", None, None),
+    ("gzip", 1, None),
+    ("gzip", 6, None),
+    ("gzip", 9, None),
+    ("br", None, 1),
+    ("br", None, 4),
+    ("br", None, 11),
+]
+
+def build_app(rows, fields, gzip_level: int, brotli_quality: int):
+    from fastapi import FastAPI
+    from app.core.compression import CompressionMiddleware
+    from app.core.responses import parse_fields, rows_response
+    from app.schemas.schemas import DriverResponse
+
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, gzip_level=gzip_level or 6, brotli_quality=brotli_quality or 4)
+
+    # Projects the prebuilt rows the way a fields query would select columns
+    @app.get("/drivers")
+    async def drivers(fields: str = None):
+        selected = parse_fields(fields, DriverResponse, "driver_id")
+        indexes = [fields_index[name] for name in selected]
+        return rows_response(Result(selected, [tuple(row[i] for i in indexes) for row in rows]))
+
+    fields_index = {name: i for i, name in enumerate(fields)}
+    return app
+
+async def measure(rows: int, runs: int) -> list:
+    import httpx
+
+    _, row_tuples, fields = build_drivers(rows)
+    results = []
+    for encoding, gzip_level, brotli_quality in ENCODINGS:
+        app = build_app(row_tuples, fields, gzip_level, brotli_quality)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for payload, params in (("all fields", {}), ("sparse", {"fields": SPARSE_FIELDS})):
+                latencies = []
+                cpu = []
+                for _ in range(runs):
+                    start, start_cpu = time.perf_counter(), time.process_time()
+                    response = await client.get("/drivers", params=params, headers={"Accept-Encoding": encoding})
+                    latencies.append(time.perf_counter() - start)
+                    cpu.append(time.process_time() - start_cpu)
+                if response.headers.get("content-encoding", "identity") != encoding:
+                    raise SystemExit(f"Expected {encoding} but the response was {response.headers.get('content-encoding')}")
+                results.append({
+                    "payload": payload,
+                    "encoding": encoding + (f"-{gzip_level or brotli_quality}" if encoding != "identity" else ""),
+                    "bytes": response.num_bytes_downloaded,
+                    "median_ms": round(statistics.median(latencies) * 1000, 2),
+                    "cpu_ms": round(statistics.median(cpu) * 1000, 2),
+                })
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Response size and compression benchmark")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    results = asyncio.run(measure(args.rows, args.runs))
+    baseline = {result["payload"]: result["bytes"] for result in results if result["encoding"] == "identity"}
+    full = baseline["all fields"]
+    for result in sorted(results, key=lambda result: result["payload"]):
+        print(f"{result['payload']:<11} {result['encoding']:<9} {result['bytes']:>9} bytes  {full / result['bytes']:>5.1f}x smaller  "
+              f"{result['median_ms']:>7}ms  cpu {result['cpu_ms']}ms")
+
+if __name__ == "__main__":
+    main()
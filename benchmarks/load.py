@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import tempfile
+import time
+from sqlalchemy import select, func
+from app.db.database import SessionLocal, get_engine
+from app.models.models import Driver, Vehicle, Officer, CorrectionNotice, NoticeViolation
+from app.services.sync import current_change_seq
+from benchmarks.seed import FIRST_NAMES, LAST_NAMES
+
+'''
+In-process load test for every router
+Drives the app through ASGI with concurrent clients against the database in DATABASE_URL
+(seed it first with benchmarks.seed), and reports throughput and latency percentiles per endpoint.
+The analytics rollups are answered from an export of the database to a temporary directory, made before the run.
+Results are written as JSON with stable ordering, so a regression shows up as a diff.
+
+Usage:
+python -m benchmarks.load --concurrency 10 100 500 --requests 2000 --output benchmarks/results.json
+'''
+
+# Largest IDs in the seeded database, used to pick request targets
+async def database_state() -> dict:
+    async with SessionLocal() as db:
+        async def largest(column):
+            return (await db.execute(select(func.max(column)))).scalar() or 0
+        return {
+            "drivers": await largest(Driver.driver_id),
+            "vehicles": await largest(Vehicle.vehicle_id),
+            "officers": await largest(Officer.officer_id),
+            "notices": await largest(CorrectionNotice.correction_notice_id),
+            "notice_violations": await largest(NoticeViolation.notice_violation_id),
+            "change_seq": await current_change_seq(db),
+        }
+
+EXPAND_ALL = "driver,vehicle,officer,violations"
+
+# Builds the scenarios, each returns the arguments for one request
+# Write scenarios use counters so every request targets a fresh row
+def scenarios(state: dict, rng: random.Random) -> dict:
+    counter = itertools.count(1)
+    violations = itertools.count(1)
+    # Violations are deleted one at a time from the lowest IDs and a notice at a time from the highest notices
+    cleared_notices = itertools.count(state["notices"], -1)
+    # Vehicles above 90% of the range have no notices, so they can be deleted
+    # New notices only use the lower 90%, so the delete scenario keeps measuring vehicles without notices
+    noticed_vehicles = max(1, int(state["vehicles"] * 0.9))
+    spare_vehicles = itertools.count(noticed_vehicles + 1)
+
+    def notice():
+        return {
+            "driver_id": rng.randint(1, state["drivers"]), "vehicle_id": rng.randint(1, noticed_vehicles),
+            "officer_id": rng.randint(1, state["officers"]), "violation_date": "2025-06-01",
+            "violation_time": "12:00:00", "location": "Route 81", "district": str(rng.randint(1, 20)),
+        }
+
+    def driver():
+        return {
+            "first_name": "Bench", "last_name": "Driver", "address": "1 Test St", "city": "Syracuse",
+            "state": "NY", "zip_code": "13202", "drivers_licence": f"B{time.time_ns() % 10**8}{next(counter)}",
+            "drivers_licence_state": "NY", "birth_date": "1990-01-01", "height": 70, "weight": 170, "eyes": "Blue",
+        }
+
+    def notice_ids(count):
+        return ",".join(str(rng.randint(1, state["notices"])) for _ in range(count))
+
+    def search_terms():
+        if rng.random() < 0.5:
+            return rng.choice(LAST_NAMES)[:3]
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+    # Every request repeats the same Idempotency-Key, like a handheld retrying after a dead zone
+    retried_notice = notice()
+    retry_key = f"bench-{time.time_ns()}"
+
+    return {
+        "GET /violation-types": lambda: ("GET", "/violation-types/", {}),
+        "GET /drivers/{driver_id}": lambda: ("GET", f"/drivers/{rng.randint(1, state['drivers'])}", {}),
+        "GET /drivers/frequent-offenders": lambda: ("GET", "/drivers/frequent-offenders", {"params": {"min_violations": 5, "limit": 100}}),
+        "GET /correction-notices": lambda: ("GET", "/correction-notices/", {"params": {"district": str(rng.randint(1, 20)), "limit": 100}}),
+        "GET /correction-notices/{correction_notice_id}": lambda: ("GET", f"/correction-notices/{rng.randint(1, state['notices'])}", {}),
+        "GET /correction-notices/{correction_notice_id} (expanded)": lambda: ("GET", f"/correction-notices/{rng.randint(1, state['notices'])}", {"params": {"expand": EXPAND_ALL}}),
+        "GET /correction-notices/batch": lambda: ("GET", "/correction-notices/batch", {"params": {"ids": notice_ids(20), "expand": EXPAND_ALL}}),
+        "GET /search": lambda: ("GET", "/search/", {"params": {"q": search_terms()}, "officer": True}),
+        "GET /sync": lambda: ("GET", "/sync/", {"params": {"since": rng.randint(0, state["change_seq"]), "limit": 500}, "officer": True}),
+        "GET /analytics/rollups": lambda: ("GET", "/analytics/rollups", {"params": {"by": rng.choice(["district", "officer", "violation_type", "date"])}, "officer": True}),
+        "GET /me/notices": lambda: ("GET", "/me/notices", {"citizen": True}),
+        "POST /drivers": lambda: ("POST", "/drivers/", {"json": driver(), "officer": True}),
+        "PUT /drivers/{driver_id}": lambda: ("PUT", f"/drivers/{rng.randint(1, state['drivers'])}", {"json": {"city": "Albany"}, "officer": True}),
+        "POST /correction-notices": lambda: ("POST", "/correction-notices/", {"json": notice(), "officer": True}),
+        "POST /correction-notices (retried)": lambda: ("POST", "/correction-notices/", {"json": retried_notice, "officer": True, "headers": {"Idempotency-Key": retry_key}}),
+        "POST /correction-notices/bulk": lambda: ("POST", "/correction-notices/bulk", {"json": {"notices": [dict(notice(), violation_type_ids=[1, 2]) for _ in range(10)]}, "officer": True}),
+        "PUT /correction-notices/{correction_notice_id}": lambda: ("PUT", f"/correction-notices/{rng.randint(1, state['notices'])}", {"json": {"location": "Route 690"}, "officer": True}),
+        "POST /notice-violations": lambda: ("POST", "/notice-violations/", {"json": {"correction_notice_id": rng.randint(1, state["notices"]), "violation_type_ids": [1, 2]}, "officer": True}),
+        "DELETE /notice-violations": lambda: ("DELETE", "/notice-violations/", {"json": {"correction_notice_id": next(cleared_notices)}, "officer": True}),
+        "DELETE /notice-violations/{notice_violation_id}": lambda: ("DELETE", f"/notice-violations/{next(violations)}", {"officer": True}),
+        "DELETE /vehicles/{vehicle_id}": lambda: ("DELETE", f"/vehicles/{next(spare_vehicles)}", {"officer": True}),
+        "PUT /token": lambda: ("PUT", "/token", {"refresh": True}),
+        "POST /token": lambda: ("POST", "/token", {"data": {"username": "s_scott@localhost", "password": "password"}}),
+        "GET /metrics": lambda: ("GET", "/metrics", {}),
+    }
+
+# Returns the value at a percentile of sorted latencies, in milliseconds
+def percentile(latencies: list, fraction: float) -> float:
+    index = min(len(latencies) - 1, max(0, int(round(fraction * len(latencies))) - 1))
+    return round(latencies[index] * 1000, 3)
+
+# Sends requests for one scenario from concurrent clients and returns its statistics
+async def run_scenario(client, make_request, tokens: dict, requests: int, concurrency: int) -> dict:
+    latencies = []
+    statuses = {}
+    remaining = itertools.count(requests, -1)
+
+    async def worker():
+        while next(remaining) > 0:
+            method, path, options = make_request()
+            headers = {}
+            if options.get("officer"):
+                headers["Authorization"] = "Bearer " + tokens["officer"]["access_token"]
+            if options.get("citizen"):
+                headers["Authorization"] = "Bearer " + tokens["citizen"]["access_token"]
+            headers.update(options.get("headers", {}))
+            json_body = {"refresh_token": tokens["officer"]["refresh_token"]} if options.get("refresh") else options.get("json")
+            start = time.perf_counter()
+            response = await client.request(method, path, headers=headers, params=options.get("params"), json=json_body, data=options.get("data"))
+            latencies.append(time.perf_counter() - start)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+        "p50_ms": percentile(latencies, 0.50),
+        "p90_ms": percentile(latencies, 0.90),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "statuses": statuses,
+    }
+
+async def run(concurrency_levels: list, requests: int, login_requests: int, only: list, rng_seed: int) -> dict:
+    import httpx
+    # Every request comes from one client, so the rate limiter is off unless set explicitly
+    os.environ.setdefault("RATE_LIMIT_PER_SECOND", "0")
+
+    rng = random.Random(rng_seed)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="nysp-analytics-") as export_directory:
+        # The analytics route reads ANALYTICS_EXPORT_DIR when the app is imported
+        os.environ["ANALYTICS_EXPORT_DIR"] = export_directory
+        from app.main import app
+        from app.services.analytics import export_notice_violations
+        async with app.router.lifespan_context(app):
+            state = await database_state()
+            if not only or "GET /analytics/rollups" in only:
+                await export_notice_violations(export_directory)
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                tokens = {}
+                for role, username in (("officer", "s_scott@localhost"), ("citizen", "d_kroenke@localhost")):
+                    response = await client.post("/token", data={"username": username, "password": "password"})
+                    tokens[role] = response.json()
+                for name, make_request in scenarios(state, rng).items():
+                    if only and name not in only:
+                        continue
+                    # Logins are deliberately slow, so they get a smaller request count
+                    count = login_requests if name == "POST /token" else requests
+                    for concurrency in concurrency_levels:
+                        result = await run_scenario(client, make_request, tokens, count, concurrency)
+                        results.append({"endpoint": name, **result})
+                        print(f"{name:<60} c={concurrency:<4} {result['throughput_rps']:>9} req/s  "
+                              f"p50={result['p50_ms']}ms  p99={result['p99_ms']}ms  {result['statuses']}")
+    return {
+        "database": get_engine().dialect.name,
+        "database_state": state,
+        "requests": requests,
+        "seed": rng_seed,
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process load test for every router")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--login-requests", type=int, default=50)
+    parser.add_argument("--only", nargs="*", default=[], help="Endpoint names to run, e.g. 'GET /violation-types'")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="benchmarks/results.json")
+    args = parser.parse_args()
+    report = asyncio.run(run(args.concurrency, args.requests, args.login_requests, args.only, args.seed))
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+        output.write("\n")
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+'''
+Login throughput benchmark
+Measures POST /token requests per second for different password pool sizes,
+using a temporary SQLite database and an in-process ASGI client.
+
+Usage:
+python -m benchmarks.login_throughput --workers 1 2 4 8 --requests 200 --concurrency 32
+'''
+
+# Runs one measurement in this process, the pool size is set by PASSWORD_HASH_WORKERS
+async def measure(requests: int, concurrency: int) -> dict:
+    import httpx
+    from app.cli import init_db
+    from app.main import app
+
+    await init_db()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            form = {"username": "s_scott@localhost", "password": "password"}
+            latencies = []
+            statuses = {}
+            queue = asyncio.Queue()
+            for _ in range(requests):
+                queue.put_nowait(None)
+
+            async def worker():
+                while not queue.empty():
+                    queue.get_nowait()
+                    start = time.perf_counter()
+                    response = await client.post("/token", data=form)
+                    latencies.append(time.perf_counter() - start)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "workers": int(os.environ["PASSWORD_HASH_WORKERS"]),
+        "requests": requests,
+        "concurrency": concurrency,
+        "requests_per_second": round(requests / elapsed, 2),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+        "statuses": statuses,
+    }
+
+# Runs a measurement in a fresh process for each pool size
+def main():
+    parser = argparse.ArgumentParser(description="Login throughput benchmark")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(asyncio.run(measure(args.requests, args.concurrency))))
+        return
+
+    results = []
+    for workers in sorted(set(args.workers)):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(
+                os.environ,
+                PASSWORD_HASH_WORKERS=str(workers),
+                RATE_LIMIT_PER_SECOND="0",
+                DATABASE_URL=f"sqlite+aiosqlite:///{tmp}/bench.db",
+            )
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.login_throughput", "--single",
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print(f"workers={result['workers']:>3}  {result['requests_per_second']:>8} req/s  "
+              f"p50={result['p50_ms']}ms  p99={result['p99_ms']}ms  {result['statuses']}")
+    return results
+
+if __name__ == "__main__":
+    main()
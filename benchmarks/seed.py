@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import random
+import time
+from datetime import date, time as clock, timedelta
+from sqlalchemy import insert, select, func
+from app.db.database import get_engine, SessionLocal
+from app.db.migrations import upgrade
+from app.models.models import Driver, Officer, VehicleOwner, ViolationType, Vehicle, CorrectionNotice, NoticeViolation
+from app.cli import create_sample_accounts, rebuild_read_models
+
+'''
+Synthetic data seeder for benchmarks
+Fills an empty database (DATABASE_URL) with generated drivers, vehicles, notices and violations.
+The same arguments and seed always produce the same data.
+
+Usage:
+python -m benchmarks.seed --drivers 200000 --vehicles 200000 --notices 2000000
+'''
+
+VIOLATION_TYPES = [
+    ("Texting while driving", "1225(d)"),
+    ("Speeding", "1180"),
+    ("Reckless driving", "1212"),
+    ("Ignoring traffic signals", "1110"),
+]
+FIRST_NAMES = ["James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "David", "Elizabeth"]
+LAST_NAMES = ["Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez"]
+CITIES = ["Syracuse", "Albany", "Buffalo", "Rochester", "Oswego", "Utica", "Ithaca", "Binghamton"]
+MAKES = [("Honda", "Civic"), ("Toyota", "Camry"), ("Ford", "F-150"), ("Saab", "900"), ("Subaru", "Outback")]
+EYES = ["Brown", "Blue", "Green", "Hazel", "Grey"]
+
+# Inserts rows in batches with executemany
+async def insert_rows(model, rows, batch_size: int):
+    for start in range(0, len(rows), batch_size):
+        async with get_engine().begin() as conn:
+            await conn.execute(insert(model), rows[start:start + batch_size])
+
+# Inserts generated rows without holding them all in memory
+async def insert_generated(model, generate, count: int, batch_size: int):
+    for start in range(0, count, batch_size):
+        rows = [generate(i) for i in range(start + 1, min(start + batch_size, count) + 1)]
+        async with get_engine().begin() as conn:
+            await conn.execute(insert(model), rows)
+
+async def seed(drivers: int, owners: int, vehicles: int, officers: int, notices: int, max_violations: int, batch_size: int, rng_seed: int) -> dict:
+    rng = random.Random(rng_seed)
+    await upgrade()
+    await create_sample_accounts()
+    async with SessionLocal() as db:
+        if (await db.execute(select(func.count()).select_from(Driver))).scalar():
+            raise SystemExit("The database already has drivers, seed an empty database")
+
+    await insert_rows(ViolationType, [
+        {"violation_type_id": i, "description": description, "violation_code": code}
+        for i, (description, code) in enumerate(VIOLATION_TYPES, start=1)
+    ], batch_size)
+    await insert_generated(Officer, lambda i: {
+        "officer_id": i, "personell_number": str(i), "first_name": rng.choice(FIRST_NAMES),
+        "last_name": rng.choice(LAST_NAMES), "detachment": str(rng.randint(1, 40)),
+    }, officers, batch_size)
+    # Owner 1 belongs to the sample citizen account, so GET /me/notices has data
+    await insert_generated(VehicleOwner, lambda i: {
+        "vehicle_owner_id": i, "owner_name": f"Owner {i}",
+        "username": "d_kroenke@localhost" if i == 1 else f"owner{i}@localhost",
+        "address": f"{i} Main St", "city": rng.choice(CITIES), "state": "NY", "zip_code": f"{13000 + i % 1000}",
+    }, owners, batch_size)
+    await insert_generated(Driver, lambda i: {
+        "driver_id": i, "first_name": rng.choice(FIRST_NAMES), "last_name": rng.choice(LAST_NAMES),
+        "address": f"{i} Elm St", "city": rng.choice(CITIES), "state": "NY", "zip_code": f"{13000 + i % 1000}",
+        "drivers_licence": f"D{i:09d}", "drivers_licence_state": "NY",
+        "birth_date": date(1950, 1, 1) + timedelta(days=rng.randint(0, 20000)),
+        "height": rng.randint(58, 78), "weight": rng.randint(100, 280), "eyes": rng.choice(EYES),
+    }, drivers, batch_size)
+
+    def vehicle(i):
+        make, model = rng.choice(MAKES)
+        return {
+            "vehicle_id": i, "vehicle_owner_id": 1 if i % 1000 == 0 else rng.randint(1, owners),
+            "vehicles_licence": f"{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}{chr(65 + i // 676 % 26)}-{i % 10000:04d}",
+            "state": "NY", "colour": rng.choice(["Black", "Silver", "Red", "Blue", "White"]),
+            "make": make, "vin": f"V{i:016d}", "year": rng.randint(1990, 2026), "type": model,
+        }
+    await insert_generated(Vehicle, vehicle, vehicles, batch_size)
+
+    # Notices reference vehicles in the lower 90%, the rest have no notices and can be deleted in benchmarks
+    noticed_vehicles = max(1, int(vehicles * 0.9))
+    await insert_generated(CorrectionNotice, lambda i: {
+        "correction_notice_id": i, "driver_id": rng.randint(1, drivers),
+        "vehicle_id": rng.randint(1, noticed_vehicles), "officer_id": rng.randint(1, officers),
+        "violation_date": date(2015, 1, 1) + timedelta(days=rng.randint(0, 4000)),
+        "violation_time": clock(rng.randint(0, 23), rng.randint(0, 59)),
+        "location": f"Route {rng.randint(1, 500)}", "district": str(rng.randint(1, 20)),
+        "warning": rng.random() < 0.3, "repair_vehicle": rng.random() < 0.2, "correct_immediately": rng.random() < 0.1,
+    }, notices, batch_size)
+
+    # Violations are generated per notice, so their count is only known afterwards
+    violations = 0
+    for start in range(1, notices + 1, batch_size):
+        rows = []
+        for notice_id in range(start, min(start + batch_size, notices + 1)):
+            for violation_type_id in rng.sample(range(1, len(VIOLATION_TYPES) + 1), rng.randint(1, max_violations)):
+                rows.append({"correction_notice_id": notice_id, "violation_type_id": violation_type_id})
+        violations += len(rows)
+        await insert_rows(NoticeViolation, rows, batch_size)
+
+    await rebuild_read_models()
+    return {
+        "drivers": drivers, "vehicle_owners": owners, "vehicles": vehicles, "officers": officers,
+        "correction_notices": notices, "notice_violations": violations,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a database with synthetic data")
+    parser.add_argument("--drivers", type=int, default=10_000)
+    parser.add_argument("--owners", type=int, default=5_000)
+    parser.add_argument("--vehicles", type=int, default=10_000)
+    parser.add_argument("--officers", type=int, default=200)
+    parser.add_argument("--notices", type=int, default=100_000)
+    parser.add_argument("--max-violations", type=int, default=3, choices=range(1, len(VIOLATION_TYPES) + 1))
+    parser.add_argument("--batch-size", type=int, default=5_000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    counts = asyncio.run(seed(args.drivers, args.owners, args.vehicles, args.officers, args.notices,
+                              args.max_violations, args.batch_size, args.seed))
+    print(", ".join(f"{count} {name}" for name, count in counts.items()) + f" in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
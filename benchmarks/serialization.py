@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import statistics
+import time
+from datetime import date, timedelta
+from typing import List
+
+'''
+JSON serialization benchmark
+Compares the default response_model path with the fast paths in app.core.responses,
+serving the same list of drivers through a throwaway FastAPI app and an in-process ASGI client.
+No database is used, so the numbers only cover validation and encoding.
+
+Usage:
+python -m benchmarks.serialization --rows 10000 --runs 20
+'''
+
+# Builds the same drivers as ORM objects and as rows of the response columns
+def build_drivers(count: int):
+    from app.models.models import Driver
+    from app.schemas.schemas import DriverResponse
+
+    fields = list(DriverResponse.model_fields)
+    objects = [
+        Driver(
+            driver_id=i, first_name="James", last_name="Smith", address=f"{i} Elm St", city="Syracuse",
+            state="NY", zip_code="13202", drivers_licence=f"D{i:09d}", drivers_licence_state="NY",
+            birth_date=date(1950, 1, 1) + timedelta(days=i % 20000), height=70, weight=170, eyes="Blue", version=1,
+        )
+        for i in range(1, count + 1)
+    ]
+    rows = [tuple(getattr(driver, field) for field in fields) for driver in objects]
+    return objects, rows, fields
+
+# Stands in for a result of a schema_columns query
+class Result:
+    def __init__(self, fields, rows):
+        self.fields = fields
+        self.rows = rows
+
+    def keys(self):
+        return self.fields
+
+    def all(self):
+        return self.rows
+
+def build_app(objects, rows, fields):
+    from fastapi import FastAPI
+    from app.schemas.schemas import DriverResponse
+    from app.core.responses import ObjectListAdapter, rows_response
+
+    app = FastAPI()
+    adapter = ObjectListAdapter(DriverResponse)
+
+    @app.get("/response-model", response_model=List[DriverResponse])
+    async def response_model():
+        return objects
+
+    @app.get("/type-adapter", response_model=List[DriverResponse])
+    async def type_adapter():
+        return adapter.response(objects)
+
+    @app.get("/orjson-rows", response_model=List[DriverResponse])
+    async def orjson_rows():
+        return rows_response(Result(fields, rows))
+
+    return app
+
+async def measure(rows: int, runs: int) -> list:
+    import httpx
+
+    objects, row_tuples, fields = build_drivers(rows)
+    app = build_app(objects, row_tuples, fields)
+    results = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        bodies = {}
+        for path in ("/response-model", "/type-adapter", "/orjson-rows"):
+            latencies = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+            bodies[path] = response.json()
+            results.append({"path": path, "median_ms": round(statistics.median(latencies) * 1000, 2), "bytes": len(response.content)})
+    # Every path must produce the same document
+    if not bodies["/response-model"] == bodies["/type-adapter"] == bodies["/orjson-rows"]:
+        raise SystemExit("Serialization paths returned different responses")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON serialization benchmark")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+    results = asyncio.run(measure(args.rows, args.runs))
+    baseline = results[0]["median_ms"]
+    for result in results:
+        print(f"{result['path']:<16} {result['median_ms']:>9}ms  {result['bytes']} bytes  {baseline / result['median_ms']:.1f}x")
+
+if __name__ == "__main__":
+    main()
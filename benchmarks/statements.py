@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+'''
+Lookup statement benchmark
+Times the per-request lookups in app.db.lookups against the statements they replaced, which were built
+with select() on every call, and against lambda_stmt. Each variant runs the same query against a small
+seeded temporary SQLite database, so the difference between variants is the Python time per call.
+The session's identity map is emptied before every call, so session.get runs its query each time
+instead of returning the object loaded by the previous call.
+
+Usage:
+python -m benchmarks.statements --calls 2000 --runs 5
+'''
+
+# Lookups as (name, variant, function of the session) groups, the first variant of each name is the old code
+def variants():
+    from sqlalchemy import select, func, lambda_stmt
+    from app.core.responses import schema_columns
+    from app.db import lookups
+    from app.models.models import APIUser, Driver, CorrectionNotice
+    from app.schemas.schemas import DriverResponse
+
+    driver_columns = schema_columns(Driver, DriverResponse)
+    driver_id, user_id, vehicle_id = 1, 1, 1
+    return [
+        ("driver by id", "select per call", lambda db: db.execute(select(*schema_columns(Driver, DriverResponse)).filter(Driver.driver_id == driver_id))),
+        ("driver by id", "lambda_stmt", lambda db: db.execute(lambda_stmt(lambda: select(*driver_columns).where(Driver.driver_id == driver_id)))),
+        ("driver by id", "prebuilt", lambda db: lookups.driver_by_id(db, driver_id)),
+        ("user by id", "select per call", lambda db: db.execute(select(APIUser).filter(APIUser.api_user_id == user_id))),
+        ("user by id", "session.get", lambda db: lookups.user_by_id(db, user_id)),
+        ("driver exists", "select row per call", lambda db: db.execute(select(Driver.driver_id).filter(Driver.driver_id == driver_id))),
+        ("driver exists", "prebuilt SELECT 1", lambda db: lookups.exists(db, lookups.DRIVER_EXISTS, driver_id)),
+        ("vehicle notices", "count per call", lambda db: db.execute(select(func.count()).select_from(CorrectionNotice).filter(CorrectionNotice.vehicle_id == vehicle_id))),
+        ("vehicle notices", "prebuilt SELECT 1", lambda db: lookups.exists(db, lookups.VEHICLE_HAS_NOTICES, vehicle_id)),
+    ]
+
+# Returns the best per-call time in microseconds over the runs, each run in a new session
+# Every variant pays for the expunge_all, so it doesn't change the differences
+async def time_variant(session_factory, lookup, calls: int, runs: int) -> float:
+    best = None
+    for _ in range(runs):
+        async with session_factory() as db:
+            await lookup(db)
+            start = time.perf_counter()
+            for _ in range(calls):
+                db.expunge_all()
+                await lookup(db)
+            elapsed = (time.perf_counter() - start) / calls
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1_000_000
+
+async def measure(calls: int, runs: int) -> list:
+    from app.db.database import SessionLocal, get_engine
+    from benchmarks.seed import seed
+
+    await seed(drivers=100, owners=100, vehicles=100, officers=10, notices=1000, max_violations=3, batch_size=1000, rng_seed=1)
+    results = []
+    for name, variant, lookup in variants():
+        results.append({"lookup": name, "variant": variant, "us_per_call": round(await time_variant(SessionLocal, lookup, calls, runs), 1)})
+    await get_engine().dispose()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Lookup statement benchmark")
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Set before the app is imported, the engine reads it once
+        os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{tmp}/bench.db"
+        results = asyncio.run(measure(args.calls, args.runs))
+    baseline = {}
+    for result in results:
+        old = baseline.setdefault(result["lookup"], result["us_per_call"])
+        print(f"{result['lookup']:<16} {result['variant']:<20} {result['us_per_call']:>8} us/call  {old - result['us_per_call']:>7.1f} us saved")
+
+if __name__ == "__main__":
+    main()
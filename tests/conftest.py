@@ -0,0 +1,115 @@
+import os
+import tempfile
+from datetime import date
+
+# Set before the app is imported, these are read once at import
+os.environ.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{tempfile.gettempdir()}/nysp-tests-unused.db")
+os.environ["RATE_LIMIT_PER_SECOND"] = "0"
+os.environ["OUTBOX_WORKER"] = "false"
+os.environ["PRELOAD_VIOLATION_TYPES"] = "false"
+
+import httpx
+import pytest
+from sqlalchemy import event, insert
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.db import database
+from app.db.database import SessionLocal, enable_foreign_keys
+from app.db.migrations import upgrade
+from app.models.models import APIUser, Driver, VehicleOwner, Vehicle, Officer, ViolationType
+from app.core.security import create_access_token
+from app.core.metrics import instrument_engine
+
+'''
+Test fixtures
+Every test gets its own SQLite database file built by the migrations, the app's engine is pointed at it
+for the length of the test. Tests are async functions marked with pytest.mark.anyio.
+'''
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+# A migrated SQLite database for one test, used by the app's engine and sessions
+@pytest.fixture
+async def engine(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/test.db")
+    # Set up like the app's engine in app.db.database.get_engine
+    instrument_engine(engine.sync_engine)
+    event.listen(engine.sync_engine, "connect", enable_foreign_keys)
+    await upgrade(engine)
+    monkeypatch.setattr(database, "_engine", engine)
+    SessionLocal.configure(bind=engine)
+    clear_caches()
+    yield engine
+    clear_caches()
+    await engine.dispose()
+
+# Empties the in-process caches, which would otherwise carry rows from one test's database to the next
+def clear_caches():
+    from app.api.drivers import driver_cache
+    from app.core.deps import user_cache
+    from app.core.idempotency import response_cache
+    from app.services.violation_catalog import violation_catalog
+
+    for cache in (driver_cache, user_cache, response_cache):
+        cache.clear()
+    violation_catalog.invalidate()
+
+# One officer, driver, vehicle owner, vehicle and two violation types, all with ID 1 (and 2)
+@pytest.fixture
+async def seeded(engine):
+    async with engine.begin() as conn:
+        await conn.execute(insert(APIUser), [
+            {"api_user_id": 1, "username": "s_scott@localhost", "password": "-", "role": "officer"},
+            {"api_user_id": 2, "username": "d_kroenke@localhost", "password": "-", "role": "citizen"},
+        ])
+        await conn.execute(insert(Officer).values(officer_id=1, personell_number="1", first_name="Sam", last_name="Scott", detachment="1"))
+        await conn.execute(insert(Driver).values(
+            driver_id=1, first_name="Jane", last_name="Doe", address="1 Main St", city="Albany", state="NY", zip_code="12207",
+            drivers_licence="D1", drivers_licence_state="NY", birth_date=date(1990, 1, 1), height=170, weight=70, eyes="BR"
+        ))
+        await conn.execute(insert(VehicleOwner).values(
+            vehicle_owner_id=1, owner_name="Dan Kroenke", username="d_kroenke@localhost", address="2 Main St", city="Albany", state="NY", zip_code="12207"
+        ))
+        await conn.execute(insert(Vehicle).values(
+            vehicle_id=1, vehicle_owner_id=1, vehicles_licence="ABC123", state="NY", colour="Red", make="Ford", vin="VIN1", year=2020, type="Car"
+        ))
+        await conn.execute(insert(ViolationType), [
+            {"violation_type_id": 1, "description": "Speeding", "violation_code": "1180"},
+            {"violation_type_id": 2, "description": "Texting", "violation_code": "1225(d)"},
+        ])
+    return engine
+
+@pytest.fixture
+async def client(seeded):
+    from app.main import app
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+@pytest.fixture
+def officer():
+    return {"Authorization": "Bearer " + create_access_token("s_scott@localhost", 1, "officer")}
+
+# Request body for a correction notice on the seeded rows
+def notice_body(**values) -> dict:
+    return {
+        "driver_id": 1, "vehicle_id": 1, "officer_id": 1, "violation_date": "2025-01-01", "violation_time": "10:00:00",
+        "location": "I-90", "district": "1", **values
+    }
+
+# Records the SQL sent to the database while the block runs
+class StatementLog:
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.statements = []
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self.record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self.record)
@@ -0,0 +1,90 @@
+import os
+import pytest
+from sqlalchemy import select, delete, insert
+from app.models.models import NoticeViolation
+from app.services import analytics
+from app.services.analytics import export_notice_violations, rollup, read_state, DATASET
+from tests.conftest import notice_body
+
+pytestmark = pytest.mark.anyio
+
+def violations(directory) -> int:
+    return sum(row["violations"] for row in rollup("district", directory=str(directory)))
+
+def versions(directory) -> list:
+    return sorted(name for name in os.listdir(directory) if name.startswith(DATASET + "-"))
+
+# Adds a notice with two violations
+async def add_notice(client, officer):
+    response = await client.post("/correction-notices/", json=notice_body(), headers=officer)
+    assert response.status_code == 201
+    body = {"correction_notice_id": response.json()["correction_notice_id"], "violation_type_ids": [1, 2]}
+    assert (await client.post("/notice-violations/", json=body, headers=officer)).status_code == 201
+
+async def test_incremental_export_appends(client, officer, tmp_path):
+    await add_notice(client, officer)
+    assert await export_notice_violations(str(tmp_path)) == 2
+    await add_notice(client, officer)
+    assert await export_notice_violations(str(tmp_path)) == 2
+    assert await export_notice_violations(str(tmp_path)) == 0
+    assert violations(tmp_path) == 4
+    assert len(versions(tmp_path)) == 1
+
+async def test_rows_committed_below_the_last_exported_id_are_exported(client, officer, engine, tmp_path):
+    await add_notice(client, officer)
+    await add_notice(client, officer)
+    # Violation 3 is still in an open transaction when 4 has committed and been exported
+    async with engine.begin() as conn:
+        late = (await conn.execute(select(NoticeViolation.__table__).where(NoticeViolation.notice_violation_id == 3))).mappings().one()
+        await conn.execute(delete(NoticeViolation).where(NoticeViolation.notice_violation_id == 3))
+    assert await export_notice_violations(str(tmp_path)) == 3
+    assert read_state(str(tmp_path))["missing_ids"] == [3]
+    async with engine.begin() as conn:
+        await conn.execute(insert(NoticeViolation).values(**late))
+    assert await export_notice_violations(str(tmp_path)) == 1
+    assert read_state(str(tmp_path)) == {"last_notice_violation_id": 4, "rows": 4, "missing_ids": []}
+    assert await export_notice_violations(str(tmp_path)) == 0
+    assert violations(tmp_path) == 4
+
+async def test_missing_ids_are_kept_within_the_late_window(monkeypatch):
+    monkeypatch.setattr(analytics, "EXPORT_LATE_WINDOW", 5)
+    state = {"last_notice_violation_id": 2, "rows": 2, "missing_ids": [1]}
+    assert analytics.missing_ids(state, [4, 5, 9]) == [6, 7, 8]
+    assert analytics.missing_ids(state, [3, 5]) == [1, 4]
+
+async def test_failed_full_export_leaves_the_live_dataset(client, officer, tmp_path):
+    await add_notice(client, officer)
+    await export_notice_violations(str(tmp_path))
+    await add_notice(client, officer)
+
+    # Rollups during the full export still read the previous export
+    def write_chunk(dataset, rows):
+        assert violations(tmp_path) == 2
+        raise OSError("disk full")
+    with pytest.MonkeyPatch.context() as monkeypatch, pytest.raises(OSError):
+        monkeypatch.setattr(analytics, "write_chunk", write_chunk)
+        await export_notice_violations(str(tmp_path), full=True)
+    assert violations(tmp_path) == 2
+    assert len(versions(tmp_path)) == 1
+
+    assert await export_notice_violations(str(tmp_path), full=True) == 4
+    assert violations(tmp_path) == 4
+    # The replaced version is kept for rollups still reading it, until the next swap
+    assert len(versions(tmp_path)) == 2
+    await export_notice_violations(str(tmp_path), full=True)
+    assert len(versions(tmp_path)) == 2
+    assert violations(tmp_path) == 4
+
+async def test_full_export_replaces_an_unversioned_dataset(client, officer, tmp_path):
+    await add_notice(client, officer)
+    await export_notice_violations(str(tmp_path))
+    # Lay the dataset out as exports before versioning did, a plain directory
+    live = tmp_path / DATASET
+    (version,) = versions(tmp_path)
+    os.unlink(live)
+    os.rename(tmp_path / version, live)
+    assert violations(tmp_path) == 2
+    await add_notice(client, officer)
+    assert await export_notice_violations(str(tmp_path), full=True) == 4
+    assert os.path.islink(live)
+    assert violations(tmp_path) == 4
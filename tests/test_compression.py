@@ -0,0 +1,68 @@
+import gzip
+import brotli
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+from app.core.compression import CompressionMiddleware
+
+pytestmark = pytest.mark.anyio
+
+BODY = b'{"driver_id": 1, "first_name": "Jane"}' * 100
+
+async def large(request):
+    return Response(BODY, media_type="application/json")
+
+async def small(request):
+    return Response(b"{}", media_type="application/json")
+
+async def streamed(request):
+    async def chunks():
+        for _ in range(3):
+            yield BODY
+    return StreamingResponse(chunks(), media_type="application/json")
+
+async def encoded(request):
+    return Response(gzip.compress(BODY), media_type="application/json", headers={"Content-Encoding": "gzip"})
+
+async def events(request):
+    return Response(b"data: 1\n\n" * 500, media_type="text/event-stream")
+
+app = Starlette(routes=[Route(f"/{route.__name__}", route) for route in (large, small, streamed, encoded, events)])
+app.add_middleware(CompressionMiddleware)
+
+# Fetches a path without letting httpx decode the body
+async def fetch(path: str, accept_encoding: str) -> tuple:
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        async with client.stream("GET", path, headers={"Accept-Encoding": accept_encoding}) as response:
+            return response.headers, b"".join([chunk async for chunk in response.aiter_raw()])
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("gzip, br", "br"),
+    ("gzip;q=1.0, br;q=0.5", "gzip"),
+    ("*", "br"),
+    ("identity", None),
+])
+async def test_negotiated_encoding(accept_encoding, encoding):
+    headers, body = await fetch("/large", accept_encoding)
+    assert headers.get("content-encoding") == encoding
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(body)
+    decode = {"br": brotli.decompress, "gzip": gzip.decompress, None: bytes}[encoding]
+    assert decode(body) == BODY
+
+async def test_small_responses_are_sent_as_they_are():
+    headers, body = await fetch("/small", "br")
+    assert "content-encoding" not in headers and body == b"{}"
+
+async def test_streamed_responses_are_compressed_chunk_by_chunk():
+    headers, body = await fetch("/streamed", "br")
+    assert headers["content-encoding"] == "br" and "content-length" not in headers
+    assert brotli.decompress(body) == BODY * 3
+
+@pytest.mark.parametrize("path", ["/encoded", "/events"])
+async def test_encoded_and_event_stream_responses_pass_through(path):
+    headers, body = await fetch(path, "gzip")
+    plain = (await fetch(path, "identity"))[1]
+    assert body == plain
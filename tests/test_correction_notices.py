@@ -0,0 +1,40 @@
+import pytest
+from tests.conftest import StatementLog, notice_body
+
+pytestmark = pytest.mark.anyio
+
+async def test_bulk_create_inserts_notices_with_one_statement(client, officer, engine):
+    notices = [notice_body(location=f"Exit {i}", violation_type_ids=[1, 2][:i % 3]) for i in range(5)]
+    notices.append(notice_body(driver_id=999))
+    with StatementLog(engine) as log:
+        response = await client.post("/correction-notices/bulk", json={"notices": notices}, headers=officer)
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["created"], body["failed"]) == (5, 1)
+    assert len([s for s in log.statements if s.startswith("INSERT INTO correction_notice ")]) == 1
+    assert body["results"][5] == {"index": 5, "status": "error", "correction_notice": None, "detail": "Driver not found"}
+    # Each returned ID belongs to the notice at its index, with the violations sent for it
+    for i, result in enumerate(body["results"][:5]):
+        created = result["correction_notice"]
+        assert created["location"] == f"Exit {i}" and created["version"] == 1
+        detail = (await client.get(f"/correction-notices/{created['correction_notice_id']}", params={"expand": "violations"}, headers=officer)).json()
+        assert detail["location"] == f"Exit {i}"
+        assert sorted(v["violation_type"]["violation_type_id"] for v in detail["violations"]) == [1, 2][:i % 3]
+
+async def test_update_rejects_nulls(client, officer):
+    created = (await client.post("/correction-notices/", json=notice_body(), headers=officer)).json()
+    response = await client.put(f"/correction-notices/{created['correction_notice_id']}", json={"driver_id": None}, headers=officer)
+    assert response.status_code == 422
+    assert "driver_id cannot be null" in response.text
+
+async def test_empty_update_does_not_write(client, officer, engine):
+    created = (await client.post("/correction-notices/", json=notice_body(), headers=officer)).json()
+    path = f"/correction-notices/{created['correction_notice_id']}"
+    with StatementLog(engine) as log:
+        response = await client.put(path, json={}, headers=officer)
+    assert response.status_code == 200
+    assert response.json() == created
+    assert not [s for s in log.statements if not s.startswith("SELECT")]
+    assert (await client.put(path, json={"version": 1}, headers=officer)).status_code == 200
+    assert (await client.put(path, json={"version": 2}, headers=officer)).status_code == 409
+    assert (await client.put("/correction-notices/999", json={}, headers=officer)).status_code == 404
@@ -0,0 +1,61 @@
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+DRIVER = {
+    "first_name": "John", "last_name": "Smith", "address": "3 Main St", "city": "Albany", "state": "NY", "zip_code": "12207",
+    "drivers_licence": "D2", "drivers_licence_state": "NY", "birth_date": "1985-05-05", "height": 180, "weight": 80, "eyes": "BL",
+}
+
+async def test_duplicate_licence_is_a_conflict(client, officer):
+    assert (await client.post("/drivers/", json=DRIVER, headers=officer)).status_code == 201
+    response = await client.post("/drivers/", json=DRIVER, headers=officer)
+    assert response.status_code == 409
+    response = await client.put("/drivers/1", json={"drivers_licence": "D2"}, headers=officer)
+    assert response.status_code == 409
+
+async def test_update_rejects_nulls(client, officer):
+    response = await client.put("/drivers/1", json={"first_name": None}, headers=officer)
+    assert response.status_code == 422
+    assert "first_name cannot be null" in response.text
+    # A null version only means the update isn't checked against a version
+    response = await client.put("/drivers/1", json={"first_name": "Janet", "version": None}, headers=officer)
+    assert response.status_code == 200
+    assert response.json()["first_name"] == "Janet"
+
+async def test_other_integrity_errors_are_not_licence_conflicts(engine):
+    from fastapi import HTTPException
+    from sqlalchemy.exc import IntegrityError
+    from app.api.drivers import licence_conflicts
+    from app.db.database import SessionLocal
+
+    async with SessionLocal() as db:
+        with pytest.raises(HTTPException) as raised:
+            async with licence_conflicts(db):
+                raise IntegrityError("UPDATE driver", {}, Exception("NOT NULL constraint failed: driver.first_name"))
+    assert raised.value.status_code == 422
+    async with SessionLocal() as db:
+        with pytest.raises(HTTPException) as raised:
+            async with licence_conflicts(db):
+                raise IntegrityError("UPDATE driver", {}, Exception("(1062, \"Duplicate entry 'D1' for key 'driver.uq_driver_drivers_licence'\")"))
+    assert raised.value.status_code == 409
+
+async def test_empty_update_returns_the_driver_unchanged(client, officer):
+    before = (await client.get("/drivers/1", headers=officer)).json()
+    response = await client.put("/drivers/1", json={}, headers=officer)
+    assert response.status_code == 200
+    assert response.json() == before
+    assert (await client.put("/drivers/1", json={"version": 2}, headers=officer)).status_code == 409
+    assert (await client.put("/drivers/999", json={}, headers=officer)).status_code == 404
+
+async def test_update_is_not_undone_by_a_lagging_replica(client, officer, monkeypatch):
+    from app.api import drivers
+
+    before = (await client.get("/drivers/1", headers=officer)).json()
+    # The replica hasn't seen the update yet, so every read of it returns the old row
+    async def lagging_driver_by_id(db, driver_id):
+        return before
+    response = await client.put("/drivers/1", json={"city": "Troy"}, headers=officer)
+    assert response.status_code == 200
+    monkeypatch.setattr(drivers, "driver_by_id", lagging_driver_by_id)
+    assert (await client.get("/drivers/1", headers=officer)).json()["city"] == "Troy"
@@ -0,0 +1,76 @@
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, func, insert
+from app.core.idempotency import IdempotencyMiddleware, IDEMPOTENCY_LEASE_SECONDS
+from app.models.models import CorrectionNotice, IdempotencyKey
+from tests.conftest import notice_body
+
+pytestmark = pytest.mark.anyio
+
+async def notice_count(engine) -> int:
+    async with engine.connect() as conn:
+        return (await conn.execute(select(func.count()).select_from(CorrectionNotice))).scalar()
+
+def with_key(headers: dict, key: str) -> dict:
+    return {**headers, "Idempotency-Key": key}
+
+async def test_retry_replays_the_response(client, officer, engine):
+    first = await client.post("/correction-notices/", json=notice_body(), headers=with_key(officer, "a"))
+    retry = await client.post("/correction-notices/", json=notice_body(), headers=with_key(officer, "a"))
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json() == first.json()
+    assert await notice_count(engine) == 1
+
+async def test_key_reused_with_a_different_body_is_rejected(client, officer, engine):
+    assert (await client.post("/correction-notices/", json=notice_body(), headers=with_key(officer, "a"))).status_code == 201
+    response = await client.post("/correction-notices/", json=notice_body(location="I-87"), headers=with_key(officer, "a"))
+    assert response.status_code == 422
+    assert "different request" in response.text
+    assert await notice_count(engine) == 1
+
+async def test_concurrent_requests_with_one_key_write_once(client, officer, engine):
+    responses = await asyncio.gather(*(
+        client.post("/correction-notices/", json=notice_body(), headers=with_key(officer, "a")) for _ in range(5)
+    ))
+    created = [r for r in responses if r.status_code == 201 and "Idempotent-Replayed" not in r.headers]
+    assert len(created) == 1
+    # The others were either replayed or told to retry while the first was running
+    for response in responses:
+        if response is not created[0]:
+            assert response.status_code == 409 or response.json() == created[0].json()
+    assert await notice_count(engine) == 1
+
+async def test_key_without_a_response_after_the_lease_is_lost(client, officer, engine):
+    body = notice_body()
+    await client.post("/correction-notices/", json=body, headers=with_key(officer, "hash"))
+    async with engine.begin() as conn:
+        request_hash = (await conn.execute(select(IdempotencyKey.request_hash))).scalar()
+        # Keys whose request committed but never recorded its response
+        now = datetime.utcnow()
+        for key, age in (("running", 1), ("lost", IDEMPOTENCY_LEASE_SECONDS + 1)):
+            await conn.execute(insert(IdempotencyKey).values(
+                scope="1 POST /correction-notices/", key=key, request_hash=request_hash, created_at=now - timedelta(seconds=age)
+            ))
+    response = await client.post("/correction-notices/", json=body, headers=with_key(officer, "running"))
+    assert response.status_code == 409 and response.headers["Retry-After"] == "1"
+    response = await client.post("/correction-notices/", json=body, headers=with_key(officer, "lost"))
+    assert response.status_code == 422
+    assert "response was lost" in response.text
+    assert await notice_count(engine) == 1
+
+async def test_requests_without_a_key_are_not_buffered():
+    received = []
+
+    async def app(scope, receive, send):
+        received.append(send)
+
+    async def send(message):
+        pass
+
+    middleware = IdempotencyMiddleware(app)
+    await middleware({"type": "http", "method": "POST", "headers": [(b"content-type", b"application/json")]}, None, send)
+    assert received == [send]
+    await middleware({"type": "http", "method": "POST", "headers": [(b"idempotency-key", b"a")]}, None, send)
+    assert received[1] is not send
@@ -0,0 +1,23 @@
+import logging
+import pytest
+from app.core import metrics
+from tests.conftest import notice_body
+
+pytestmark = pytest.mark.anyio
+
+def n_plus_one_warnings(caplog) -> list:
+    return [record.getMessage() for record in caplog.records if "N+1" in record.getMessage()]
+
+async def test_budgeted_routes_are_not_flagged(client, officer, caplog):
+    caplog.set_level(logging.WARNING, "app.core.metrics")
+    notices = [notice_body(violation_type_ids=[1, 2]) for _ in range(50)]
+    assert (await client.post("/correction-notices/bulk", json={"notices": notices}, headers=officer)).status_code == 200
+    assert (await client.delete("/vehicles/1", params={"cascade": "true"}, headers=officer)).status_code == 200
+    assert n_plus_one_warnings(caplog) == []
+
+async def test_routes_over_the_threshold_are_flagged(client, officer, caplog, monkeypatch):
+    caplog.set_level(logging.WARNING, "app.core.metrics")
+    monkeypatch.setattr(metrics, "N_PLUS_ONE_QUERY_THRESHOLD", 1)
+    assert (await client.put("/drivers/1", json={"city": "Troy"}, headers=officer)).status_code == 200
+    warnings = n_plus_one_warnings(caplog)
+    assert len(warnings) == 1 and warnings[0].startswith("PUT /drivers/{driver_id} ran ")
@@ -0,0 +1,27 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from app.db.database import SessionLocal
+from app.models.models import DriverViolationCount
+from app.services.offender_stats import adjust_violation_counts, adjust_violation_counts_portably
+
+pytestmark = pytest.mark.anyio
+
+async def counts(db) -> dict:
+    return dict((await db.execute(select(DriverViolationCount.driver_id, DriverViolationCount.violation_count))).all())
+
+@pytest.mark.parametrize("adjust", [
+    adjust_violation_counts,
+    lambda db, deltas: adjust_violation_counts_portably(db, [{"driver_id": d, "violation_count": n} for d, n in deltas.items()]),
+], ids=["upsert", "portable"])
+async def test_counts_are_inserted_then_added_to(seeded, adjust):
+    async with SessionLocal() as db:
+        await adjust(db, {1: 2})
+        await adjust(db, {1: 3})
+        await db.commit()
+        assert await counts(db) == {1: 5}
+
+async def test_portable_upsert_reraises_other_integrity_errors(seeded):
+    async with SessionLocal() as db:
+        with pytest.raises(IntegrityError):
+            await adjust_violation_counts_portably(db, [{"driver_id": 999, "violation_count": 1}])
@@ -0,0 +1,96 @@
+import asyncio
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import select, update
+from app.db.database import SessionLocal
+from app.models.models import OutboxEvent, SearchToken
+from app.services import outbox
+from app.services.outbox import emit, claim_events, deliver, process_batch
+from app.services.search_index import reindex_drivers, unindex_vehicles, vehicle_tokens, token_rows
+
+pytestmark = pytest.mark.anyio
+
+async def emit_events(topic: str, *payloads: dict):
+    async with SessionLocal() as db:
+        await emit(db, topic, *payloads)
+        await db.commit()
+
+async def outbox_rows() -> list:
+    async with SessionLocal() as db:
+        return (await db.execute(select(OutboxEvent).order_by(OutboxEvent.outbox_event_id))).scalars().all()
+
+# Ends the lease of every claimed event, as if its worker had died
+async def expire_leases():
+    async with SessionLocal() as db:
+        await db.execute(update(OutboxEvent).filter(OutboxEvent.available_at.is_not(None)).values(available_at=datetime.utcnow() - timedelta(seconds=1)))
+        await db.commit()
+
+async def test_concurrent_workers_claim_each_event_once(engine):
+    await emit_events("test.event", *({"n": n} for n in range(10)))
+    first, second = await asyncio.gather(claim_events(10), claim_events(10))
+    first_ids = {e.outbox_event_id for e in first}
+    second_ids = {e.outbox_event_id for e in second}
+    assert not first_ids & second_ids
+    assert len(first_ids | second_ids) == 10
+
+async def test_expired_lease_is_claimed_again(engine):
+    await emit_events("test.event", {"n": 1})
+    (claimed,) = await claim_events(10)
+    assert await claim_events(10) == []
+    await expire_leases()
+    (reclaimed,) = await claim_events(10)
+    assert reclaimed.outbox_event_id == claimed.outbox_event_id
+    assert reclaimed.attempts == 2 and reclaimed.claimed_by != claimed.claimed_by
+    # The first worker's late delivery doesn't delete the event out from under the new claim
+    await deliver("test.event", [claimed])
+    assert len(await outbox_rows()) == 1
+    await deliver("test.event", [reclaimed])
+    assert await outbox_rows() == []
+
+async def test_failing_event_is_parked_after_max_attempts(engine, monkeypatch):
+    delivered = []
+    async def handle(db, payloads):
+        if any(p["fail"] for p in payloads):
+            raise ValueError("bad payload")
+        delivered.extend(payloads)
+    monkeypatch.setitem(outbox.handlers, "test.event", [handle])
+    monkeypatch.setattr(outbox, "OUTBOX_MAX_ATTEMPTS", 2)
+    await emit_events("test.event", {"n": 1, "fail": False}, {"n": 2, "fail": True}, {"n": 3, "fail": False})
+
+    # The batch fails, so its events are delivered one at a time and only the failing one is retried
+    assert await process_batch() == 3
+    assert [p["n"] for p in delivered] == [1, 3]
+    (failed,) = await outbox_rows()
+    assert failed.attempts == 1 and failed.available_at > datetime.utcnow() and failed.claimed_by is None
+
+    await expire_leases()
+    assert await process_batch() == 1
+    (failed,) = await outbox_rows()
+    assert failed.attempts == 2 and failed.available_at is None
+    assert "bad payload" in failed.last_error
+    await expire_leases()
+    assert await process_batch() == 0
+
+async def test_search_index_handlers_can_run_twice(seeded):
+    async def tokens():
+        async with SessionLocal() as db:
+            return sorted((await db.execute(select(SearchToken.token, SearchToken.kind, SearchToken.entity_id))).all())
+
+    # Delivered again after a lost lease, or twice in one batch
+    for payloads in ([{"driver_id": 1}], [{"driver_id": 1}, {"driver_id": 1, "fields": ["last_name"]}]):
+        async with SessionLocal() as db:
+            await reindex_drivers(db, payloads)
+            await db.commit()
+    indexed = await tokens()
+    assert ("doe", "driver", 1) in indexed and ("jane", "driver", 1) in indexed and len(indexed) == 3
+
+    async with SessionLocal() as db:
+        vehicle = SimpleNamespace(vehicles_licence="ABC123", vin="VIN1")
+        await db.execute(SearchToken.__table__.insert(), token_rows("vehicle", 1, vehicle_tokens(vehicle)))
+        await db.commit()
+    for _ in range(2):
+        async with SessionLocal() as db:
+            await unindex_vehicles(db, [{"vehicle_id": 1}, {"vehicle_id": 1}])
+            await db.commit()
+    assert await tokens() == indexed
@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy import insert
+from app.db.database import SessionLocal
+from app.models.models import SearchToken
+from app.services.search_index import by_selectivity
+
+pytestmark = pytest.mark.anyio
+
+async def test_common_word_does_not_hide_a_match(client, officer, seeded):
+    # Thousands of other "smith" drivers sort before the one that also matches "jane"
+    rows = [{"token": "smith", "kind": "driver", "entity_id": 1000 + i, "field": "name"} for i in range(3000)]
+    rows += [
+        {"token": "jane", "kind": "driver", "entity_id": 1, "field": "name"},
+        {"token": "smithson", "kind": "driver", "entity_id": 1, "field": "name"},
+    ]
+    async with seeded.begin() as conn:
+        await conn.execute(insert(SearchToken), rows)
+    response = await client.get("/search/", params={"q": "smith jane"}, headers=officer)
+    assert response.status_code == 200
+    assert [(item["kind"], item["id"]) for item in response.json()["items"]] == [("driver", 1)]
+    # Pages of a common word run to the end of its matches
+    response = await client.get("/search/", params={"q": "smith", "skip": 2990, "limit": 100}, headers=officer)
+    body = response.json()
+    assert body["has_more"] is False
+    assert [item["id"] for item in body["items"]] == [1]
+
+async def test_short_words_match_whole_words_unless_narrowed(client, officer, seeded):
+    rows = [{"token": token, "kind": "driver", "entity_id": 1, "field": "name"} for token in ("jane", "doe")]
+    async with seeded.begin() as conn:
+        await conn.execute(insert(SearchToken), rows)
+
+    async def found(q):
+        response = await client.get("/search/", params={"q": q}, headers=officer)
+        return [item["id"] for item in response.json()["items"]]
+
+    assert await found("do") == []
+    assert await found("doe") == [1]
+    # "jan" finds the drivers, "do" is only checked against each of them
+    assert await found("do jan") == [1]
+    assert await found("do ja") == []
+
+async def test_search_is_driven_by_the_rarest_term(seeded):
+    rows = [{"token": "smith", "kind": "driver", "entity_id": 1000 + i, "field": "name"} for i in range(50)]
+    rows.append({"token": "jane", "kind": "driver", "entity_id": 1, "field": "name"})
+    async with seeded.begin() as conn:
+        await conn.execute(insert(SearchToken), rows)
+    async with SessionLocal() as db:
+        assert await by_selectivity(db, ["smith", "jane"]) == ["jane", "smith"]
+        assert await by_selectivity(db, ["smith", "jane"], "vehicle") == ["smith", "jane"]
+        # No driver is called "sm", but as the driving term it would miss "smith"
+        assert await by_selectivity(db, ["sm", "jane"]) == ["jane", "sm"]
@@ -0,0 +1,88 @@
+import asyncio
+import pytest
+from sqlalchemy import select
+from app.models.models import CorrectionNotice, NoticeViolation, SyncSequence
+from tests.conftest import StatementLog, notice_body
+
+pytestmark = pytest.mark.anyio
+
+SYNCED_KEYS = {"correction_notice": "correction_notice_id", "notice_violation": "notice_violation_id"}
+
+async def create_notice(client, officer, violation_type_ids=(1, 2)) -> int:
+    notice_id = (await client.post("/correction-notices/", json=notice_body(), headers=officer)).json()["correction_notice_id"]
+    body = {"correction_notice_id": notice_id, "violation_type_ids": list(violation_type_ids)}
+    assert (await client.post("/notice-violations/", json=body, headers=officer)).status_code == 201
+    return notice_id
+
+# Syncs from a cursor page by page, like a device would, and returns the pages
+async def sync_pages(client, officer, since: int, limit: int) -> list:
+    pages = []
+    while True:
+        page = (await client.get("/sync/", params={"since": since, "limit": limit}, headers=officer)).json()
+        pages.append(page)
+        since = page["cursor"]
+        if not page["has_more"]:
+            return pages
+
+async def synced_rows(engine, model, key) -> dict:
+    async with engine.connect() as conn:
+        return {row[key]: row for row in (await conn.execute(select(model.__table__).where(model.change_seq > 0))).mappings()}
+
+async def test_paging_across_tombstones_matches_the_database(client, officer, engine):
+    start = (await client.get("/sync/", headers=officer)).json()["cursor"]
+    notice_ids = [await create_notice(client, officer) for _ in range(4)]
+    await client.put(f"/correction-notices/{notice_ids[0]}", json={"location": "Exit 5"}, headers=officer)
+    # Single deletes, and a batch delete that leaves several tombstones in one transaction
+    violation_ids = sorted((await synced_rows(engine, NoticeViolation, "notice_violation_id")))
+    assert (await client.delete(f"/notice-violations/{violation_ids[0]}", headers=officer)).status_code == 200
+    assert (await client.request("DELETE", "/notice-violations/", json={"correction_notice_id": notice_ids[2]}, headers=officer)).status_code == 200
+    await create_notice(client, officer, [1])
+
+    # Apply the pages to an empty copy
+    copy = {name: {} for name in SYNCED_KEYS}
+    cursors = [start]
+    for page in await sync_pages(client, officer, start, limit=2):
+        for name, ids in page["deleted"].items():
+            for entity_id in ids:
+                copy[name].pop(entity_id, None)
+        for name, rows in page["changes"].items():
+            for row in rows:
+                assert row["change_seq"] > cursors[-1]
+                copy[name][row[SYNCED_KEYS[name]]] = row
+        assert page["cursor"] > cursors[-1]
+        cursors.append(page["cursor"])
+    assert len(cursors) > 3
+    # No placeholder outlives its transaction
+    async with engine.connect() as conn:
+        for model in (CorrectionNotice, NoticeViolation):
+            assert (await conn.execute(select(model.change_seq).where(model.change_seq < 0))).first() is None
+    for name, model in (("correction_notice", CorrectionNotice), ("notice_violation", NoticeViolation)):
+        expected = await synced_rows(engine, model, SYNCED_KEYS[name])
+        assert copy[name].keys() == expected.keys()
+        assert {key: row["change_seq"] for key, row in copy[name].items()} == {key: row["change_seq"] for key, row in expected.items()}
+
+async def test_concurrent_updates_get_distinct_numbers_in_commit_order(client, officer, engine):
+    notice_ids = [await create_notice(client, officer, [1]) for _ in range(10)]
+    start = (await client.get("/sync/", headers=officer)).json()["cursor"]
+    responses = await asyncio.gather(*(
+        client.put(f"/correction-notices/{notice_id}", json={"location": f"Exit {notice_id}"}, headers=officer) for notice_id in notice_ids
+    ))
+    assert all(response.status_code == 200 for response in responses)
+    async with engine.connect() as conn:
+        assert (await conn.execute(select(SyncSequence.value))).scalar() == start + 10
+    notices = await synced_rows(engine, CorrectionNotice, "correction_notice_id")
+    assert sorted(notices[notice_id]["change_seq"] for notice_id in notice_ids) == list(range(start + 1, start + 11))
+    # Each update is its own page, none are skipped
+    pages = await sync_pages(client, officer, start, limit=1)
+    synced = [row["correction_notice_id"] for page in pages for row in page["changes"].get("correction_notice", [])]
+    assert sorted(synced) == notice_ids
+
+async def test_counter_is_taken_at_commit(client, officer, engine):
+    notice_id = await create_notice(client, officer)
+    with StatementLog(engine) as log:
+        response = await client.put(f"/correction-notices/{notice_id}", json={"location": "Exit 9"}, headers=officer)
+    assert response.status_code == 200
+    writes = [statement.split("SET")[0].strip() for statement in log.statements if statement.startswith("UPDATE")]
+    # The counter is locked after the notice is written, and only the number is written after it
+    assert writes[0] == "UPDATE correction_notice"
+    assert writes[-2:] == ["UPDATE sync_sequence", "UPDATE correction_notice"]
@@ -0,0 +1,44 @@
+import pytest
+from app.db.database import SessionLocal
+from app.models.models import ViolationType
+from app.services import violation_catalog as catalog_module
+from app.services.violation_catalog import violation_catalog
+
+pytestmark = pytest.mark.anyio
+
+async def test_invalidation_during_a_load_still_serves_the_load(client, monkeypatch):
+    adapter = catalog_module.violation_types_adapter
+
+    class InvalidatingAdapter:
+        def dump_json(self, violations):
+            violation_catalog.invalidate()
+            return adapter.dump_json(violations)
+
+    monkeypatch.setattr(catalog_module, "violation_types_adapter", InvalidatingAdapter())
+    response = await client.get("/violation-types/")
+    assert response.status_code == 200
+    assert response.headers["ETag"].startswith('"') and len(response.json()) == 2
+    # Invalidated while loading, so the load wasn't cached
+    assert violation_catalog.body is None
+
+async def test_catalog_is_invalidated_when_the_write_commits(client):
+    first = await client.get("/violation-types/")
+    async with SessionLocal() as db:
+        db.add(ViolationType(violation_type_id=3, description="Seatbelt", violation_code="1229-c"))
+        await db.flush()
+        # Loaded between the flush and the commit, so still the old catalog
+        violation_catalog.invalidate()
+        assert len((await client.get("/violation-types/")).json()) == 2
+        assert violation_catalog.body is not None
+        await db.commit()
+    response = await client.get("/violation-types/")
+    assert len(response.json()) == 3
+    assert response.headers["ETag"] != first.headers["ETag"]
+
+async def test_rolled_back_write_keeps_the_catalog(client):
+    await client.get("/violation-types/")
+    async with SessionLocal() as db:
+        db.add(ViolationType(violation_type_id=3, description="Seatbelt", violation_code="1229-c"))
+        await db.flush()
+        await db.rollback()
+    assert violation_catalog.body is not None